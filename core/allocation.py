@@ -0,0 +1,161 @@
+# core/allocation.py
+"""
+Allocation suggestions from stock on hand and sales velocity.
+
+For every agent and pack:
+
+- stock on hand is the agent's StockLedger balance
+- velocity is the units sold per day over the last ``VELOCITY_DAYS``
+- the target is ``COVER_DAYS`` of that velocity plus a ``SAFETY`` margin
+
+An agent with less stock than the target is suggested the difference,
+rounded up. Two grouped queries load stock and sales into ``agents x packs``
+NumPy matrices, and the suggestion is one array expression over all
+agents and packs at once.
+
+Suggestions are written as DRAFT allocations that replace the agents'
+previous drafts. ``approve()`` turns drafts into approved, processed slips
+and posts their stock to the ledger, in bulk.
+"""
+import uuid
+from datetime import timedelta
+from functools import partial
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core import metrics
+from core.models import (
+    Allocation, AllocationStatus, MovementType, PackSize, Role, Sale, StockLedger, User,
+)
+
+VELOCITY_DAYS = 28
+COVER_DAYS = 7
+SAFETY = 0.2        # extra share of the target kept as buffer stock
+MIN_QUANTITY = 5    # smaller top-ups aren't worth a slip
+
+
+# -------------------
+# Stock and velocity
+# -------------------
+def _balances(agent_ids):
+    """``(agent_id, pack_id, balance)`` ledger totals (an index-only scan of ledger_agent_stock_idx)."""
+    return (
+        StockLedger.objects.filter(agent__in=agent_ids)
+        .order_by()
+        .values_list("agent", "pack")
+        .annotate(balance=Sum("quantity"))
+    )
+
+
+def _matrix(rows, agent_index, pack_index):
+    """``agents x packs`` matrix from ``(agent_id, pack_id, value)`` rows; unknown keys are dropped."""
+    matrix = np.zeros((len(agent_index), len(pack_index)))
+    cells = [
+        (agent_index[agent], pack_index[pack], value or 0)
+        for agent, pack, value in rows
+        if agent in agent_index and pack in pack_index
+    ]
+    if cells:
+        agents, packs, values = zip(*cells)
+        matrix[list(agents), list(packs)] = np.array(values, dtype=float)
+    return matrix
+
+
+def stock_and_velocity(agent_ids, pack_ids, now=None, days=VELOCITY_DAYS):
+    """
+    ``(stock, velocity)`` matrices, indexed like ``agent_ids`` x ``pack_ids``:
+    ledger balances, and units sold per day over the last ``days``.
+    """
+    now = now or timezone.now()
+    agent_index = {pk: i for i, pk in enumerate(agent_ids)}
+    pack_index = {pk: i for i, pk in enumerate(pack_ids)}
+    sold = (
+        Sale.objects.filter(agent__in=agent_ids, timestamp__gte=now - timedelta(days=days), timestamp__lte=now)
+        .order_by()
+        .values_list("agent", "pack")
+        .annotate(units=Sum("quantity"))
+    )
+    return _matrix(_balances(agent_ids), agent_index, pack_index), _matrix(sold, agent_index, pack_index) / days
+
+
+def recommend(stock, velocity, cover_days=COVER_DAYS, safety=SAFETY, minimum=MIN_QUANTITY):
+    """Suggested quantities (an int matrix) for the shortfall against the target stock."""
+    target = velocity * cover_days * (1 + safety)
+    shortfall = np.ceil(target - np.maximum(stock, 0))
+    return np.where(shortfall >= minimum, shortfall, 0).astype(int)
+
+
+# -------------------
+# Drafts
+# -------------------
+def suggest(agent_ids=None, created_by=None, now=None, cover_days=COVER_DAYS):
+    """
+    Replace the draft allocations of ``agent_ids`` (default: every active
+    agent) with fresh suggestions. Returns the new drafts.
+    """
+    now = now or timezone.now()
+    if agent_ids is None:
+        agent_ids = User.objects.filter(role=Role.AGENT, is_active=True).values_list("pk", flat=True)
+    agent_ids = list(agent_ids)
+    pack_ids = list(PackSize.objects.order_by("pk").values_list("pk", flat=True))
+    stock, velocity = stock_and_velocity(agent_ids, pack_ids, now)
+    quantities = recommend(stock, velocity, cover_days)
+
+    stamp = timezone.localdate(now).strftime("%Y%m%d")
+    drafts = []
+    for i, j in zip(*np.nonzero(quantities)):
+        drafts.append(Allocation(
+            slip_number=f"SUG-{stamp}-{uuid.uuid4().hex[:12].upper()}",
+            agent_id=agent_ids[i], pack_id=pack_ids[j], quantity=int(quantities[i, j]),
+            created_by=created_by, status=AllocationStatus.DRAFT,
+            notes=f"Stock {stock[i, j]:.0f}, selling {velocity[i, j]:.1f}/day; covers {cover_days} days.",
+        ))
+    with transaction.atomic():
+        Allocation.objects.filter(agent__in=agent_ids, status=AllocationStatus.DRAFT).delete()
+        Allocation.objects.bulk_create(drafts, batch_size=2000)
+    return drafts
+
+
+def approve(allocation_ids, approver):
+    """
+    Approve the drafts among ``allocation_ids``: mark them approved and
+    processed and post one ALLOCATION ledger entry each, with the running
+    balance. Returns how many were approved.
+
+    The agents' rows are locked first, so two approvals for the same agent
+    run one after the other and each reads the balance the other posted.
+    """
+    with transaction.atomic():
+        agent_ids = (
+            Allocation.objects.filter(pk__in=allocation_ids, status=AllocationStatus.DRAFT)
+            .order_by().values_list("agent", flat=True).distinct()
+        )
+        # Ordered, so concurrent approvals for overlapping agents can't deadlock
+        list(User.all_objects.select_for_update().filter(pk__in=agent_ids).order_by("pk").values_list("pk"))
+        drafts = list(
+            Allocation.objects.select_for_update(of=("self",))  # not the packs joined in
+            .filter(pk__in=allocation_ids, status=AllocationStatus.DRAFT)
+            .select_related("pack")
+        )
+        if not drafts:
+            return 0
+        agent_ids = list({draft.agent_id for draft in drafts})
+        balances = {(agent, pack): balance or 0 for agent, pack, balance in _balances(agent_ids)}
+        entries = []
+        for draft in drafts:
+            key = (draft.agent_id, draft.pack_id)
+            balances[key] = balances.get(key, 0) + draft.quantity
+            entries.append(StockLedger(
+                movement_type=MovementType.ALLOCATION, source_ref=draft.pk, actor=approver,
+                agent_id=draft.agent_id, product_id=draft.pack.product_id, pack_id=draft.pack_id,
+                quantity=draft.quantity, balance_after=balances[key], reason_code="suggested allocation",
+            ))
+        StockLedger.objects.bulk_create(entries, batch_size=2000)
+        # bulk_create skips the post_save receiver that counts postings
+        transaction.on_commit(partial(metrics.LEDGER_POSTINGS.inc, len(entries), movement_type=MovementType.ALLOCATION))
+        return Allocation.objects.filter(pk__in=[draft.pk for draft in drafts]).update(
+            status=AllocationStatus.APPROVED, processed=True, updated_at=timezone.now(),  # auto_now is skipped
+        )
@@ -0,0 +1,58 @@
+# core/backends.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from core.db_routers import use_replica
+from core.metrics import record_cache
+
+USER_CACHE_TIMEOUT = 60 * 15
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves ``request.user`` from the cache.
+
+    AuthenticationMiddleware calls ``get_user`` on every request; caching the
+    row (role included) removes that query from every authenticated page. The
+    entry is dropped when a User save or delete commits (see core.signals),
+    so password, role and is_active changes take effect on the next request.
+    ``QuerySet.update()`` sends no signals: write users through ``save()``,
+    or call ``invalidate_cached_user()`` after the transaction commits.
+    A miss reads the primary even in a replica view: a lagging replica would
+    put the pre-change row back in the cache for USER_CACHE_TIMEOUT.
+
+    With ``AUTH_USER_CACHE`` off (settings: the shared cache is a database
+    table, so a hit would cost a query too) it is a plain ModelBackend.
+    """
+
+    def get_user(self, user_id):
+        if not getattr(settings, "AUTH_USER_CACHE", True):
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        record_cache("user", user is not None)
+        if user is None:
+            with use_replica(False):
+                user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    def user_can_authenticate(self, user):
+        # Lookups go through the default manager, which includes soft-deleted accounts
+        return super().user_can_authenticate(user) and not getattr(user, "is_soft_deleted", False)
+
+    async def aget_user(self, user_id):
+        # request.auser() in async views; ModelBackend's own version would skip the cache
+        return await sync_to_async(self.get_user)(user_id)
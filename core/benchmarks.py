@@ -0,0 +1,358 @@
+# core/benchmarks.py
+"""
+Latency and query-count benchmarks for the core views and services.
+
+Run them with ``manage.py run_benchmarks`` against a dataset built by
+``manage.py generate_fake_data`` so numbers are comparable between runs.
+``run_benchmarks --servers`` compares the tail latency of the dashboards
+served the WSGI way and the ASGI way (``compare_servers()``).
+"""
+import asyncio
+import math
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.test import AsyncClient, Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from core import views, views_async
+from core.models import User, Role, Market, Outlet, Product, Sale, Visit, Payment, StockLedger
+from core.pricing import price_lines
+from core.utils import run_sequentially
+from core.views_agent import search_sales
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+# -------------------
+# Scenarios
+# -------------------
+class Scenario:
+    """A view (``url_name`` + GET params) or service callable run as a user of ``role``."""
+
+    def __init__(self, name, role, url_name=None, params=None, call=None):
+        self.name = name
+        self.role = role
+        self.url_name = url_name
+        self.params = params or {}
+        self.call = call
+
+    def execute(self, user, client):
+        if self.call is not None:
+            return self.call(user)
+        response = client.get(reverse(self.url_name), self.params)
+        if response.status_code != 200:
+            raise BenchmarkError(f"{self.name}: HTTP {response.status_code} for {user.username}")
+        return response
+
+    async def aexecute(self, user, client):
+        """Same through the ASGI handler (``client`` is an AsyncClient)."""
+        if self.call is not None:
+            return await sync_to_async(self.call, thread_sensitive=False)(user)
+        response = await client.get(reverse(self.url_name), self.params)
+        if response.status_code != 200:
+            raise BenchmarkError(f"{self.name}: HTTP {response.status_code} for {user.username}")
+        return response
+
+
+def _sale_list(agent, query=""):
+    # agent/sales_list.html is not routed yet; time its queryset plus the
+    # attributes the template renders for every row.
+    for sale in search_sales(agent, query):
+        sale.market.name, sale.pack.product.name, sale.pack.label
+
+
+def _price_cart(agent, size=10_000):
+    # A batch of ``size`` lines cycled from the agent's recent sales: one
+    # price_lines() call, so lines/s = size / latency
+    recent = list(
+        Sale.objects.filter(agent=agent).order_by("-timestamp")
+        .values("pack_id", "market_id", "quantity", "promo_code__code")[:200]
+    )
+    lines = [
+        {"pack": s["pack_id"], "market": s["market_id"], "quantity": s["quantity"], "promo_code": s["promo_code__code"]}
+        for s in recent
+    ]
+    if lines:
+        price_lines([lines[i % len(lines)] for i in range(size)])
+
+
+SCENARIOS = [
+    Scenario("agent_dashboard", Role.AGENT, url_name="agent_dashboard"),
+    Scenario("manager_dashboard", Role.MANAGER, url_name="manager_dashboard"),
+    Scenario("admin_dashboard", Role.ADMIN, url_name="admin_dashboard"),
+    Scenario("sale_list", Role.AGENT, call=_sale_list),
+    Scenario("sale_list_search", Role.AGENT, call=partial(_sale_list, query="green")),
+    Scenario("product_list", Role.ADMIN, url_name="product_list"),
+    Scenario("market_list", Role.ADMIN, url_name="market_list"),
+    Scenario("outlet_list", Role.ADMIN, url_name="outlet_list"),
+    Scenario("price_cart_10k", Role.AGENT, call=_price_cart),
+]
+
+
+def benchmark_users():
+    """The users each role's scenarios run as: the busiest agent and manager, and an admin."""
+    admin = User.objects.filter(role=Role.ADMIN, is_active=True).first()
+    if admin is None:
+        admin = User.objects.create_user("bench_admin", role=Role.ADMIN, password=None)
+
+    busiest = Sale.objects.values("agent").annotate(n=Count("id")).order_by("-n").first()
+    agent = User.objects.get(pk=busiest["agent"]) if busiest else None
+    manager = (
+        User.objects.filter(role=Role.MANAGER)
+        .annotate(n=Count("team")).order_by("-n").first()
+    )
+    return {Role.ADMIN: admin, Role.AGENT: agent, Role.MANAGER: manager}
+
+
+def dataset_size():
+    return {
+        model.__name__: model.objects.count()
+        for model in (User, Market, Outlet, Product, Visit, Sale, Payment, StockLedger)
+    }
+
+
+# -------------------
+# Runner
+# -------------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(scenario, user, iterations, warmup, concurrency=1):
+    client = Client()
+    client.force_login(user)
+
+    for _ in range(warmup):
+        scenario.execute(user, client)
+
+    # Count queries on a separate pass so the wrapper stays out of the timings.
+    # (CaptureQueriesContext can't be used: the client's request_started
+    # signal resets connection.queries_log mid-request.) Async views' queries
+    # are kept on this thread for the pass so the wrapper sees them.
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record), run_sequentially():
+        scenario.execute(user, client)
+
+    if concurrency > 1:
+        timings = async_to_sync(_concurrent_timings)(scenario, user, client.cookies, iterations, concurrency)
+    else:
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            scenario.execute(user, client)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        "user": user.username,
+        "queries": len(queries),
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p90_ms": round(percentile(timings, 90), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+async def _concurrent_timings(scenario, user, cookies, iterations, concurrency):
+    """
+    Per-request latency with ``concurrency`` requests in flight at a time,
+    served by the ASGI handler as under an ASGI server: sync views take
+    turns on its single sync thread, async views overlap.
+    """
+    client = AsyncClient()
+    client.cookies = cookies
+
+    async def timed():
+        started = time.perf_counter()
+        await scenario.aexecute(user, client)
+        return (time.perf_counter() - started) * 1000
+
+    timings = []
+    for _ in range(iterations):
+        timings += await asyncio.gather(*(timed() for _ in range(concurrency)))
+    return timings
+
+
+def run_benchmarks(scenarios, iterations=20, warmup=2, concurrency=1, on_result=None):
+    users = benchmark_users()
+    results = {}
+    for scenario in scenarios:
+        user = users.get(scenario.role)
+        if user is None:
+            results[scenario.name] = {"skipped": f"no {scenario.role} user in the dataset"}
+        else:
+            results[scenario.name] = run_scenario(scenario, user, iterations, warmup, concurrency)
+        if on_result:
+            on_result(scenario.name, results[scenario.name])
+
+    return {
+        "meta": {
+            "timestamp": timezone.now().isoformat(),
+            "commit": _git_commit(),
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "dataset": dataset_size(),
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "async_views": settings.ASYNC_VIEWS,
+        },
+        "results": results,
+    }
+
+
+# -------------------
+# ASGI vs WSGI
+# -------------------
+SERVER_SCENARIOS = {
+    "agent_dashboard": Role.AGENT,
+    "manager_dashboard": Role.MANAGER,
+    "admin_dashboard": Role.ADMIN,
+}
+
+
+def _view_request(user):
+    request = RequestFactory().get("/")
+    request.user = user
+
+    async def auser():
+        return user
+
+    request.auser = auser
+    return request
+
+
+def _latencies(timings):
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def _wsgi_timings(view, user, waves, concurrency, threads):
+    """
+    ``concurrency`` requests at a time on ``threads`` worker threads, like a
+    gunicorn gthread worker: a request waits for a free thread, and that wait
+    counts towards its latency.
+    """
+    def serve(issued):
+        try:
+            response = view(_view_request(user))
+            if response.status_code != 200:
+                raise BenchmarkError(f"{view.__name__}: HTTP {response.status_code} for {user.username}")
+            return (time.perf_counter() - issued) * 1000
+        finally:
+            close_old_connections()  # as at the end of a WSGI request
+
+    timings = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(waves):
+            issued = time.perf_counter()
+            timings += pool.map(serve, [issued] * concurrency)
+    return timings
+
+
+async def _asgi_timings(view, user, waves, concurrency):
+    """``concurrency`` requests at a time on one event loop, each in its own sync context as under ASGIHandler."""
+    async def serve():
+        issued = time.perf_counter()
+        async with ThreadSensitiveContext():
+            response = await view(_view_request(user))
+        if response.status_code != 200:
+            raise BenchmarkError(f"{view.__name__}: HTTP {response.status_code} for {user.username}")
+        return (time.perf_counter() - issued) * 1000
+
+    timings = []
+    for _ in range(waves):
+        timings += await asyncio.gather(*(serve() for _ in range(concurrency)))
+    return timings
+
+
+def compare_servers(names=tuple(SERVER_SCENARIOS), waves=20, concurrency=16, threads=4, on_result=None):
+    """
+    Latency percentiles of each dashboard under concurrent load, served by
+    its sync view the WSGI way and by its async view the ASGI way, whatever
+    ASYNC_VIEWS says. Both call the views directly (no middleware), so the
+    difference is the serving model: threads in a pool vs overlapping
+    queries on an event loop. Overlap needs database round trips to hide;
+    on SQLite run_concurrently() runs queries one by one.
+    """
+    users = benchmark_users()
+    results = {}
+    for name in names:
+        user = users.get(SERVER_SCENARIOS[name])
+        if user is None:
+            results[name] = {"skipped": f"no {SERVER_SCENARIOS[name]} user in the dataset"}
+        else:
+            sync_view, async_view = getattr(views, name), getattr(views_async, name)
+            sync_view(_view_request(user))  # warm the caches both variants share
+            results[name] = {
+                "wsgi": _latencies(_wsgi_timings(sync_view, user, waves, concurrency, threads)),
+                "asgi": _latencies(async_to_sync(_asgi_timings)(async_view, user, waves, concurrency)),
+            }
+        if on_result:
+            on_result(name, results[name])
+    return {
+        "meta": {
+            "timestamp": timezone.now().isoformat(),
+            "commit": _git_commit(),
+            "database": connection.vendor,
+            "dataset": dataset_size(),
+            "waves": waves,
+            "concurrency": concurrency,
+            "threads": threads,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Regressions of ``current`` against ``baseline``: latency (p50/p95) more
+    than ``threshold`` slower, or any increase in query count.
+    """
+    regressions = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "skipped" in base or "skipped" in cur:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if cur[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {base[metric]:.1f} -> {cur[metric]:.1f}")
+        if cur["queries"] > base["queries"]:
+            regressions.append(f"{name}: queries {base['queries']} -> {cur['queries']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,139 @@
+# core/cache.py
+"""
+Namespaced, versioned cache keys with single-flight rebuilds.
+
+Keys live in a namespace (``catalog``, ``price``, ``kpi``, ``team``, ``reports``) whose
+current version is itself a cache entry; ``bump()`` moves the namespace to a
+new version, which orphans every key built under the old one at once (they
+age out by timeout). Writers bump from core.signals.
+
+A namespace can be scoped with a suffix, e.g. ``kpi:agent:<id>``: a scope
+has its own version, so bumping one agent's KPIs leaves every other agent's
+alone. A key can also ``depend`` on further scopes (a team's stats on each
+member's), and is then invalidated by a bump of any of them.
+
+``get_or_build()`` caches a computed value and makes sure that when the key
+is cold or stale only one caller (across all worker processes) recomputes it:
+the others serve the stale value, or briefly wait for the fresh one.
+"""
+import hashlib
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+
+from core.metrics import record_cache
+
+NAMESPACES = ("catalog", "price", "kpi", "team", "reports")
+
+STALE_GRACE = 60 * 10   # how long past its timeout a value may still be served while rebuilding
+LOCK_TIMEOUT = 30       # a crashed builder stops blocking others after this
+BUILD_WAIT = 5.0        # how long callers wait on someone else's build of a cold key
+POLL_INTERVAL = 0.05
+
+
+# -------------------
+# Versioned keys
+# -------------------
+def _version_key(namespace):
+    if namespace.partition(":")[0] not in NAMESPACES:
+        raise ValueError(f"Unknown cache namespace: {namespace!r}")
+    return f"ns:{namespace}"
+
+
+def _new_version():
+    # Time-based so a version entry lost to eviction never restarts at a value
+    # whose keys may still be cached
+    return time.time_ns() // 1000
+
+
+def namespace_versions(namespaces):
+    """Current versions of ``namespaces`` (in order), in one cache round trip when all are set."""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]  # None when nothing is cached (DummyCache)
+
+
+def namespace_version(namespace):
+    return namespace_versions([namespace])[0]
+
+
+def version_tag(namespace, depends=()):
+    """The version part of ``make_key()``: changes when ``namespace`` or any of ``depends`` is bumped."""
+    if not depends:
+        return f"v{namespace_version(namespace)}"
+    versions = ",".join(map(str, namespace_versions([namespace, *depends])))
+    return "v" + hashlib.sha1(versions.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def make_key(namespace, key, depends=()):
+    return f"{namespace}:{version_tag(namespace, depends)}:{key}"
+
+
+def bump(*namespaces):
+    """Invalidate every key of ``namespaces``."""
+    # A fresh timestamp rather than incr(): BaseCache.incr() re-sets the entry
+    # with the default timeout on the database backend, and concurrent bumps
+    # only need to end on *a* new version
+    cache.set_many({_version_key(namespace): _new_version() for namespace in namespaces}, None)
+
+
+# -------------------
+# Single-flight
+# -------------------
+def get_or_build(namespace, key, build, timeout=300, depends=()):
+    """
+    Return the cached value of ``key`` in ``namespace`` (see ``make_key()``
+    for ``depends``), calling ``build()`` to (re)compute it when missing or
+    older than ``timeout`` seconds.
+
+    Concurrent callers don't rebuild in parallel: the first one takes a lock
+    (``cache.add``, atomic on Redis and on the database backend) and
+    the rest get the stale value if there is one, otherwise they poll for up
+    to BUILD_WAIT seconds before building it themselves.
+    """
+    full_key = make_key(namespace, key, depends)
+    lock_key = f"{full_key}:lock"
+    namespace = namespace.partition(":")[0]  # metrics are labelled per namespace, not per scope
+
+    entry = cache.get(full_key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            record_cache(namespace, True)
+            return value
+        record_cache(namespace, False)
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value  # someone else is refreshing it
+        return _build(full_key, lock_key, build, timeout)
+
+    record_cache(namespace, False)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return _build(full_key, lock_key, build, timeout)
+
+    deadline = time.monotonic() + BUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(full_key)
+        if entry is not None:
+            return entry[0]
+    return build()
+
+
+async def aget_or_build(namespace, key, build, timeout=300, depends=()):
+    """get_or_build() for a coroutine function ``build``."""
+    return await sync_to_async(get_or_build)(namespace, key, async_to_sync(build), timeout, depends)
+
+
+def _build(full_key, lock_key, build, timeout):
+    try:
+        value = build()
+        cache.set(full_key, (value, time.time() + timeout), timeout + STALE_GRACE)
+        return value
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,76 @@
+# core/catalog.py
+"""
+Catalog bundle for the agent app: active products, packs, today's prices,
+markets and outlets in one JSON document.
+
+Agents need all of it to record sales and visits. Instead of loading it
+again on every page, the client downloads the bundle once and keeps it
+until ``version`` changes. The bundle is built once per catalog/price
+version and day, then cached with its gzip and Brotli encodings (see
+``bundle()``). Writers invalidate it through the ``catalog`` and ``price``
+namespaces (core.signals).
+"""
+import gzip
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from core.cache import get_or_build, namespace_version
+from core.models import Market, Outlet, PackSize, PriceList, PriceListStatus, Product
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; the bundle is offered gzipped only without it
+    brotli = None
+
+BUNDLE_TIMEOUT = 60 * 60 * 24
+
+
+def catalog_data(today=None):
+    """The catalog as plain lists of rows (five queries)."""
+    today = today or timezone.localdate()
+    products = Product.objects.filter(is_active=True)
+    packs = PackSize.objects.filter(is_active=True, product__is_active=True)
+    prices = PriceList.objects.filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gte=today),
+        pack__in=packs, status=PriceListStatus.ACTIVE, effective_from__lte=today,
+    )
+    markets = Market.objects.filter(status=True)
+    outlets = Outlet.objects.filter(market__status=True)
+    return {
+        "products": list(products.order_by("name").values("id", "name", "category", "sku")),
+        "packs": list(packs.order_by("product_id", "label").values(
+            "id", "product_id", "label", "packaging_type", "unit", "sku",
+        )),
+        "prices": list(prices.order_by("pack_id", "market_id", "-effective_from").values(
+            "id", "pack_id", "market_id", "unit_price", "tax_rate", "discount_policy",
+            "effective_from", "effective_to",
+        )),
+        "markets": list(markets.order_by("region", "name").values("id", "name", "region", "type")),
+        "outlets": list(outlets.order_by("market_id", "name").values("id", "market_id", "name", "location")),
+    }
+
+
+def build_bundle():
+    """
+    Serialize the catalog and precompress it at maximum level (paid once per
+    version, not per download). ``version`` is a hash of the content, so it
+    only changes when the data does and is the same on every worker.
+    """
+    body = json.dumps(catalog_data(), cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+    encodings = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+    return {
+        "version": hashlib.sha256(body).hexdigest()[:20],
+        "bodies": {"": body, **encodings},
+    }
+
+
+def bundle():
+    """The current bundle, rebuilt after any catalog or price write and at midnight (price validity)."""
+    key = f"bundle:p{namespace_version('price')}:{timezone.localdate().isoformat()}"
+    return get_or_build("catalog", key, build_bundle, timeout=BUNDLE_TIMEOUT)
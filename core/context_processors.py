@@ -0,0 +1,24 @@
+# core/context_processors.py
+from core.cache import NAMESPACES, namespace_version
+
+
+class CacheVersions:
+    """
+    ``{{ cache_versions.kpi }}`` etc.: current version of a core.cache
+    namespace, for ``{% cache %}`` fragments to vary on. Looked up on first
+    use only, so pages without cached fragments pay nothing.
+    """
+
+    def __init__(self):
+        self._versions = {}
+
+    def __getitem__(self, namespace):
+        if namespace not in NAMESPACES:
+            raise KeyError(namespace)
+        if namespace not in self._versions:
+            self._versions[namespace] = namespace_version(namespace)
+        return self._versions[namespace]
+
+
+def cache_versions(request):
+    return {"cache_versions": CacheVersions()}
@@ -0,0 +1,59 @@
+# core/db_routers.py
+"""
+Read-replica routing.
+
+Writes always go to ``default``. Reads go to the ``replica`` alias only
+inside a reporting context: a view listed in ``REPLICA_VIEWS`` (entered by
+``ReplicaRoutingMiddleware``) or an explicit ``use_replica()`` block in a
+command or service. Without a ``replica`` entry in ``DATABASES`` everything
+stays on ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA = "replica"
+
+_reading_from_replica = ContextVar("reading_from_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Route the reads issued inside the block to the replica (if one is configured)."""
+    token = _reading_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+def route_reads_to_replica():
+    """Send the remaining reads of the current request/task to the replica."""
+    _reading_from_replica.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == "django_cache":
+            return "default"  # the database cache: a lagging copy would serve old namespace versions
+        if _reading_from_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        if {obj1._state.db, obj2._state.db} <= {None, "default", REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of default; it is never migrated directly
+        return db != REPLICA
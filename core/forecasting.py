@@ -0,0 +1,201 @@
+# core/forecasting.py
+"""
+Weekly demand forecasts per (pack, market) from daily sales.
+
+Each series gets damped-trend exponential smoothing with additive weekday
+seasonality (Holt-Winters, period 7). Smoothing is a recurrence over days,
+so the loop runs over days while each step updates every series at once as
+NumPy vectors. A run reads the sales history in one grouped query, pivoted
+into a (series x day) matrix, so thousands of series cost about the same
+number of Python steps as one (memory: 8 bytes per series and day).
+
+After a run, each series' state (level, trend, weekday offsets and error)
+is kept in ``ForecastState``. The forecast for the next ``weeks`` Monday
+weeks is written to ``DemandForecast``; only weeks expecting a sale are
+stored, so a missing row means zero.
+
+An incremental run doesn't reload history. It folds the days since each
+series' ``as_of`` into its saved state and fits only series that are new.
+Sales recorded late for days already folded in are picked up by the next
+full run (``forecast_demand`` without ``--incremental``, e.g. weekly).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import DemandForecast, ForecastState
+from core.reports import load_daily, weekday_of
+
+ALPHA = 0.2   # level
+BETA = 0.02   # trend
+GAMMA = 0.1   # weekday seasonality
+PHI = 0.95    # trend damping per day ahead
+ERROR_DECAY = 0.05
+HISTORY_DAYS = 365
+WEEKS = 8
+SERIES = ("pack_id", "market_id")
+
+
+# -------------------
+# Smoothing
+# -------------------
+def initial_state(matrix):
+    """
+    Starting state per row: level at the mean of the first week after its
+    first sale, no trend, flat weekdays. Returns ``(state, start)``, where
+    ``start`` is the column each row starts smoothing from.
+    """
+    count, length = matrix.shape
+    sold = matrix > 0
+    start = np.where(sold.any(axis=1), sold.argmax(axis=1), length)
+    totals = np.concatenate([np.zeros((count, 1)), np.cumsum(matrix, axis=1)], axis=1)
+    end = np.minimum(start + 7, length)
+    rows = np.arange(count)
+    level = (totals[rows, end] - totals[rows, start]) / np.maximum(end - start, 1)
+    return (level, np.zeros(count), np.zeros((count, 7)), np.zeros(count)), start
+
+
+def smooth(matrix, weekdays, state, start):
+    """
+    Fold the days (columns) of ``matrix`` into ``state``, ``(level, trend,
+    seasonal, error)`` arrays with one entry per row. Row ``i`` only takes
+    columns from ``start[i]`` on. ``weekdays`` gives each column's weekday.
+    """
+    level, trend, seasonal, error = (np.array(part, dtype=float) for part in state)
+    rows = np.arange(len(level))
+    for t in range(matrix.shape[1]):
+        actual, day = matrix[:, t], weekdays[t]
+        active = start <= t
+        offset = seasonal[:, day]
+        expected = level + PHI * trend
+        new_level = ALPHA * (actual - offset) + (1 - ALPHA) * expected
+        new_error = ERROR_DECAY * np.abs(actual - np.maximum(expected + offset, 0)) + (1 - ERROR_DECAY) * error
+        trend = np.where(active, BETA * (new_level - level) + (1 - BETA) * PHI * trend, trend)
+        seasonal[rows, day] = np.where(active, GAMMA * (actual - new_level) + (1 - GAMMA) * offset, offset)
+        level = np.where(active, new_level, level)
+        error = np.where(active, new_error, error)
+    return level, trend, seasonal, error
+
+
+def weekly_forecast(state, after, weeks):
+    """
+    Forecast ``weeks`` Monday weeks following day ``after``. Returns
+    ``(week_starts, quantity, error)``: the weeks' dates and two
+    ``rows x weeks`` arrays (units, and the expected absolute error).
+    """
+    level, trend, seasonal, error = state
+    lead = (7 - (after.weekday() + 1)) % 7  # days before the first Monday
+    ahead = np.arange(1, lead + 7 * weeks + 1)
+    days = np.datetime64(after) + ahead
+    damping = np.cumsum(PHI ** ahead)
+    daily = level[:, None] + trend[:, None] * damping + seasonal[:, weekday_of(days)]
+    daily = np.maximum(daily, 0)[:, lead:]
+    quantity = daily.reshape(len(level), weeks, 7).sum(axis=2)
+    week_starts = [after + timedelta(days=lead + 1 + 7 * week) for week in range(weeks)]
+    return week_starts, quantity, np.repeat(error[:, None] * 7, weeks, axis=1)
+
+
+# -------------------
+# Runs
+# -------------------
+def _state_arrays(states):
+    return (
+        np.array([state.level for state in states]),
+        np.array([state.trend for state in states]),
+        np.array([state.seasonal for state in states], dtype=float).reshape(len(states), 7),
+        np.array([state.error for state in states]),
+    )
+
+
+def _fit(through, history_days, incremental):
+    """``(series, state)``: saved states brought up to ``through``, plus new series fitted."""
+    saved = list(ForecastState.objects.order_by("pack", "market")) if incremental else []
+    history_start = through - timedelta(days=history_days - 1)
+    since = min(state.as_of for state in saved) + timedelta(days=1) if saved else history_start
+    first = min(since, history_start)
+    keys, days, matrix = load_daily(SERIES, "quantity", first, through)  # the only read of sales
+    weekdays = weekday_of(days)
+    series, parts = [], []
+
+    if saved:
+        row_of = {key: i for i, key in enumerate(keys)}
+        offset = min((since - first).days, len(days))
+        recent = np.zeros((len(saved), len(days) - offset))
+        for i, state in enumerate(saved):
+            row = row_of.get((state.pack_id, state.market_id))
+            if row is not None:
+                recent[i] = matrix[row, offset:]
+        start = np.array([(state.as_of - since).days + 1 for state in saved])
+        parts.append(smooth(recent, weekdays[offset:], _state_arrays(saved), start))
+        series += [(state.pack_id, state.market_id) for state in saved]
+        # New series: sold since the earliest saved state, but have none of their own
+        known = set(series)
+        fresh = [i for i, key in enumerate(keys) if key not in known and matrix[i, offset:].any()]
+        keys, matrix = [keys[i] for i in fresh], matrix[fresh]
+
+    if keys:
+        offset = (history_start - first).days
+        state, start = initial_state(matrix[:, offset:])
+        parts.append(smooth(matrix[:, offset:], weekdays[offset:], state, start))
+        series += keys
+    if not parts:
+        return [], None
+    return series, tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def _save(series, state, through, weeks, incremental):
+    """Write the states and replace the forecasts, in one transaction."""
+    level, trend, seasonal, error = state
+    states = [
+        ForecastState(
+            pack_id=pack, market_id=market, level=float(level[i]), trend=float(trend[i]),
+            seasonal=seasonal[i].tolist(), error=float(error[i]), as_of=through,
+        )
+        for i, (pack, market) in enumerate(series)
+    ]
+    week_starts, quantity, spread = weekly_forecast(state, through, weeks)
+    quantity, spread = quantity.round(2), spread.round(2)
+    rows, cols = np.nonzero(quantity > 0)
+    forecasts = [
+        DemandForecast(
+            pack_id=series[i][0], market_id=series[i][1], week_start=week_starts[w],
+            quantity=Decimal(str(quantity[i, w])), error=Decimal(str(spread[i, w])), as_of=through,
+        )
+        for i, w in zip(rows.tolist(), cols.tolist())
+    ]
+    with transaction.atomic():
+        if not incremental:
+            # A full run drops series that no longer sell
+            ForecastState.objects.all().delete()
+        ForecastState.objects.bulk_create(
+            states, batch_size=2000, update_conflicts=True, unique_fields=["pack", "market"],
+            update_fields=["level", "trend", "seasonal", "error", "as_of", "updated_at"],
+        )
+        # Every series with forecasts has a state, and every state was just refitted
+        DemandForecast.objects.all().delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=2000)
+    return len(forecasts)
+
+
+def forecast_demand(weeks=WEEKS, history_days=HISTORY_DAYS, incremental=False, through=None):
+    """
+    Forecast every (pack, market) series' weekly demand from sales up to
+    ``through`` (default yesterday, the last complete day). Returns
+    ``{"packs", "series", "forecasts"}`` counts.
+    """
+    through = through or timezone.localdate() - timedelta(days=1)
+    series, state = _fit(through, history_days, incremental)
+    if not series:
+        if not incremental:
+            with transaction.atomic():
+                ForecastState.objects.all().delete()
+                DemandForecast.objects.all().delete()
+        return {"packs": 0, "series": 0, "forecasts": 0}
+    return {
+        "packs": len({pack for pack, _ in series}),
+        "series": len(series),
+        "forecasts": _save(series, state, through, weeks, incremental),
+    }
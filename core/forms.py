@@ -1,5 +1,6 @@
 from django import forms
 from core.models import Product, PackSize, PriceList, Market, Outlet
+from core.pricing import PolicyError, validate_policy
 
 class ProductForm(forms.ModelForm):
     class Meta:
@@ -18,6 +19,19 @@ class PriceListForm(forms.ModelForm):
         model = PriceList
         fields = ["pack", "market", "unit_price", "tax_rate", "discount_policy", "effective_from", "effective_to", "status"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # pack choice labels include the product name
+        self.fields["pack"].queryset = PackSize.objects.select_related("product")
+
+    def clean_discount_policy(self):
+        policy = self.cleaned_data.get("discount_policy")
+        try:
+            validate_policy(policy)
+        except PolicyError as exc:
+            raise forms.ValidationError(str(exc))
+        return policy
+
 class MarketForm(forms.ModelForm):
     class Meta:
         model = Market
@@ -27,4 +41,9 @@ class MarketForm(forms.ModelForm):
 class OutletForm(forms.ModelForm):
     class Meta:
         model = Outlet
-        fields = ["market", "name", "owner_name", "contact_phone", "location", "descriptor"]
\ No newline at end of file
+        fields = ["market", "name", "owner_name", "contact_phone", "location", "descriptor"]
+
+
+class StatementUploadForm(forms.Form):
+    statement = forms.FileField(help_text="M-Pesa statement CSV as exported from the org portal.")
+    dry_run = forms.BooleanField(required=False, help_text="Report only; don't mark any payment completed.")
@@ -0,0 +1,86 @@
+# core/management/commands/bench_uuid_inserts.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from core.utils import uuid7
+
+GENERATORS = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput of random (v4) and time-ordered (v7) UUID "
+        "primary keys on the configured database (SQLite or PostgreSQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--keep", action="store_true", help="Keep the scratch tables afterwards.")
+
+    def handle(self, *args, **opts):
+        connection = connections[opts["database"]]
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        self.stdout.write(
+            f"Inserting {opts['rows']:,} rows per variant on {connection.vendor} "
+            f"(batch {opts['batch_size']:,})"
+        )
+        for name, generate in GENERATORS.items():
+            table = f"bench_uuid_{name}"
+            self._create_table(connection, table)
+            try:
+                elapsed = self._insert(connection, table, generate, opts["rows"], opts["batch_size"])
+                index_size = self._index_size(connection, table)
+            finally:
+                if not opts["keep"]:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+            line = f"  {name}: {elapsed:8.2f}s  {opts['rows'] / elapsed:12,.0f} rows/s"
+            if index_size is not None:
+                line += f"  pk index {index_size / 1024 / 1024:8.1f} MiB"
+            self.stdout.write(line)
+
+    # -------------------
+    # Helpers
+    # -------------------
+    def _create_table(self, connection, table):
+        # Mirror how Django stores UUIDField: char(32) on SQLite, native uuid on PostgreSQL
+        id_type = "uuid" if connection.vendor == "postgresql" else "char(32)"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} (id {id_type} PRIMARY KEY, agent_seq integer NOT NULL, "
+                f"quantity integer NOT NULL)"
+            )
+
+    def _insert(self, connection, table, generate, rows, batch_size):
+        as_db_value = str if connection.vendor == "postgresql" else (lambda value: value.hex)
+        sql = f"INSERT INTO {table} (id, agent_seq, quantity) VALUES (%s, %s, %s)"
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            size = min(batch_size, rows - start)
+            batch = [(as_db_value(generate()), (start + i) % 500, 1) for i in range(size)]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        return time.perf_counter() - started
+
+    def _index_size(self, connection, table):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"SELECT pg_relation_size('{table}_pkey')")
+                return cursor.fetchone()[0]
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s",
+                    [f"sqlite_autoindex_{table}_1"],
+                )
+            except Exception:
+                return None  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+            return cursor.fetchone()[0]
@@ -0,0 +1,397 @@
+# core/management/commands/generate_fake_data.py
+import math
+import random
+import string
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import (
+    User, Role, Product, PackSize, PriceList, Market, Outlet,
+    Visit, Sale, Payment, Return, Allocation, StockLedger,
+    VisitPurpose, PaymentMethod, PaymentStatus, MovementType, ReturnStatus,
+)
+from core.receivables import refresh_aging
+from core.utils import uuid7
+
+# Roughly 10M rows in total at "large" (visits + sales + payments + ledger)
+SCALES = {
+    "small": dict(markets=60, outlets=4, managers=3, agents=30, days=90, visits_per_day=6),
+    "medium": dict(markets=1000, outlets=5, managers=15, agents=250, days=365, visits_per_day=6),
+    "large": dict(markets=3000, outlets=6, managers=40, agents=800, days=365, visits_per_day=7),
+}
+
+REGIONS = [
+    "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Nyeri", "Meru", "Kericho",
+    "Machakos", "Kakamega", "Thika", "Malindi", "Garissa", "Kitale", "Embu", "Bomet",
+]
+MARKET_TYPES = [("URBAN", 45), ("RURAL", 30), ("SUPERMARKET", 15), ("WHOLESALE", 10)]
+PRODUCTS = [
+    ("Tarmata Green", "GREEN"), ("Tarmata Black", "BLACK"), ("Highland Gold", "BLACK"),
+    ("Mint Green", "GREEN"), ("Chai Masala", "BLACK"), ("Lemon Green", "GREEN"),
+]
+PACKS = [("40g", "SINGLE", "g", 60), ("80g", "SINGLE", "g", 110), ("250g", "SINGLE", "g", 320),
+         ("36 pieces", "BOX", "pcs", 1900)]
+PAYMENT_METHODS = [(PaymentMethod.CASH, 45), (PaymentMethod.MPESA, 40), (PaymentMethod.CREDIT, 10),
+                   (PaymentMethod.CARD, 5)]
+PAYMENT_STATUSES = [(PaymentStatus.COMPLETED, 92), (PaymentStatus.PENDING, 5), (PaymentStatus.FAILED, 3)]
+REF_ALPHABET = string.ascii_uppercase + string.digits
+WEEKDAY_FACTOR = [1.0, 1.0, 1.0, 1.0, 1.1, 0.6, 0.2]  # Mon..Sun
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+
+# Flush order respects FK dependencies (Django FKs are deferred until commit)
+FLUSH_ORDER = [Visit, Sale, Payment, Return, Allocation, StockLedger]
+
+
+def _converter(field):
+    """Fast path from a Python value to the DB parameter for the hot column types."""
+    target = field.target_field if field.is_relation else field
+    kind = target.get_internal_type()
+    if connection.vendor == "sqlite":
+        if kind == "UUIDField":
+            return lambda value: value.hex
+        if kind == "DateTimeField":
+            # the same instant is written to several columns/rows (timestamp, created_at, ...)
+            return lru_cache(maxsize=4096)(
+                lambda value: value.astimezone(dt_timezone.utc).replace(tzinfo=None).isoformat(" ")
+            )
+    if kind in ("UUIDField", "DateTimeField", "IntegerField", "BooleanField", "CharField",
+                "TextField", "DecimalField"):
+        return None  # the driver adapts these natively
+    return lambda value: field.get_db_prep_save(value, connection)
+
+
+class BulkWriter:
+    """
+    Buffers rows per model and writes them with one precompiled INSERT per
+    batch via ``executemany``, parents first.
+
+    This skips the ORM's per-value SQL compilation, which dominates
+    ``bulk_create`` at millions of rows, and lets rows carry their simulated
+    ``created_at``/``updated_at`` instead of the ``auto_now`` stamp.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = defaultdict(list)
+        self.counts = defaultdict(int)
+        self._plans = {}
+
+    def _plan(self, model):
+        plan = self._plans.get(model)
+        if plan is None:
+            qn = connection.ops.quote_name
+            fields = [f for f in model._meta.concrete_fields if not f.generated]
+            sql = "INSERT INTO {} ({}) VALUES ({})".format(
+                qn(model._meta.db_table),
+                ", ".join(qn(f.column) for f in fields),
+                ", ".join(["%s"] * len(fields)),
+            )
+            columns = [(f.attname, f.get_default(), _converter(f)) for f in fields]
+            plan = self._plans[model] = (sql, columns)
+        return plan
+
+    def add(self, model, **values):
+        _, columns = self._plan(model)
+        row = []
+        for attname, default, convert in columns:
+            value = values.get(attname, default)
+            row.append(convert(value) if convert is not None and value is not None else value)
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in FLUSH_ORDER:
+                buffer = self.buffers[model]
+                if buffer:
+                    cursor.executemany(self._plan(model)[0], buffer)
+                    self.counts[model.__name__] += len(buffer)
+                    buffer.clear()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a realistic, seeded dataset (markets, outlets, managers, agents, visits, "
+        "sales, payments, returns, allocations and stock ledger) through bulk inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=SCALES, default="small")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--markets", type=int)
+        parser.add_argument("--agents", type=int)
+        parser.add_argument("--managers", type=int)
+        parser.add_argument("--days", type=int)
+        parser.add_argument("--visits-per-day", type=float, help="Mean visits per agent per working day.")
+        parser.add_argument("--append", action="store_true", help="Allow running against a non-empty database.")
+
+    def handle(self, *args, **opts):
+        config = dict(SCALES[opts["scale"]])
+        for key in ("markets", "agents", "managers", "days", "visits_per_day"):
+            if opts[key] is not None:
+                config[key] = opts[key]
+        if Sale.objects.exists() and not opts["append"]:
+            raise CommandError("Database already has sales; pass --append to add to it.")
+
+        self.rng = random.Random(opts["seed"])
+        self.tag = f"{opts['seed']}{int(time.time()) % 100000:05d}"
+        self.writer = BulkWriter(opts["batch_size"])
+        self.slip_seq = 0
+        started = time.perf_counter()
+
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:  # SQLite refuses these in a transaction
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=OFF")
+
+        self.stdout.write(f"Generating '{opts['scale']}' dataset: {config}")
+        self._catalog()
+        self._markets(config["markets"], config["outlets"])
+        self._people(config["managers"], config["agents"])
+        self._activity(config["days"], config["visits_per_day"])
+        self.writer.flush()
+        refresh_aging()  # the raw inserts skip the receivables signals
+
+        elapsed = time.perf_counter() - started
+        total = sum(self.writer.counts.values())
+        for name, count in sorted(self.writer.counts.items()):
+            self.stdout.write(f"  {name:<12} {count:>12,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {total:,} activity rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"
+        ))
+
+    # -------------------
+    # Reference data
+    # -------------------
+    def _catalog(self):
+        today = timezone.localdate()
+        self.packs = []
+        for name, category in PRODUCTS:
+            product, _ = Product.objects.get_or_create(
+                name=name, category=category, defaults={"sku": f"P-{name.upper().replace(' ', '-')}"},
+            )
+            for label, packaging, unit, price in PACKS:
+                pack, created = PackSize.objects.get_or_create(
+                    product=product, label=label, packaging_type=packaging,
+                    defaults={"unit": unit, "sku": f"{product.sku}-{label.replace(' ', '')}"},
+                )
+                if created:
+                    PriceList.objects.create(
+                        pack=pack, unit_price=Decimal(price), tax_rate=Decimal("16.00"),
+                        effective_from=today - timedelta(days=3 * 365),
+                    )
+                self.packs.append((pack.id, product.id, Decimal(price)))
+        # Zipf-like popularity: a few packs carry most of the volume
+        self.pack_weights = _cumulative([1 / (i + 1) for i in range(len(self.packs))])
+
+    def _markets(self, count, outlets_per_market):
+        rng = self.rng
+        markets = []
+        for i in range(count):
+            region = REGIONS[i % len(REGIONS)]
+            markets.append(Market(
+                id=uuid7(), name=f"{region} Market {self.tag}-{i:05d}", region=region,
+                type=_weighted(rng, MARKET_TYPES),
+                gps_lat=Decimal(f"{rng.uniform(-4.5, 4.5):.6f}"),
+                gps_long=Decimal(f"{rng.uniform(34.0, 41.5):.6f}"),
+            ))
+        Market.objects.bulk_create(markets, batch_size=self.writer.batch_size)
+
+        outlets = []
+        self.outlets_by_market = defaultdict(list)
+        for market in markets:
+            for j in range(rng.randint(max(1, outlets_per_market // 2), outlets_per_market * 2)):
+                outlet = Outlet(id=uuid7(), market=market, name=f"Outlet {j + 1:03d}",
+                                owner_name=f"Owner {rng.randint(1, 99999)}",
+                                contact_phone=f"07{rng.randint(10_000_000, 99_999_999)}")
+                outlets.append(outlet)
+                self.outlets_by_market[market.id].append(outlet.id)
+        Outlet.objects.bulk_create(outlets, batch_size=self.writer.batch_size)
+
+        self.markets_by_region = defaultdict(list)
+        for market in markets:
+            self.markets_by_region[market.region].append(market.id)
+        self.stdout.write(f"  markets/outlets: {len(markets):,} / {len(outlets):,}")
+
+    def _people(self, manager_count, agent_count):
+        rng = self.rng
+        password = make_password("password")  # hashed once; hashing per user dominates otherwise
+        managers = [
+            User(id=uuid7(), username=f"manager_{self.tag}_{i:03d}", password=password,
+                 role=Role.MANAGER, region=REGIONS[i % len(REGIONS)])
+            for i in range(manager_count)
+        ]
+        User.objects.bulk_create(managers)
+
+        self.agents = []
+        agents = []
+        for i in range(agent_count):
+            manager = managers[i % len(managers)] if managers else None
+            region = manager.region if manager else REGIONS[i % len(REGIONS)]
+            agent = User(id=uuid7(), username=f"agent_{self.tag}_{i:04d}", password=password,
+                         role=Role.AGENT, region=region, manager=manager)
+            agents.append(agent)
+            markets = self.markets_by_region[region]
+            self.agents.append({
+                "id": agent.id,
+                "activity": rng.lognormvariate(0, 0.35),
+                # each agent works a subset of their region's markets, favouring a few
+                "markets": rng.sample(markets, min(len(markets), 25)),
+            })
+            self.agents[-1]["market_weights"] = _cumulative(
+                [1 / (i + 1) for i in range(len(self.agents[-1]["markets"]))]
+            )
+        User.objects.bulk_create(agents, batch_size=self.writer.batch_size)
+        self.stdout.write(f"  managers/agents: {len(managers):,} / {len(agents):,}")
+
+    # -------------------
+    # Activity
+    # -------------------
+    def _activity(self, days, visits_per_day):
+        rng = self.rng
+        tz = timezone.get_current_timezone()
+        start = timezone.localdate() - timedelta(days=days)
+        balances = defaultdict(int)
+        progress_every = max(1, days // 10)
+        add = self.writer.add
+
+        for day_index in range(days):
+            day = start + timedelta(days=day_index)
+            # weekly rhythm plus a December peak
+            season = 1 + 0.2 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+            day_factor = WEEKDAY_FACTOR[day.weekday()] * season
+
+            for agent in self.agents:
+                if day.weekday() == 0 or day_index == 0:
+                    self._allocate(agent, datetime.combine(day, dt_time(6, 30), tzinfo=tz), balances)
+
+                visits_today = max(0, round(rng.gauss(visits_per_day * agent["activity"] * day_factor, 1.5)))
+                for _ in range(visits_today):
+                    when = datetime.combine(day, dt_time(rng.randint(7, 18), rng.randint(0, 59)), tzinfo=tz)
+                    market_id = rng.choices(agent["markets"], cum_weights=agent["market_weights"])[0]
+                    outlets = self.outlets_by_market[market_id]
+                    visit_id = uuid7()
+                    add(
+                        Visit, id=visit_id, agent_id=agent["id"], market_id=market_id,
+                        outlet_id=rng.choice(outlets) if outlets else None,
+                        datetime=when, purpose=rng.choice(VisitPurpose.values),
+                        created_at=when, updated_at=when,
+                    )
+                    for _ in range(_sales_per_visit(rng)):
+                        self._sale(agent, visit_id, market_id, when, balances)
+
+            if (day_index + 1) % progress_every == 0:
+                self.stdout.write(f"  day {day_index + 1}/{days}: {sum(self.writer.counts.values()):,} rows")
+
+    def _allocate(self, agent, when, balances, pack=None, quantity=None):
+        rng = self.rng
+        packs = [pack] if pack else self.packs[:8]
+        for pack_id, product_id, _ in packs:
+            qty = quantity or rng.randint(40, 120)
+            key = (agent["id"], pack_id)
+            balances[key] += qty
+            self.slip_seq += 1
+            allocation_id = uuid7()
+            self.writer.add(
+                Allocation, id=allocation_id, slip_number=f"ALC-{self.tag}-{self.slip_seq:09d}",
+                agent_id=agent["id"], pack_id=pack_id, quantity=qty, processed=True,
+                created_at=when, updated_at=when,
+            )
+            self.writer.add(
+                StockLedger, id=uuid7(), movement_type=MovementType.ALLOCATION, source_ref=allocation_id,
+                agent_id=agent["id"], product_id=product_id, pack_id=pack_id,
+                quantity=qty, balance_after=balances[key], reason_code="weekly allocation",
+                created_at=when, updated_at=when,
+            )
+
+    def _sale(self, agent, visit_id, market_id, visit_time, balances):
+        rng = self.rng
+        add = self.writer.add
+        pack = self.packs[rng.choices(range(len(self.packs)), cum_weights=self.pack_weights)[0]]
+        pack_id, product_id, price = pack
+        quantity = 1 + min(int(rng.expovariate(1 / 4)), 60)
+        when = visit_time + timedelta(minutes=rng.randint(1, 40))
+        key = (agent["id"], pack_id)
+        if balances[key] < quantity:
+            self._allocate(agent, when, balances, pack=pack, quantity=quantity + 50)
+
+        discount = (price * quantity * Decimal("0.05")).quantize(CENT) if rng.random() < 0.1 else ZERO
+        revenue = price * quantity - discount  # Sale.revenue is generated by the DB; needed for the payment
+        method = _weighted(rng, PAYMENT_METHODS)
+        if method == PaymentMethod.CREDIT:
+            status = PaymentStatus.PENDING if rng.random() < 0.7 else PaymentStatus.COMPLETED
+        else:
+            status = _weighted(rng, PAYMENT_STATUSES)
+        processed_at = None
+        if status != PaymentStatus.PENDING:
+            days_later = rng.randint(1, 45) if method == PaymentMethod.CREDIT else 0
+            processed_at = when + timedelta(days=days_later, minutes=rng.randint(0, 120))
+        sale_id = uuid7()
+        add(
+            Sale, id=sale_id, agent_id=agent["id"], market_id=market_id, visit_id=visit_id,
+            pack_id=pack_id, quantity=quantity, unit_price=price, discount_amount=discount,
+            paid_amount=revenue if status == PaymentStatus.COMPLETED else ZERO,
+            timestamp=when, payment_method=method,
+            created_at=when, updated_at=when,
+        )
+
+        balances[key] -= quantity
+        add(
+            StockLedger, id=uuid7(), movement_type=MovementType.SALE, source_ref=sale_id,
+            agent_id=agent["id"], market_id=market_id, product_id=product_id, pack_id=pack_id,
+            quantity=-quantity, balance_after=balances[key], created_at=when, updated_at=when,
+        )
+
+        add(
+            Payment, id=uuid7(), sale_id=sale_id, method=method, amount=revenue, status=status,
+            transaction_ref="".join(rng.choices(REF_ALPHABET, k=10)) if method == PaymentMethod.MPESA else None,
+            processed_at=processed_at, created_at=when, updated_at=processed_at or when,
+        )
+
+        if rng.random() < 0.01:
+            returned = max(1, quantity // 4)
+            balances[key] += returned
+            return_id = uuid7()
+            reason = rng.choice(["damaged", "expired", "wrong pack"])
+            add(
+                Return, id=return_id, agent_id=agent["id"], pack_id=pack_id, quantity=returned,
+                reason_code=reason, status=rng.choice(ReturnStatus.values), processed=True,
+                created_at=when, updated_at=when,
+            )
+            add(
+                StockLedger, id=uuid7(), movement_type=MovementType.RETURN, source_ref=return_id,
+                agent_id=agent["id"], product_id=product_id, pack_id=pack_id,
+                quantity=returned, balance_after=balances[key], reason_code=reason,
+                created_at=when, updated_at=when,
+            )
+
+
+def _cumulative(weights):
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _sales_per_visit(rng):
+    # ~1.5 sales per visit, some visits sell nothing
+    r = rng.random()
+    return 0 if r < 0.15 else 1 if r < 0.55 else 2 if r < 0.85 else 3
@@ -0,0 +1,11 @@
+# core/management/commands/prune_sync_tombstones.py
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync tombstones older than SYNC_TOMBSTONE_DAYS (run daily)."
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"Pruned {prune_tombstones():,} tombstones.")
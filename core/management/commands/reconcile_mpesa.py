@@ -0,0 +1,48 @@
+# core/management/commands/reconcile_mpesa.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.reconciliation import StatementError, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile an M-Pesa statement CSV against pending M-Pesa payments: mark "
+        "matches completed and report unmatched, duplicate and amount-mismatch rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", help="Path to the statement CSV.")
+        parser.add_argument("--dry-run", action="store_true", help="Report only; write nothing.")
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        try:
+            with open(opts["statement"], encoding=opts["encoding"], newline="") as lines:
+                report = reconcile(lines, dry_run=opts["dry_run"])
+        except (OSError, StatementError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{report['statement_rows']:,} statement rows ({report['skipped_rows']:,} skipped) "
+            f"reconciled in {elapsed:.2f}s"
+        )
+        verb = "would be marked" if opts["dry_run"] else "marked"
+        self.stdout.write(self.style.SUCCESS(f"  {report['matched']:,} payments {verb} completed"))
+        self.stdout.write(f"  {report['already_settled']:,} receipts already settled")
+        for label, key, rows in (
+            ("amount mismatches", "amount_mismatch_count", report["amount_mismatches"]),
+            ("duplicate receipts", "duplicate_count", report["duplicates"]),
+            ("receipts with no payment", "unmatched_count", report["unmatched"]),
+        ):
+            if report[key]:
+                self.stdout.write(self.style.WARNING(f"  {report[key]:,} {label}"))
+                for row in rows[:20]:
+                    self.stdout.write("    " + "  ".join(str(value) for value in row))
+        if report["duplicate_payments"]:
+            self.stdout.write(self.style.WARNING(
+                f"  {report['duplicate_payments']:,} pending payments share a receipt with another payment"
+            ))
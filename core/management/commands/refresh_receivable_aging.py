@@ -0,0 +1,19 @@
+# core/management/commands/refresh_receivable_aging.py
+from django.core.management.base import BaseCommand
+
+from core.receivables import refresh_aging, refresh_paid_amounts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the credit aging rollup (run daily: sales move between age buckets overnight)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--paid", action="store_true",
+            help="First recompute every sale's paid amount from its payments (after bulk imports).",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["paid"]:
+            self.stdout.write(f"Corrected the paid amount of {refresh_paid_amounts():,} sales.")
+        self.stdout.write(f"Wrote {refresh_aging():,} agent/market aging rows.")
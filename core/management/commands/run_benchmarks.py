@@ -0,0 +1,105 @@
+# core/management/commands/run_benchmarks.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmarks import SCENARIOS, SERVER_SCENARIOS, compare, compare_servers, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the core views/services against the current dataset, write latency "
+        "percentiles and query counts to JSON and optionally compare with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--concurrency", type=int, default=1,
+                            help="Requests in flight per iteration; above 1 they go through the ASGI handler.")
+        parser.add_argument("--servers", action="store_true",
+                            help="Compare the dashboards' tail latency served WSGI-style (sync views on "
+                                 "--threads threads) and ASGI-style (async views); --concurrency defaults to 16.")
+        parser.add_argument("--threads", type=int, default=4, help="WSGI worker threads for --servers.")
+        parser.add_argument("--no-cache", action="store_true",
+                            help="Swap every cache for a dummy one to time the uncached query path.")
+        parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="Run only these scenarios.")
+        parser.add_argument("--output", default="benchmark-results.json")
+        parser.add_argument("--compare", metavar="BASELINE", help="Results file of a previous run.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Allowed latency slowdown before flagging a regression (0.2 = 20%%).")
+
+    def handle(self, *args, **opts):
+        if opts["servers"]:
+            with override_settings(**self._caches(opts)):
+                return self.compare_servers(opts)
+        scenarios = SCENARIOS
+        if opts["only"]:
+            unknown = set(opts["only"]) - {s.name for s in SCENARIOS}
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = [s for s in SCENARIOS if s.name in opts["only"]]
+
+        self.stdout.write(f"{'scenario':<20} {'queries':>8} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+        with override_settings(**self._caches(opts)):
+            report = run_benchmarks(
+                scenarios, iterations=opts["iterations"], warmup=opts["warmup"],
+                concurrency=opts["concurrency"], on_result=self._print_row,
+            )
+        report["meta"]["cache"] = not opts["no_cache"]
+        Path(opts["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results written to {opts['output']}")
+
+        if opts["compare"]:
+            baseline = json.loads(Path(opts["compare"]).read_text())
+            if baseline.get("meta", {}).get("dataset") != report["meta"]["dataset"]:
+                self.stdout.write(self.style.WARNING("Dataset differs from the baseline; numbers may not be comparable."))
+            regressions = compare(baseline, report, opts["threshold"])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(f"  {line}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {opts['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def _caches(self, opts):
+        if not opts["no_cache"]:
+            return {}
+        dummy = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        return {"CACHES": {alias: dummy for alias in settings.CACHES}}
+
+    def compare_servers(self, opts):
+        names = opts["only"] or list(SERVER_SCENARIOS)
+        unknown = set(names) - SERVER_SCENARIOS.keys()
+        if unknown:
+            raise CommandError(f"Unknown dashboard(s): {', '.join(sorted(unknown))}")
+        concurrency = opts["concurrency"] if opts["concurrency"] > 1 else 16
+        self.stdout.write(f"{'dashboard':<20} {'server':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+        report = compare_servers(
+            names, waves=opts["iterations"], concurrency=concurrency, threads=opts["threads"],
+            on_result=self._print_servers,
+        )
+        Path(opts["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results written to {opts['output']}")
+
+    def _print_servers(self, name, result):
+        if "skipped" in result:
+            self.stdout.write(f"{name:<20} skipped: {result['skipped']}")
+            return
+        for server in ("wsgi", "asgi"):
+            r = result[server]
+            self.stdout.write(
+                f"{name:<20} {server:>6} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+                f"{r['p99_ms']:>10.2f} {r['max_ms']:>10.2f}"
+            )
+
+    def _print_row(self, name, result):
+        if "skipped" in result:
+            self.stdout.write(f"{name:<20} skipped: {result['skipped']}")
+            return
+        self.stdout.write(
+            f"{name:<20} {result['queries']:>8} {result['p50_ms']:>10.2f} "
+            f"{result['p95_ms']:>10.2f} {result['max_ms']:>10.2f}"
+        )
@@ -0,0 +1,307 @@
+# core/metrics.py
+"""
+Minimal Prometheus metrics for TTDMS (text exposition format 0.0.4).
+
+Every worker process keeps its counters and histograms in memory. Recording
+one is a dict update under a lock. When ``METRICS_DIR`` is set, each process
+also writes its snapshot to ``<METRICS_DIR>/<pid>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds. ``/metrics`` sums the snapshots of all
+workers, so one scrape covers the whole gunicorn pool. Snapshots left by
+workers that have exited (recycled by max_requests, or crashed) are folded
+into ``retired.json`` at scrape time, so counters never go backwards and the
+directory holds one file per live worker. Gauges that come from the database
+(e.g. the sync backlog) are computed at scrape time instead.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, and no gunicorn pool to merge (see _directory_lock)
+    fcntl = None
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RETIRED = "retired.json"  # totals of workers that have exited
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._last_flush = 0.0
+
+    # -------------------
+    # Registration
+    # -------------------
+    def counter(self, name, help_text, labels=()):
+        self._meta[name] = ("counter", help_text, None)
+        return Counter(self, name, tuple(labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+        return Histogram(self, name, tuple(labels), tuple(buckets))
+
+    def collector(self, func):
+        """Register ``func() -> [(name, type, help, [(labels_dict, value), ...])]`` run at scrape time."""
+        self._collectors.append(func)
+        return func
+
+    # -------------------
+    # Recording
+    # -------------------
+    def _inc(self, key, amount):
+        with self._lock:
+            self._counters[key] += amount
+
+    def _observe(self, key, buckets, value):
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    # -------------------
+    # Cross-process snapshots
+    # -------------------
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(state)] for (name, labels), state in self._histograms.items()],
+            }
+
+    def maybe_flush(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+            return
+        self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        _write_json(Path(directory), f"{os.getpid()}.json", self.snapshot())
+
+    def _collect(self, directory):
+        """Every worker's snapshot, after folding those of exited workers into ``retired.json``."""
+        if fcntl is not None:  # os.kill(pid, 0) sends CTRL_C_EVENT on Windows
+            for path in directory.glob("*.json"):
+                if path.stem.isdigit() and not _alive(int(path.stem)):
+                    _retire(directory, path)
+        snapshots = []
+        # Shared lock: a snapshot can't move into retired.json while it is being read
+        with _directory_lock(directory, exclusive=False):
+            for path in directory.glob("*.json"):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def _merged(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return _combine([self.snapshot()])
+        self.flush(directory)
+        return _combine(self._collect(Path(directory)))
+
+    # -------------------
+    # Exposition
+    # -------------------
+    def render(self):
+        counters, histograms = self._merged()
+        by_name = defaultdict(list)
+        for (name, labels), value in counters.items():
+            by_name[name].append((labels, value))
+        for (name, labels), state in histograms.items():
+            by_name[name].append((labels, state))
+
+        lines = []
+        for name in sorted(self._meta):
+            kind, help_text, buckets = self._meta[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name.get(name, ())):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    def __init__(self, registry, name, labelnames):
+        self.registry, self.name, self.labelnames = registry, name, labelnames
+
+    def inc(self, amount=1, **labels):
+        key = tuple((label, str(labels[label])) for label in self.labelnames)
+        self.registry._inc((self.name, key), amount)
+
+
+class Histogram:
+    def __init__(self, registry, name, labelnames, buckets):
+        self.registry, self.name, self.labelnames, self.buckets = registry, name, labelnames, buckets
+
+    def observe(self, value, **labels):
+        key = tuple((label, str(labels[label])) for label in self.labelnames)
+        self.registry._observe((self.name, key), self.buckets, value)
+
+
+# -------------------
+# Snapshot files
+# -------------------
+def _combine(snapshots):
+    """Sum snapshots into ``(counters, histograms)`` dicts keyed by ``(name, labels)``."""
+    counters = defaultdict(float)
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, state in snap["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(state))
+            for i, v in enumerate(state):
+                merged[i] += v
+    return counters, histograms
+
+
+def _write_json(directory, name, data):
+    """Write atomically, so readers never see a partial file."""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, directory / name)
+
+
+_process_lock = threading.Lock()
+
+
+@contextmanager
+def _directory_lock(directory, exclusive):
+    """
+    flock on ``<directory>/.lock``, shared by every process scraping the
+    directory. Without fcntl (Windows, where workers aren't forked) an
+    in-process lock stands in for it.
+    """
+    if fcntl is None:
+        with _process_lock:
+            yield
+        return
+    with open(directory / ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+def _retire(directory, path):
+    """Add an exited worker's snapshot to ``retired.json`` and remove it, under a lock shared by all scrapers."""
+    with _directory_lock(directory, exclusive=True):
+        try:
+            snapshot = json.loads(path.read_text())
+        except FileNotFoundError:
+            return  # a concurrent scrape retired it
+        except ValueError:
+            snapshot = None
+        if snapshot:
+            retired = directory / RETIRED
+            totals = json.loads(retired.read_text()) if retired.exists() else {"counters": [], "histograms": []}
+            counters, histograms = _combine([totals, snapshot])
+            _write_json(directory, RETIRED, {
+                "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+                "histograms": [[name, list(labels), state] for (name, labels), state in histograms.items()],
+            })
+        path.unlink()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# ============================================================
+# TTDMS metrics
+# ============================================================
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "ttdms_http_request_duration_seconds", "Request latency by URL name.", ("view", "method"),
+)
+REQUESTS = registry.counter(
+    "ttdms_http_requests_total", "Requests by URL name and status code.", ("view", "method", "status"),
+)
+DB_QUERIES = registry.counter(
+    "ttdms_db_queries_total", "SQL statements executed, by URL name.", ("view",),
+)
+DB_QUERY_SECONDS = registry.counter(
+    "ttdms_db_query_seconds_total", "Time spent executing SQL, by URL name.", ("view",),
+)
+CACHE_REQUESTS = registry.counter(
+    "ttdms_cache_requests_total", "Application cache lookups by cache and result (hit/miss).", ("cache", "result"),
+)
+SALES_INGESTED = registry.counter(
+    "ttdms_sales_ingested_total", "Sales recorded.",
+)
+LEDGER_POSTINGS = registry.counter(
+    "ttdms_stock_ledger_postings_total", "Stock ledger entries posted, by movement type.", ("movement_type",),
+)
+
+
+def record_cache(cache_name, hit):
+    CACHE_REQUESTS.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+@registry.collector
+def _sync_backlog():
+    from core.models import SyncRecord
+
+    pending = SyncRecord.objects.filter(status="PENDING").count()
+    return [("ttdms_sync_backlog", "gauge", "SyncRecord rows waiting to be sent (PENDING).", [({}, pending)])]
@@ -0,0 +1,389 @@
+# core/middleware.py
+import gzip
+import logging
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
+from django.views.static import was_modified_since
+
+from core import metrics
+from core.db_routers import replica_configured, route_reads_to_replica, use_replica
+from core.profiling import QueryRecorder, profile_store
+from core.utils import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; responses fall back to gzip without it
+    brotli = None
+
+logger = logging.getLogger("core.profiling")
+
+TEXT_TYPES = {"application/javascript", "application/json", "image/svg+xml"}
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/plain", "text/javascript", "text/csv", "application/xml", *TEXT_TYPES}
+
+
+class QueryProfilerMiddleware:
+    """
+    Opt-in (``QUERY_PROFILER_ENABLED``) per-request SQL profiler.
+
+    Records query count, SQL time and repeated statements for every request,
+    flags statements repeated ``QUERY_PROFILER_NPLUSONE_THRESHOLD`` times or
+    more as suspected N+1 loops (with the template line / source line that
+    issued them), reports the totals in ``X-Query-*`` response headers and
+    feeds the rolling per-view summary at ``ops/queries/``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "QUERY_PROFILER_NPLUSONE_THRESHOLD", 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        view_name = (match.view_name if match else None) or request.path
+        suspects = recorder.suspects(self.threshold)
+        profile_store.add(view_name, recorder.count, recorder.duration, suspects)
+
+        response["X-Query-Count"] = str(recorder.count)
+        response["X-Query-Time-Ms"] = f"{recorder.duration * 1000:.1f}"
+        response["X-Query-Duplicates"] = str(recorder.duplicates)
+        if suspects:
+            worst = suspects[0]
+            location = worst["template"] or worst["code"] or "unknown"
+            response["X-Query-NPlusOne"] = f"{len(suspects)}; {worst['count']}x at {location}"
+            for s in suspects:
+                logger.warning(
+                    "Suspected N+1 in %s: %dx %s (template=%s, code=%s)",
+                    view_name, s["count"], s["sql"][:200], s["template"], s["code"],
+                )
+        return response
+
+
+class _QueryCounter:
+    """Cheapest possible execute_wrapper: count statements and time, nothing else."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._lock = threading.Lock()  # async views query from several threads at once
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.duration += elapsed
+
+
+# The counter of the request being served. Context variables follow the
+# request into sync_to_async threads, so queries an async view runs on worker
+# threads are counted too (a per-request execute_wrapper would only see the
+# calling thread's connection).
+_request_queries = ContextVar("request_queries", default=None)
+
+
+def _count_request_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    if _count_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_request_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+class MetricsMiddleware:
+    """
+    Feeds the Prometheus request metrics in core.metrics: latency histogram
+    and request counter per URL name, plus SQL statement count and time.
+    Place it first in MIDDLEWARE so the latency covers the whole stack.
+    Runs natively in both WSGI and ASGI mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection=connection)  # opened before this was loaded
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = _QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, queries, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        queries = _QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, queries, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, queries, elapsed):
+        # URL names keep label cardinality bounded (raw paths carry UUIDs)
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "unmatched"
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        if queries.count:
+            metrics.DB_QUERIES.inc(queries.count, view=view)
+            metrics.DB_QUERY_SECONDS.inc(queries.duration, view=view)
+        metrics.registry.maybe_flush()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves the reporting views named in ``REPLICA_VIEWS`` from the read
+    replica (see core/db_routers.py).
+
+    A client that has just written (any unsafe request) is pinned to the
+    primary for ``REPLICA_READ_YOUR_WRITES_SECONDS`` via a short-lived
+    cookie, so the list or dashboard it is redirected to never shows data
+    older than its own write. Not installed when no replica is configured.
+    """
+
+    cookie_name = "ttdms_primary"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.views = frozenset(getattr(settings, "REPLICA_VIEWS", ()))
+        self.window = getattr(settings, "REPLICA_READ_YOUR_WRITES_SECONDS", 10)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_replica(False):
+            response = self.get_response(request)
+        return self._pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        with use_replica(False):
+            response = await self.get_response(request)
+        return self._pin_after_write(request, response)
+
+    def _pin_after_write(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                self.cookie_name, "1", max_age=self.window, httponly=True, samesite="Lax",
+                secure=request.is_secure(),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ("GET", "HEAD")
+            and request.resolver_match.view_name in self.views
+            and self.cookie_name not in request.COOKIES
+        ):
+            # Undone by use_replica(False) in __call__ when the request ends
+            route_reads_to_replica()
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collectstatic output (``STATIC_ROOT``) in production, ahead of the
+    session/auth middleware.
+
+    Picks the ``.br`` or ``.gz`` sibling written by
+    core.storage.CompressedManifestStaticFilesStorage when the client accepts
+    it (``Vary: Accept-Encoding``). Content-hashed names are cached for a year
+    as ``immutable``; anything else must be revalidated. Not installed in
+    DEBUG (runserver serves static files) or before collectstatic has run.
+    """
+
+    sync_capable = True
+    async_capable = True
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+    immutable_max_age = 60 * 60 * 24 * 365
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        if settings.DEBUG or not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.root = os.path.realpath(root)
+        self.prefix = settings.STATIC_URL
+        self.hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        self.files = {}  # name -> {encoding: (path, size, mtime)}; the tree only changes on deploy
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        if request.method not in ("GET", "HEAD") or not request.path_info.startswith(self.prefix):
+            return None
+        name = posixpath.normpath(request.path_info[len(self.prefix):]).lstrip("/")
+        variants = self.files.get(name) or self._find(name)
+        if not variants:
+            return None  # misses aren't remembered: any URL could be one
+        self.files[name] = variants
+
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        encoding = next((enc for enc, _ in self.encodings if enc in accepted and enc in variants), "")
+        path, size, mtime = variants[encoding]
+
+        if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), mtime):
+            response = HttpResponseNotModified()
+        else:
+            with open(path, "rb") as f:
+                body = f.read() if request.method == "GET" else b""
+            content_type, _ = mimetypes.guess_type(name)
+            if content_type and (content_type.startswith("text/") or content_type in TEXT_TYPES):
+                content_type += "; charset=utf-8"
+            response = HttpResponse(body, content_type=content_type or "application/octet-stream")
+            response["Content-Length"] = str(size)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["Last-Modified"] = http_date(mtime)
+        if len(variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        if name in self.hashed:
+            response["Cache-Control"] = f"public, max-age={self.immutable_max_age}, immutable"
+        else:
+            response["Cache-Control"] = "public, max-age=0, must-revalidate"
+        return response
+
+    def _find(self, name):
+        if name.startswith("..") or os.path.isabs(name):
+            return {}
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return {}
+        variants = {}
+        for encoding, suffix in (("", ""), *self.encodings):
+            try:
+                stat = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            variants[encoding] = (path + suffix, stat.st_size, int(stat.st_mtime))
+        return variants
+
+
+class CompressionMiddleware:
+    """
+    Compresses dynamic text responses (HTML pages, JSON) on the fly: Brotli
+    at a fast quality level when the client accepts it and the module is
+    installed, gzip otherwise (``Vary: Accept-Encoding``).
+
+    HTML pages carry secrets (CSRF tokens, account data) next to input an
+    attacker can reflect into them, which compression ratios leak (BREACH).
+    They only get gzip, through django.utils.text.compress_string() with a
+    random-length filename in the gzip header, the mitigation GZipMiddleware
+    applies.
+
+    Bodies under ``COMPRESSION_MIN_SIZE`` bytes, streaming responses and
+    responses that already carry a Content-Encoding (precompressed static
+    files) are left alone, as is anything that would not get smaller. Strong
+    ETags are weakened since the bytes now differ per encoding; conditional
+    GETs still match them (core.decorators.conditional_on).
+    """
+
+    sync_capable = True
+    async_capable = True
+    brotli_quality = 4   # ~gzip -6 speed, noticeably smaller
+    gzip_level = 6
+    max_random_bytes = 100  # BREACH padding for HTML, as GZipMiddleware
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "").partition(";")[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < self.min_size:
+            return response
+
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if content_type == "text/html":
+            if "gzip" not in accepted:
+                return response
+            encoding, body = "gzip", compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        elif brotli is not None and "br" in accepted:
+            encoding, body = "br", brotli.compress(response.content, quality=self.brotli_quality)
+        elif "gzip" in accepted:
+            encoding, body = "gzip", gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            return response
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and not etag.startswith("W/"):
+            response["ETag"] = "W/" + etag
+        return response
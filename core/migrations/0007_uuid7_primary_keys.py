@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:32
+
+import core.utils
+from django.db import migrations, models
+
+
+# Only the default changes: rows written before this migration keep their
+# random (version 4) keys, deliberately. Payments point at sales, sales and
+# activities at visits, and offline clients hold the ids delta sync sent
+# them; a backfill would have to rewrite every referencing row and would
+# strand those clients. The old keys are a fixed set that stops growing here,
+# and every insert after it lands at the right-hand edge of the index. To
+# compact an index still fragmented by them, run REINDEX (PostgreSQL) or
+# VACUUM (SQLite) once after deploying.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_pricelist_pack'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audittrail',
+            name='id',
+            field=models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='id',
+            field=models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='id',
+            field=models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='stockledger',
+            name='id',
+            field=models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='id',
+            field=models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
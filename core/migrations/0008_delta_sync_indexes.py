@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:07
+
+import core.utils
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inventorysnapshot',
+            index=models.Index(fields=['agent', 'updated_at'], name='core_invent_agent_i_fcb023_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='core_paymen_updated_8ca5ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='return',
+            index=models.Index(fields=['agent', 'updated_at'], name='core_return_agent_i_d9776e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['agent', 'updated_at'], name='core_sale_agent_i_dc3948_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['from_agent', 'updated_at'], name='core_transf_from_ag_f7cc28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['to_agent', 'updated_at'], name='core_transf_to_agen_39e3be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['agent', 'updated_at'], name='core_visit_agent_i_2ba932_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedrecord',
+            name='agent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deletedrecord',
+            index=models.Index(fields=['agent', 'model', 'updated_at'], name='core_delete_agent_i_7b308c_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:09
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_delta_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'User', 'verbose_name_plural': 'Users'},
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', core.models.LiveUserManager()),
+                ('all_objects', core.models.UserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_soft_deleted', False)), fields=['role'], name='user_live_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_soft_deleted', False)), fields=['manager', 'role'], name='user_live_team_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_soft_deleted', False)), fields=['-date_joined'], name='user_live_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:11
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    A column can't be altered into a generated one, so the stored revenue is
+    dropped and re-added as GENERATED ALWAYS AS (...) STORED. The database
+    computes it for every existing row while adding the column, which also
+    corrects any row written by a bulk path that skipped the old Sale.save().
+    """
+
+    dependencies = [
+        ('core', '0009_user_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sale',
+            name='revenue',
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='revenue',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('unit_price'), '*', models.F('quantity')), '-', models.F('discount_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+    ]
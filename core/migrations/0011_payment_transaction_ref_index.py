@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sale_generated_revenue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['transaction_ref'], name='core_paymen_transac_db76fa_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:21
+
+import core.utils
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def backfill_paid_amounts(apps, schema_editor):
+    Sale = apps.get_model("core", "Sale")
+    Payment = apps.get_model("core", "Payment")
+    paid = (
+        Payment.objects
+        .filter(sale=OuterRef("pk"), status="completed")
+        .order_by()
+        .values("sale")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    settled = Payment.objects.filter(status="completed").values("sale")
+    Sale.objects.filter(pk__in=settled).update(paid_amount=Subquery(paid))
+
+
+class Migration(migrations.Migration):
+    """
+    paid_amount is backfilled from completed payments before outstanding is
+    added, so the database computes every existing row's balance correctly.
+    Run ``refresh_receivable_aging`` afterwards to fill the aging rollup.
+    """
+
+    dependencies = [
+        ('core', '0011_payment_transaction_ref_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceivableAging',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('days_0_7', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_8_30', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_over_60', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('oldest_sale_at', models.DateTimeField(blank=True, null=True)),
+                ('as_of', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='receivableaging',
+            name='agent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='receivableaging',
+            name='market',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.market'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='receivableaging',
+            unique_together={('agent', 'market')},
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_paid_amounts, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='sale',
+            name='outstanding',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('unit_price'), '*', models.F('quantity')), '-', models.F('discount_amount')), '-', models.F('paid_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('outstanding__gt', 0), ('payment_method', 'credit')), fields=['agent', 'market', 'timestamp'], name='sale_open_credit_idx'),
+        ),
+    ]
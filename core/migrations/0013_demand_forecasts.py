@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:28
+
+import core.utils
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_receivables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('week_start', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('error', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('as_of', models.DateField()),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='core.market')),
+                ('pack', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='core.packsize')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['market', 'week_start'], name='core_demand_market__2829e2_idx')],
+                'unique_together': {('pack', 'market', 'week_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ForecastState',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('level', models.FloatField()),
+                ('trend', models.FloatField()),
+                ('seasonal', models.JSONField()),
+                ('error', models.FloatField(default=0)),
+                ('as_of', models.DateField()),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.market')),
+                ('pack', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.packsize')),
+            ],
+            options={
+                'unique_together': {('pack', 'market')},
+            },
+        ),
+    ]
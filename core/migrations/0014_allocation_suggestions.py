@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_demand_forecasts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='allocation',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('approved', 'Approved')], default='approved', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='allocation',
+            index=models.Index(condition=models.Q(('status', 'draft')), fields=['agent'], name='allocation_draft_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['agent', 'pack', 'timestamp', 'quantity'], name='sale_velocity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['agent', 'pack', 'quantity'], name='ledger_agent_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['agent', 'updated_at'], name='ledger_agent_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_ledger_sync_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='core_paymen_transac_db76fa_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('transaction_ref')), name='payment_receipt_idx'),
+        ),
+    ]
@@ -3,10 +3,15 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Trim, Upper
 from django.utils import timezone
+from decimal import Decimal
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 import uuid
+
+from core.utils import uuid7
 # ============================================================
 # Utility Choices
 # ============================================================
@@ -71,6 +76,10 @@ class PriceListStatus(models.TextChoices):
     ACTIVE = "active", "Active"
     INACTIVE = "inactive", "Inactive"
 
+class AllocationStatus(models.TextChoices):
+    DRAFT = "draft", "Draft"
+    APPROVED = "approved", "Approved"
+
 # ============================================================
 # Abstracts
 # ============================================================
@@ -105,6 +114,13 @@ class UserManager(BaseUserManager):
         return self.create_user(username, email, password, **extra_fields)
 
 
+class LiveUserManager(UserManager):
+    """``User.objects``: leaves soft-deleted accounts out of every query."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_soft_deleted=False)
+
+
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     phone = models.CharField(max_length=32, blank=True, null=True)
@@ -119,11 +135,26 @@ class User(AbstractUser):
         related_name="team", limit_choices_to={"role": Role.MANAGER},
     )
 
-    objects = UserManager()   # 👈 attach your manager here
+    objects = LiveUserManager()
+    # Soft-deleted accounts included. The default manager, so auth, the admin
+    # and unique checks still see a username that a soft-deleted user holds
+    all_objects = UserManager()
 
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        default_manager_name = "all_objects"
+        # Partial: only live accounts are indexed, so role counts, team
+        # lookups and the user list don't grow with churned agents
+        indexes = [
+            models.Index(fields=["role"], condition=Q(is_soft_deleted=False), name="user_live_role_idx"),
+            models.Index(
+                fields=["manager", "role"], condition=Q(is_soft_deleted=False), name="user_live_team_idx",
+            ),
+            models.Index(
+                fields=["-date_joined"], condition=Q(is_soft_deleted=False), name="user_live_joined_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -302,7 +333,7 @@ class Attachment(TimeStampedModel):
 # Visits, Sales, Payments
 # ============================================================
 class Visit(TimeStampedModel):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     agent = models.ForeignKey(User, on_delete=models.PROTECT, related_name="visits")
     market = models.ForeignKey(Market, on_delete=models.PROTECT, related_name="visits")
     outlet = models.ForeignKey(Outlet, on_delete=models.SET_NULL, null=True, blank=True)
@@ -313,11 +344,14 @@ class Visit(TimeStampedModel):
     media = models.ManyToManyField(Attachment, blank=True, related_name="visits")
     purpose = models.CharField(max_length=20, choices=VisitPurpose.choices, blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["agent", "updated_at"])]  # delta sync (core/sync.py)
+
     def __str__(self):
         return f"Visit {self.agent} @ {self.market}"
 
 class Sale(TimeStampedModel):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     agent = models.ForeignKey(User, on_delete=models.PROTECT, related_name="sales")
     market = models.ForeignKey(Market, on_delete=models.PROTECT, related_name="sales")
     visit = models.ForeignKey(Visit, on_delete=models.SET_NULL, null=True, blank=True, related_name="sales")
@@ -326,7 +360,19 @@ class Sale(TimeStampedModel):
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     promo_code = models.ForeignKey(PromoCode, on_delete=models.SET_NULL, null=True, blank=True)
-    revenue = models.DecimalField(max_digits=14, decimal_places=2, editable=False, default=0)
+    # Computed by the database on every write path (save, bulk_create, update(), raw SQL)
+    revenue = models.GeneratedField(
+        expression=F("unit_price") * F("quantity") - F("discount_amount"),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
+    # Sum of the sale's completed payments, kept current by core/receivables.py
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding = models.GeneratedField(
+        expression=F("unit_price") * F("quantity") - F("discount_amount") - F("paid_amount"),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
     timestamp = models.DateTimeField(default=timezone.now)
     campaign = models.ForeignKey(Campaign, on_delete=models.SET_NULL, null=True, blank=True, related_name="sales")
     ledger_ref = models.UUIDField(null=True, blank=True)
@@ -334,15 +380,39 @@ class Sale(TimeStampedModel):
     payment_method = models.CharField(max_length=20, choices=PaymentMethod.choices, default=PaymentMethod.CASH)
     currency = models.CharField(max_length=10, default="KES")
 
-    def save(self, *args, **kwargs):
-        self.revenue = (self.unit_price * self.quantity) - (self.discount_amount or 0)
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=["agent", "updated_at"]),
+            # Recent units per agent and pack (allocation suggestions), read from the index alone
+            models.Index(fields=["agent", "pack", "timestamp", "quantity"], name="sale_velocity_idx"),
+            # Open credit, rolled up into ReceivableAging
+            models.Index(
+                fields=["agent", "market", "timestamp"],
+                condition=Q(payment_method="credit", outstanding__gt=0),
+                name="sale_open_credit_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Sale {self.id} {self.pack} x{self.quantity}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Django reads the generated columns back only from an INSERT ... RETURNING:
+        # after an UPDATE they keep their old values, and without RETURNING the first
+        # read is a refresh query. Mirror the database expressions instead; a write
+        # that used F() leaves them deferred, so they are read back on access.
+        values = (self.unit_price, self.quantity, self.discount_amount, self.paid_amount)
+        if any(hasattr(value, "resolve_expression") for value in values):
+            self.__dict__.pop("revenue", None)
+            self.__dict__.pop("outstanding", None)
+            return
+        unit_price, quantity, discount_amount, paid_amount = (Decimal(value) for value in values)
+        self.revenue = unit_price * quantity - discount_amount
+        self.outstanding = self.revenue - paid_amount
+
 class Payment(TimeStampedModel):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name="payments")
     method = models.CharField(max_length=32, choices=PaymentMethod.choices)
     amount = models.DecimalField(max_digits=14, decimal_places=2)
@@ -351,9 +421,36 @@ class Payment(TimeStampedModel):
     processed_at = models.DateTimeField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at"]),  # delta sync, scoped through the sale's agent
+            # Statement reconciliation matches receipts trimmed and upper case (core/reconciliation.py)
+            models.Index(Upper(Trim("transaction_ref")), name="payment_receipt_idx"),
+        ]
+
     def __str__(self):
         return f"Payment {self.method} {self.amount} ({self.status})"
 
+class ReceivableAging(TimeStampedModel):
+    """Outstanding credit of one agent in one market by age (core/receivables.py)."""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    agent = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name="+")
+    sale_count = models.PositiveIntegerField(default=0)
+    days_0_7 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_8_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_over_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    oldest_sale_at = models.DateTimeField(null=True, blank=True)
+    as_of = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("agent", "market")
+
+    def __str__(self):
+        return f"Receivables {self.agent_id} @ {self.market_id}: {self.total}"
+
 # ============================================================
 # Stock Operations & Ledger
 # ============================================================
@@ -366,6 +463,13 @@ class Allocation(TimeStampedModel):
     notes = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     processed = models.BooleanField(default=False)
+    # Suggested slips (core/allocation.py) stay drafts until a manager approves them
+    status = models.CharField(max_length=20, choices=AllocationStatus.choices, default=AllocationStatus.APPROVED)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["agent"], condition=Q(status="draft"), name="allocation_draft_idx"),
+        ]
 
     def __str__(self):
         return f"Allocation {self.slip_number}"
@@ -382,6 +486,12 @@ class Transfer(TimeStampedModel):
     approver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="approved_transfers")
     processed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["from_agent", "updated_at"]),
+            models.Index(fields=["to_agent", "updated_at"]),
+        ]
+
     def __str__(self):
         return f"Transfer {self.id}"
 
@@ -395,6 +505,9 @@ class Return(TimeStampedModel):
     status = models.CharField(max_length=32, choices=ReturnStatus.choices, default=ReturnStatus.PENDING)
     processed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["agent", "updated_at"])]
+
     def __str__(self):
         return f"Return {self.id}"
 
@@ -411,7 +524,7 @@ class Adjustment(TimeStampedModel):
         return f"Adjustment {self.pack}"
 
 class StockLedger(TimeStampedModel):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     movement_type = models.CharField(max_length=32, choices=MovementType.choices)
     source_ref = models.UUIDField(null=True, blank=True)
     actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="actor_ledger")
@@ -423,6 +536,14 @@ class StockLedger(TimeStampedModel):
     balance_after = models.IntegerField(null=True, blank=True)
     reason_code = models.CharField(max_length=128, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Covers the per-agent stock balance (SUM(quantity) by agent and pack) without touching the table
+            models.Index(fields=["agent", "pack", "quantity"], name="ledger_agent_stock_idx"),
+            # Delta sync's keyset pages (core/sync.py)
+            models.Index(fields=["agent", "updated_at"], name="ledger_agent_sync_idx"),
+        ]
+
 class InventorySnapshot(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     agent = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -433,6 +554,41 @@ class InventorySnapshot(TimeStampedModel):
 
     class Meta:
         unique_together = ("agent", "market", "pack", "snapshot_date")
+        indexes = [models.Index(fields=["agent", "updated_at"])]
+
+# ============================================================
+# Demand Forecasting
+# ============================================================
+class ForecastState(TimeStampedModel):
+    """Smoothing state of one pack's daily sales in one market, carried between runs (core/forecasting.py)."""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    pack = models.ForeignKey(PackSize, on_delete=models.CASCADE, related_name="+")
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name="+")
+    level = models.FloatField()
+    trend = models.FloatField()
+    seasonal = models.JSONField()  # 7 weekday offsets, Monday first
+    error = models.FloatField(default=0)  # smoothed absolute one-day-ahead error
+    as_of = models.DateField()  # last day folded in
+
+    class Meta:
+        unique_together = ("pack", "market")
+
+class DemandForecast(TimeStampedModel):
+    """Units of a pack expected to sell in a market in the week from ``week_start`` (a Monday)."""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    pack = models.ForeignKey(PackSize, on_delete=models.CASCADE, related_name="forecasts")
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name="forecasts")
+    week_start = models.DateField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    error = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # expected absolute error for the week
+    as_of = models.DateField()  # last day of history behind it
+
+    class Meta:
+        unique_together = ("pack", "market", "week_start")
+        indexes = [models.Index(fields=["market", "week_start"])]
+
+    def __str__(self):
+        return f"Forecast {self.pack_id} @ {self.market_id} w/c {self.week_start}: {self.quantity}"
 
 # ============================================================
 # Integration & Audit
@@ -446,8 +602,21 @@ class SyncRecord(TimeStampedModel):
     status = models.CharField(max_length=20, choices=[("PENDING", "Pending"), ("SENT", "Sent"), ("FAILED", "Failed")], default="PENDING")
     last_attempt = models.DateTimeField(null=True, blank=True)
 
+class DeletedRecord(TimeStampedModel):
+    """Tombstone of a deleted row, so delta sync can tell agents to drop it (core/sync.py)."""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    model = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=100)
+    agent = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        indexes = [models.Index(fields=["agent", "model", "updated_at"])]
+
+    def __str__(self):
+        return f"Deleted {self.model} {self.object_id}"
+
 class AuditTrail(TimeStampedModel):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=200)
     model = models.CharField(max_length=100)
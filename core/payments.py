@@ -0,0 +1,102 @@
+# core/payments.py
+"""
+Payment status transitions, applied in bulk.
+
+``transition()`` moves any number of payments to a new status in one
+transaction. It checks every move against ``TRANSITIONS`` first (all or
+nothing), then runs one set-based UPDATE per (from, to) pair. That UPDATE is
+split only where the backend caps bound parameters (SQLite). Afterwards it
+sends ``payments_transitioned`` with the affected sale ids, so receivables,
+caches and rollups can refresh just those sales.
+"""
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core.models import Payment, PaymentStatus
+
+# from -> allowed targets. FAILED -> PENDING is a retry; refunds only follow a completed payment
+TRANSITIONS = {
+    PaymentStatus.PENDING: {PaymentStatus.COMPLETED, PaymentStatus.FAILED},
+    PaymentStatus.FAILED: {PaymentStatus.PENDING},
+    PaymentStatus.COMPLETED: {PaymentStatus.REFUNDED},
+    PaymentStatus.REFUNDED: set(),
+}
+
+# Sent on commit with ``status`` (the new one), ``payment_ids`` and ``sale_ids``
+payments_transitioned = Signal()
+
+
+class IllegalTransition(Exception):
+    def __init__(self, illegal):
+        self.illegal = illegal  # [(payment_id, from_status, to_status)]
+        sample = ", ".join(f"{pk}: {old} -> {new}" for pk, old, new in illegal[:5])
+        more = f" and {len(illegal) - 5} more" if len(illegal) > 5 else ""
+        super().__init__(f"{len(illegal)} illegal payment transition(s): {sample}{more}")
+
+
+def _batches(connection, ids):
+    size = connection.ops.bulk_batch_size(["pk"], ids) or len(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def transition(payment_ids, status, at=None, skip_illegal=False):
+    """
+    Move ``payment_ids`` to ``status``, stamping ``processed_at`` with ``at``
+    (default now; cleared when a failed payment goes back to pending).
+
+    Raises IllegalTransition, changing nothing, if any payment can't make
+    the move; with ``skip_illegal`` those are left as they are instead.
+    Payments already in ``status`` are ignored. Returns
+    ``{"updated": count, "skipped": [(id, from, to)], "sale_ids": set}``.
+    """
+    status = PaymentStatus(status)
+    now = timezone.now()
+    at = at or now
+    ids = list(dict.fromkeys(payment_ids))
+    connection = connections[router.db_for_write(Payment)]
+
+    with transaction.atomic(using=connection.alias):
+        by_source, sale_ids, illegal = defaultdict(list), set(), []
+        for batch in _batches(connection, ids):
+            rows = (
+                Payment.objects.using(connection.alias).select_for_update()
+                .filter(pk__in=batch).values_list("pk", "status", "sale_id")
+            )
+            for pk, current, sale_id in rows:
+                if current == status:
+                    continue
+                if status in TRANSITIONS[current]:
+                    by_source[current].append(pk)
+                    sale_ids.add(sale_id)
+                else:
+                    illegal.append((pk, current, status))
+        if illegal and not skip_illegal:
+            raise IllegalTransition(illegal)
+
+        updated = 0
+        processed_at = None if status == PaymentStatus.PENDING else at
+        for source, pks in by_source.items():
+            for batch in _batches(connection, pks):
+                updated += (
+                    Payment.objects.using(connection.alias)
+                    .filter(pk__in=batch, status=source)
+                    .update(status=status, processed_at=processed_at, updated_at=now)  # auto_now is skipped
+                )
+
+        moved = [pk for pks in by_source.values() for pk in pks]
+        if moved:
+            transaction.on_commit(
+                lambda: announce(status, moved, sale_ids), using=connection.alias,
+            )
+    return {"updated": updated, "skipped": illegal, "sale_ids": sale_ids}
+
+
+def announce(status, payment_ids, sale_ids):
+    """Send payments_transitioned (also for bulk writers that bypass transition(), e.g. reconciliation)."""
+    payments_transitioned.send(
+        sender=Payment, status=status, payment_ids=list(payment_ids), sale_ids=set(sale_ids),
+    )
@@ -0,0 +1,223 @@
+# core/pricing.py
+"""
+Pricing engine: PriceList ``unit_price``, ``discount_policy`` and ``tax_rate``
+applied to sale lines.
+
+A discount policy is JSON of the form::
+
+    {
+        "tiers": [{"min_qty": 12, "percent": 5}, {"min_qty": 48, "percent": 8}],
+        "market_types": {"WHOLESALE": 4, "SUPERMARKET": 2},
+        "promo": "best",
+        "max_percent": 20
+    }
+
+all keys optional. The line gets the best volume tier its quantity reaches
+plus the percentage for its market's type. A promo code on the line is
+then combined per ``promo``:
+
+- ``"stack"`` adds it on top.
+- ``"best"`` (the default) keeps whichever discount is larger.
+- ``"none"`` ignores it.
+
+The total discount never exceeds ``max_percent`` of the gross amount. Tax is
+``tax_rate`` percent of the net amount.
+
+Each distinct policy is compiled once into a closure (``compile_policy``),
+and ``price_lines()`` prices a whole batch with one query per table, so
+pricing cost is per line arithmetic only.
+"""
+import json
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+from uuid import UUID
+
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Market, PriceList, PriceListStatus, PromoCode
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+PROMO_MODES = ("best", "stack", "none")
+PERCENT_TYPES = {"percent", "percentage", "pct", "%"}
+
+
+class PricingError(Exception):
+    pass
+
+
+class PolicyError(PricingError):
+    """A discount_policy that can't be compiled."""
+
+
+# -------------------
+# Policy compilation
+# -------------------
+def _percent(value, where):
+    try:
+        percent = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise PolicyError(f"{where}: {value!r} is not a number.")
+    if not ZERO <= percent <= HUNDRED:
+        raise PolicyError(f"{where}: {percent} is not a percentage between 0 and 100.")
+    return percent
+
+
+def compile_policy(policy):
+    """
+    Validate ``policy`` and return ``evaluate(quantity, market_type, gross,
+    promo) -> discount``, where ``promo`` is ``(percent, amount)`` or None.
+    Compiled policies are cached by content.
+    """
+    return _compile(json.dumps(policy or {}, sort_keys=True))
+
+
+@lru_cache(maxsize=1024)
+def _compile(canonical):
+    policy = json.loads(canonical)
+    if not isinstance(policy, dict):
+        raise PolicyError("The policy must be a JSON object.")
+    unknown = policy.keys() - {"tiers", "market_types", "promo", "max_percent"}
+    if unknown:
+        raise PolicyError(f"Unknown policy key(s): {', '.join(sorted(unknown))}.")
+
+    tiers = []
+    for i, tier in enumerate(policy.get("tiers") or []):
+        if not isinstance(tier, dict) or not isinstance(tier.get("min_qty"), int) or tier["min_qty"] < 1:
+            raise PolicyError(f"tiers[{i}]: needs an integer min_qty of at least 1.")
+        tiers.append((tier["min_qty"], _percent(tier.get("percent"), f"tiers[{i}].percent")))
+    # Highest threshold first: the first one reached is the best tier
+    tiers = tuple(sorted(tiers, reverse=True))
+
+    market_types = policy.get("market_types") or {}
+    if not isinstance(market_types, dict):
+        raise PolicyError("market_types must map a market type to a percentage.")
+    valid_types = {value for value, _ in Market.MARKET_TYPES}
+    if market_types.keys() - valid_types:
+        raise PolicyError(f"market_types: unknown type(s) {', '.join(sorted(market_types.keys() - valid_types))}.")
+    by_type = {kind: _percent(value, f"market_types.{kind}") for kind, value in market_types.items()}
+
+    promo_mode = policy.get("promo", "best")
+    if promo_mode not in PROMO_MODES:
+        raise PolicyError(f"promo must be one of {', '.join(PROMO_MODES)}.")
+    cap = _percent(policy.get("max_percent", 100), "max_percent") / HUNDRED
+
+    def evaluate(quantity, market_type, gross, promo):
+        percent = ZERO
+        for min_qty, tier_percent in tiers:
+            if quantity >= min_qty:
+                percent = tier_percent
+                break
+        percent += by_type.get(market_type, ZERO)
+        discount = gross * percent / HUNDRED
+
+        if promo is not None and promo_mode != "none":
+            promo_percent, promo_amount = promo
+            promo_discount = gross * promo_percent / HUNDRED + promo_amount
+            if promo_mode == "stack":
+                discount += promo_discount
+            elif promo_discount > discount:
+                discount = promo_discount
+        return min(discount, gross * cap)
+
+    return evaluate
+
+
+def validate_policy(policy):
+    """Raise PolicyError if ``policy`` doesn't compile (see PriceListForm)."""
+    compile_policy(policy)
+
+
+# -------------------
+# Batch pricing
+# -------------------
+def _price_lists(pack_ids, market_ids, on):
+    """``{(pack_id, market_id or None): PriceList row}`` in force on ``on``."""
+    rows = (
+        PriceList.objects
+        .filter(Q(market__isnull=True) | Q(market__in=market_ids), pack__in=pack_ids)
+        .filter(Q(effective_to__isnull=True) | Q(effective_to__gte=on), effective_from__lte=on)
+        .filter(status=PriceListStatus.ACTIVE)
+        .order_by("effective_from")  # the latest effective price wins below
+        .values("id", "pack_id", "market_id", "unit_price", "tax_rate", "discount_policy")
+    )
+    return {(row["pack_id"], row["market_id"]): row for row in rows}
+
+
+def _promos(codes, at):
+    """``{code: (percent, amount)}`` for the usable promo codes among ``codes``."""
+    promos = {}
+    rows = PromoCode.objects.filter(code__in=codes, valid_from__lte=at, valid_to__gte=at).values(
+        "code", "discount_type", "discount_value", "usage_limit", "used_count",
+    )
+    for row in rows:
+        if row["usage_limit"] is not None and row["used_count"] >= row["usage_limit"]:
+            continue
+        value = row["discount_value"]
+        if (row["discount_type"] or "").strip().lower() in PERCENT_TYPES:
+            promos[row["code"]] = (value, ZERO)
+        else:
+            promos[row["code"]] = (ZERO, value)  # a fixed amount off the line
+    return promos
+
+
+def _id(value):
+    """A pack or market id as the UUID the queries return, whether given as a UUID or a string."""
+    if not value:
+        return None
+    try:
+        return UUID(str(value))
+    except ValueError:
+        raise PricingError(f"Invalid id {value!r}.") from None
+
+
+def price_lines(lines, at=None):
+    """
+    Price a batch of sale lines: dicts with ``pack`` and ``market`` ids
+    (UUIDs or their strings), ``quantity`` and an optional ``promo_code``
+    (the code string).
+
+    Returns one dict per line, in order, with ``price_list``, ``unit_price``,
+    ``gross``, ``discount``, ``net`` (what Sale.revenue stores), ``tax`` and
+    ``total``. A market-specific price beats the general one for the pack.
+    Runs three queries whatever the batch size; raises PricingError when a
+    pack has no price in force.
+    """
+    lines = list(lines)
+    at = at or timezone.now()
+    on = timezone.localdate(at)
+    # Looked up in dicts keyed by the UUIDs the queries return: a string id would miss
+    keys = [(_id(line["pack"]), _id(line.get("market"))) for line in lines]
+    pack_ids = {pack for pack, _ in keys}
+    market_ids = {market for _, market in keys if market}
+    codes = {line["promo_code"] for line in lines if line.get("promo_code")}
+
+    prices = _price_lists(pack_ids, market_ids, on)
+    evaluators = {row["id"]: compile_policy(row["discount_policy"]) for row in prices.values()}
+    market_types = dict(Market.objects.filter(pk__in=market_ids).values_list("pk", "type")) if market_ids else {}
+    promos = _promos(codes, at) if codes else {}
+
+    quotes = []
+    for line, (pack, market) in zip(lines, keys):
+        quantity = line["quantity"]
+        row = prices.get((pack, market)) or prices.get((pack, None))
+        if row is None:
+            raise PricingError(f"No active price for pack {pack} in market {market} on {on}.")
+        unit_price = row["unit_price"]
+        gross = unit_price * quantity
+        discount = evaluators[row["id"]](quantity, market_types.get(market), gross, promos.get(line.get("promo_code")))
+        discount = discount.quantize(CENT, ROUND_HALF_UP)
+        net = gross - discount
+        tax = (net * row["tax_rate"] / HUNDRED).quantize(CENT, ROUND_HALF_UP)
+        quotes.append({
+            "price_list": row["id"],
+            "unit_price": unit_price,
+            "gross": gross,
+            "discount": discount,
+            "net": net,
+            "tax": tax,
+            "total": net + tax,
+        })
+    return quotes
@@ -0,0 +1,193 @@
+# core/profiling.py
+import hashlib
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+_PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+# Not a query's origin: this module and the execute_wrappers in core/middleware.py
+_SKIPPED_FILES = {str(Path(__file__).resolve()), str(Path(__file__).with_name("middleware.py").resolve())}
+
+
+def fingerprint(sql):
+    """Normalise SQL so the same statement with different parameters compares equal."""
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _LITERALS.sub("?", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _callsite():
+    """
+    Best-effort origin of the query being executed: the innermost template
+    node being rendered (name:line) and the innermost project source line.
+    """
+    template = code = None
+    frame = sys._getframe(2)
+    while frame is not None and (template is None or code is None):
+        co = frame.f_code
+        if template is None and co.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                template = f"{origin.template_name or origin.name}:{token.lineno}"
+        if code is None:
+            filename = co.co_filename
+            if (filename.startswith(_PROJECT_ROOT) and filename not in _SKIPPED_FILES
+                    and "site-packages" not in filename):
+                code = f"{Path(filename).relative_to(_PROJECT_ROOT)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return template, code
+
+
+# -------------------
+# Per-request recorder
+# -------------------
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook that groups queries by fingerprint."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            key = fingerprint(sql)
+            entry = self.statements.get(key)
+            if entry is None:
+                template, code = _callsite()
+                entry = self.statements[key] = {
+                    "sql": key, "count": 0, "duration": 0.0, "template": template, "code": code,
+                }
+            entry["count"] += 1
+            entry["duration"] += elapsed
+
+    def suspects(self, threshold):
+        """Statements repeated at least ``threshold`` times: the N+1 signature."""
+        repeated = [s for s in self.statements.values() if s["count"] >= threshold]
+        return sorted(repeated, key=lambda s: s["count"], reverse=True)
+
+    @property
+    def duplicates(self):
+        return sum(s["count"] - 1 for s in self.statements.values())
+
+
+# -------------------
+# Rolling per-view summary
+# -------------------
+WORKERS_KEY = "profile:workers"
+GENERATION_KEY = "profile:generation"
+SAMPLES_TIMEOUT = 60 * 60 * 24  # a stopped worker's samples drop out after a day
+_UNSEEN = object()
+
+
+class ProfileStore:
+    """
+    Last ``size`` profiles per view, across every worker process.
+
+    Each worker keeps its own samples in memory and publishes them to the
+    shared cache under a slot of its own (numbered with ``cache.incr``,
+    atomic on Redis) at most every ``flush_interval`` seconds, so workers
+    never write each other's entries. ``summary()`` merges all the slots;
+    ``clear()`` starts a new generation, which makes every worker drop its
+    samples on its next flush.
+    """
+
+    def __init__(self, size=200, flush_interval=2.0):
+        self.size = size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: deque(maxlen=self.size))
+        self._slot = None
+        self._generation = _UNSEEN
+        self._flushed = 0.0
+
+    def add(self, view_name, count, duration, suspects):
+        sample = {
+            "count": count,
+            "duration": duration,
+            "suspects": [
+                {k: s[k] for k in ("sql", "count", "template", "code")} for s in suspects
+            ],
+        }
+        with self._lock:
+            self._views[view_name].append(sample)
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Publish this worker's samples (dropping them first if another worker
+        cleared). Returns ``(generation, workers, views)``.
+        """
+        self._flushed = time.monotonic()
+        state = cache.get_many([GENERATION_KEY, WORKERS_KEY])
+        generation, workers = state.get(GENERATION_KEY), state.get(WORKERS_KEY, 0)
+        with self._lock:
+            if generation != self._generation:
+                if self._generation is not _UNSEEN:
+                    self._views.clear()
+                self._generation = generation
+            views = {name: list(samples) for name, samples in self._views.items()}
+        if self._slot is None or self._slot > workers:  # first flush, or the cache was emptied
+            try:
+                cache.add(WORKERS_KEY, 0, None)
+                self._slot = workers = cache.incr(WORKERS_KEY)
+            except ValueError:  # nothing is kept (DummyCache): this worker's samples only
+                return generation, 0, views
+        cache.set(f"profile:worker:{self._slot}", {"generation": generation, "views": views}, SAMPLES_TIMEOUT)
+        return generation, workers, views
+
+    def clear(self):
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+        self.flush()
+
+    def summary(self):
+        generation, workers, views = self.flush()
+        others = [slot for slot in range(1, workers + 1) if slot != self._slot]
+        for entry in cache.get_many([f"profile:worker:{slot}" for slot in others]).values():
+            if entry["generation"] != generation:
+                continue
+            for name, samples in entry["views"].items():
+                views.setdefault(name, []).extend(samples)
+
+        rows = []
+        for name, samples in views.items():
+            counts = sorted(s["count"] for s in samples)
+            suspects = {}
+            for sample in samples:
+                for s in sample["suspects"]:
+                    key = hashlib.md5(s["sql"].encode()).hexdigest()
+                    seen = suspects.setdefault(key, dict(s, requests=0, max_count=0))
+                    seen["requests"] += 1
+                    seen["max_count"] = max(seen["max_count"], s["count"])
+            rows.append({
+                "view": name,
+                "requests": len(samples),
+                "avg_queries": sum(counts) / len(counts),
+                "p95_queries": counts[min(len(counts) - 1, int(len(counts) * 0.95))],
+                "max_queries": counts[-1],
+                "avg_ms": 1000 * sum(s["duration"] for s in samples) / len(samples),
+                "suspects": sorted(suspects.values(), key=lambda s: s["max_count"], reverse=True),
+            })
+        return sorted(rows, key=lambda r: r["avg_queries"], reverse=True)
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,176 @@
+# core/receivables.py
+"""
+Receivables: what each sale is still owed, and how old the credit debt is.
+
+``Sale.paid_amount`` is the sum of the sale's completed payments (a refund
+takes its payment out again) and ``Sale.outstanding`` is the remainder,
+computed by the database. ``refresh_sales()`` brings both up to date for
+the sales whose payments changed; core.signals calls it on
+``payments_transitioned`` and when a payment or sale is saved or deleted.
+
+Open credit sales are rolled up into ``ReceivableAging``: one row per agent
+and market with the amount owed in each age bucket. The aging report reads
+those rows instead of joining sales to payments. Ages move with the clock,
+so ``refresh_receivable_aging`` rebuilds the whole rollup daily, while
+payment changes refresh just the agent/market pairs they touch.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Payment, PaymentMethod, PaymentStatus, ReceivableAging, Sale
+
+CHUNK_SIZE = 2000
+ZERO = Decimal("0")
+
+# (field, label, youngest day, oldest day); ages are whole days since the sale
+AGING_BUCKETS = (
+    ("days_0_7", "0–7 days", 0, 7),
+    ("days_8_30", "8–30 days", 8, 30),
+    ("days_31_60", "31–60 days", 31, 60),
+    ("days_over_60", "60+ days", 61, None),
+)
+AGING_FIELDS = ["sale_count"] + [field for field, *_ in AGING_BUCKETS] + ["total", "oldest_sale_at", "as_of"]
+
+
+# -------------------
+# Paid amounts
+# -------------------
+def _money(expression):
+    return Coalesce(expression, Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def refresh_paid_amounts(sale_ids=None):
+    """
+    Recompute ``paid_amount`` for ``sale_ids`` (default: every sale) and
+    return the number of sales that changed. Only those are written, with a
+    fresh ``updated_at`` so delta sync ships the new balance.
+    """
+    if sale_ids is None:
+        sale_ids = Sale.objects.filter(
+            Q(paid_amount__gt=0) | Q(pk__in=Payment.objects.filter(status=PaymentStatus.COMPLETED).values("sale"))
+        ).values_list("pk", flat=True)
+    ids = list(sale_ids)
+    paid = (
+        Payment.objects
+        .filter(sale=OuterRef("pk"), status=PaymentStatus.COMPLETED)
+        .order_by()
+        .values("sale")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    changed = 0
+    with transaction.atomic():
+        for i in range(0, len(ids), CHUNK_SIZE):
+            stale = (
+                Sale.objects
+                .filter(pk__in=ids[i:i + CHUNK_SIZE])
+                .annotate(paid=_money(Subquery(paid)))
+                .exclude(paid_amount=F("paid"))
+                .values("pk")
+            )
+            changed += Sale.objects.filter(pk__in=stale).update(
+                paid_amount=_money(Subquery(paid)), updated_at=timezone.now(),  # auto_now is skipped
+            )
+    return changed
+
+
+# -------------------
+# Aging rollup
+# -------------------
+def _open_credit():
+    return Sale.objects.filter(payment_method=PaymentMethod.CREDIT, outstanding__gt=0)
+
+
+def refresh_aging(pairs=None, now=None):
+    """
+    Rebuild ``ReceivableAging`` as of ``now``: every row, or only the
+    ``(agent_id, market_id)`` pairs given. One grouped query over open
+    credit sales, upserted in one statement; pairs with nothing owed any
+    more are deleted. Returns the number of rows written.
+    """
+    now = now or timezone.now()
+    sales, rows = _open_credit(), ReceivableAging.objects.all()
+    if pairs is not None:
+        pairs = set(pairs)
+        if not pairs:
+            return 0
+        # The agents x markets square around the pairs: exact for each pair in it
+        agents, markets = {agent for agent, _ in pairs}, {market for _, market in pairs}
+        sales = sales.filter(agent__in=agents, market__in=markets)
+        rows = rows.filter(agent__in=agents, market__in=markets)
+
+    buckets = {}
+    for field, _, youngest, oldest in AGING_BUCKETS:
+        age = Q()
+        if youngest:
+            age &= Q(timestamp__lte=now - timedelta(days=youngest))
+        if oldest is not None:
+            age &= Q(timestamp__gt=now - timedelta(days=oldest + 1))
+        buckets[field] = _money(Sum("outstanding", filter=age))
+    totals = (
+        sales.order_by()
+        .values("agent", "market")
+        .annotate(
+            sale_count=Count("pk"), total=Sum("outstanding"), oldest_sale_at=Min("timestamp"), **buckets,
+        )
+    )
+    aging = [
+        ReceivableAging(agent_id=row.pop("agent"), market_id=row.pop("market"), as_of=now, updated_at=now, **row)
+        for row in totals
+    ]
+    with transaction.atomic():
+        ReceivableAging.objects.bulk_create(
+            aging, update_conflicts=True, unique_fields=["agent", "market"],
+            update_fields=AGING_FIELDS + ["updated_at"],
+        )
+        # Anything not written above is settled (a newer concurrent refresh is left alone)
+        rows.filter(as_of__lt=now).delete()
+    return len(aging)
+
+
+def refresh_sales(sale_ids, pairs=()):
+    """
+    Bring receivables up to date after the payments of ``sale_ids`` changed:
+    their paid amounts, then the aging of their agent/market pairs (plus
+    ``pairs``, for sales that no longer exist).
+    """
+    sale_ids = list(sale_ids)
+    refresh_paid_amounts(sale_ids)
+    pairs = set(pairs)
+    for i in range(0, len(sale_ids), CHUNK_SIZE):
+        pairs.update(
+            Sale.objects
+            .filter(pk__in=sale_ids[i:i + CHUNK_SIZE], payment_method=PaymentMethod.CREDIT)
+            .order_by()
+            .values_list("agent", "market")
+            .distinct()
+        )
+    return refresh_aging(pairs)
+
+
+# -------------------
+# Report
+# -------------------
+def aging_report(agent_ids=None):
+    """
+    The credit aging report from the rollup: rows per agent and market
+    (largest debt first) and the bucket totals. ``agent_ids`` limits it,
+    e.g. to a manager's team.
+    """
+    rows = ReceivableAging.objects.select_related("agent", "market").order_by("-total")
+    if agent_ids is not None:
+        rows = rows.filter(agent__in=agent_ids)
+    rows = list(rows)
+    totals = {field: sum((getattr(row, field) for row in rows), ZERO) for field in AGING_FIELDS[1:-2]}
+    return {
+        "rows": rows,
+        "buckets": [(field, label, totals[field]) for field, label, *_ in AGING_BUCKETS],
+        "total": totals["total"],
+        "sale_count": sum(row.sale_count for row in rows),
+        "as_of": min((row.as_of for row in rows), default=None),
+    }
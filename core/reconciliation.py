@@ -0,0 +1,240 @@
+# core/reconciliation.py
+"""
+M-Pesa statement reconciliation.
+
+The statement CSV (as exported from the M-Pesa org portal) is streamed once
+into a hash table of completed receipts, ``{receipt: (amount, completed_at)}``.
+Pending M-Pesa payments are then read in primary-key chunks and probed
+against it on ``transaction_ref``. Matches with the right amount are marked
+COMPLETED with the statement's completion time, in bulk.
+Nothing is queried per row, so a month's statement costs a handful of
+queries per few thousand payments.
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.db import connections, router, transaction
+from django.db.models.functions import Trim, Upper
+from django.utils import timezone
+
+from core.models import Payment, PaymentMethod, PaymentStatus
+from core.payments import announce
+
+CHUNK_SIZE = 2000
+REPORT_LIMIT = 500  # rows listed per problem category; counts are always complete
+
+# Header aliases: portal statements, C2B callback exports and hand-made sheets
+RECEIPT_COLUMNS = ("receipt no.", "receipt no", "receipt", "transid", "transaction id", "mpesa receipt")
+AMOUNT_COLUMNS = ("paid in", "amount", "transamount")
+TIME_COLUMNS = ("completion time", "transtime", "date", "transaction time")
+STATUS_COLUMNS = ("transaction status", "status")
+TIME_FORMATS = ("%d-%m-%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%Y%m%d%H%M%S")
+
+
+class StatementError(Exception):
+    pass
+
+
+# -------------------
+# Statement parsing
+# -------------------
+def _column(header, names):
+    for i, title in enumerate(header):
+        if title.strip().lower() in names:
+            return i
+    return None
+
+
+def _amount(text):
+    try:
+        return Decimal(text.replace(",", "").strip() or "0")
+    except InvalidOperation:
+        return None
+
+
+def _timestamp(text):
+    text = text.strip()
+    try:
+        parsed = datetime.fromisoformat(text)  # the portal's format; much faster than strptime
+    except ValueError:
+        for fmt in TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def read_statement(lines):
+    """
+    Stream ``lines`` (a text file or any iterable of CSV lines) into
+    ``({receipt: (amount, completed_at)}, duplicates, skipped)``.
+
+    Rows before the header (the portal's account summary) are skipped, as
+    are non-completed transactions and withdrawals. A receipt seen twice is
+    dropped from the table and listed in ``duplicates``.
+    """
+    reader = csv.reader(lines)
+    for header in reader:
+        receipt_col = _column(header, RECEIPT_COLUMNS)
+        if receipt_col is not None:
+            break
+    else:
+        raise StatementError("No receipt column found (expected e.g. 'Receipt No.').")
+    amount_col = _column(header, AMOUNT_COLUMNS)
+    if amount_col is None:
+        raise StatementError("No amount column found (expected e.g. 'Paid In').")
+    time_col, status_col = _column(header, TIME_COLUMNS), _column(header, STATUS_COLUMNS)
+
+    receipts, duplicates, skipped = {}, {}, 0
+    width = max(c for c in (receipt_col, amount_col, time_col, status_col) if c is not None) + 1
+    for row in reader:
+        if len(row) < width or not row[receipt_col].strip():
+            skipped += 1
+            continue
+        if status_col is not None and row[status_col].strip().lower() != "completed":
+            skipped += 1
+            continue
+        amount = _amount(row[amount_col])
+        if not amount or amount <= 0:
+            skipped += 1  # withdrawals and charges
+            continue
+        receipt = row[receipt_col].strip().upper()
+        if receipt in receipts or receipt in duplicates:
+            duplicates[receipt] = duplicates.get(receipt, 1) + 1
+            receipts.pop(receipt, None)
+            continue
+        completed_at = _timestamp(row[time_col]) if time_col is not None else None
+        receipts[receipt] = (amount, completed_at)
+    return receipts, duplicates, skipped
+
+
+# -------------------
+# Matching
+# -------------------
+def _pending_chunks():
+    """Pending M-Pesa payments with a reference, ``CHUNK_SIZE`` at a time by primary key."""
+    queryset = (
+        Payment.objects
+        .filter(method=PaymentMethod.MPESA, status=PaymentStatus.PENDING, transaction_ref__isnull=False)
+        .order_by("pk")
+        .values_list("pk", "transaction_ref", "amount", "sale_id")
+    )
+    last = None
+    while True:
+        chunk = list((queryset.filter(pk__gt=last) if last else queryset)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def _complete(matches, now):
+    """
+    Mark ``{payment_pk: completed_at}`` COMPLETED with one precompiled UPDATE
+    run through ``executemany`` (a CASE over thousands of pks costs more to
+    build in the ORM than to run); returns the pks changed. Payments settled
+    meanwhile are left alone: the ones still pending are locked first, so
+    exactly those are updated.
+    """
+    pending = list(
+        Payment.objects.select_for_update()
+        .filter(pk__in=list(matches), status=PaymentStatus.PENDING)
+        .values_list("pk", flat=True)
+    )
+    connection = connections[router.db_for_write(Payment)]  # not the proxy: it's hit per value below
+    qn = connection.ops.quote_name
+    meta = Payment._meta
+    sql = "UPDATE {} SET {} = %s, {} = %s, {} = %s WHERE {} = %s AND {} = %s".format(
+        qn(meta.db_table), qn("status"), qn("processed_at"), qn("updated_at"), qn(meta.pk.column), qn("status"),
+    )
+    to_db_pk = partial(meta.pk.get_db_prep_value, connection=connection)
+    to_db_time = partial(meta.get_field("processed_at").get_db_prep_value, connection=connection)
+    stamped = to_db_time(now)  # updated_at: the bypassed auto_now, read by delta sync
+    rows = [
+        (PaymentStatus.COMPLETED, to_db_time(matches[pk] or now), stamped, to_db_pk(pk), PaymentStatus.PENDING)
+        for pk in pending
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return pending
+
+
+def reconcile(lines, dry_run=False):
+    """
+    Reconcile a statement against pending M-Pesa payments; see the module
+    docstring. Returns a report dict: counts plus (up to REPORT_LIMIT)
+    rows for each problem category. With ``dry_run`` nothing is written.
+    """
+    receipts, duplicates, skipped = read_statement(lines)
+    now = timezone.now()
+    report = {
+        "statement_rows": len(receipts) + sum(duplicates.values()),
+        "skipped_rows": skipped,
+        "matched": 0,
+        "amount_mismatches": [],
+        "amount_mismatch_count": 0,
+        "duplicates": sorted(duplicates.items())[:REPORT_LIMIT],
+        "duplicate_count": len(duplicates),
+        "duplicate_payments": 0,
+    }
+    claimed, completed, sale_ids, sale_of = set(), [], set(), {}
+    with transaction.atomic():
+        for chunk in _pending_chunks():
+            matches = {}
+            for pk, ref, expected, sale_id in chunk:
+                ref = ref.strip().upper()
+                entry = receipts.get(ref)
+                if entry is None:
+                    continue
+                if ref in claimed:
+                    report["duplicate_payments"] += 1  # one receipt settles one payment only
+                    continue
+                claimed.add(ref)
+                paid, completed_at = entry
+                if paid == expected:
+                    matches[pk] = completed_at
+                    sale_of[pk] = sale_id
+                else:
+                    report["amount_mismatch_count"] += 1
+                    if len(report["amount_mismatches"]) < REPORT_LIMIT:
+                        report["amount_mismatches"].append((ref, expected, paid))
+            if matches:
+                changed = list(matches) if dry_run else _complete(matches, now)
+                report["matched"] += len(changed)
+                completed += changed
+                sale_ids.update(sale_of[pk] for pk in changed)
+        if completed and not dry_run:
+            # Per-row processed_at doesn't fit payments.transition(); notify the same way
+            transaction.on_commit(lambda: announce(PaymentStatus.COMPLETED, completed, sale_ids))
+
+    # Receipts no pending payment claimed: settled by an earlier run, or unknown
+    leftover = sorted(set(receipts) - claimed)
+    settled = _already_settled(leftover)
+    unmatched = [receipt for receipt in leftover if receipt not in settled]
+    report.update(
+        already_settled=len(settled),
+        unmatched=[(receipt, *receipts[receipt]) for receipt in unmatched[:REPORT_LIMIT]],
+        unmatched_count=len(unmatched),
+    )
+    return report
+
+
+def _already_settled(receipts):
+    """Receipts among ``receipts`` that belong to payments no longer pending (earlier runs)."""
+    # Compared as the statement's receipts are: trimmed, upper case (see the index on Payment)
+    settled = set()
+    for i in range(0, len(receipts), CHUNK_SIZE):
+        settled.update(
+            Payment.objects
+            .annotate(ref=Upper(Trim("transaction_ref")))
+            .filter(ref__in=receipts[i:i + CHUNK_SIZE])
+            .exclude(status=PaymentStatus.PENDING)
+            .values_list("ref", flat=True)
+        )
+    return settled
@@ -0,0 +1,230 @@
+# core/reports.py
+"""
+Sales trend reporting.
+
+One grouped query loads daily totals per pack, market or agent into a
+``keys x days`` NumPy matrix (days with no sales are zeros). Everything else
+is computed on the whole matrix at once, with no per-series Python loop:
+
+- trailing rolling means, from a cumulative sum
+- week-over-week and year-over-year growth of the trailing 7-day total
+  (year-over-year compares with 364 days earlier, the same weekday)
+- seasonality indexes: the mean per weekday and per month over the overall
+  mean, so 1.2 means "20% above an average day"
+
+``sales_trends()`` returns the result as JSON-ready lists, cached per query
+signature in the ``reports`` namespace. Each calendar month has its own
+version (``reports:<YYYY-MM>``) and a report depends on the months its data
+covers, so a sale recorded, edited or deleted for a past day only
+invalidates the reports that include that day. Sales dated today don't bump
+anything: the open day is always moving, and reports that include it are
+rebuilt every REPORT_CACHE_TIMEOUT, serving the previous result meanwhile.
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.cache import get_or_build
+from core.models import Market, PackSize, Sale, User
+
+REPORT_CACHE_TIMEOUT = 60 * 10  # how stale today's figures (and bulk writes) may get
+WEEK, YEAR = 7, 364
+MAX_DAYS = 2 * 366
+
+DIMENSIONS = {"pack": "pack_id", "market": "market_id", "agent": "agent_id"}
+METRICS = {"revenue": lambda: Sum("revenue"), "quantity": lambda: Sum("quantity"), "sales": lambda: Count("pk")}
+
+
+class ReportError(Exception):
+    pass
+
+
+# -------------------
+# Loading
+# -------------------
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def load_daily(column, metric, start, end, sales=None):
+    """
+    Daily ``metric`` per value of ``column`` (e.g. ``"pack_id"``, or a tuple
+    of columns for tuple keys) over ``sales`` (default: all) from ``start``
+    to ``end``, local dates inclusive. Returns ``(keys, days, matrix)``: the
+    keys, a ``datetime64[D]`` array and a float ``len(keys) x len(days)``
+    matrix.
+    """
+    columns = (column,) if isinstance(column, str) else tuple(column)
+    sales = Sale.objects.all() if sales is None else sales
+    sales = sales.filter(timestamp__gte=_day_start(start), timestamp__lt=_day_start(end + timedelta(days=1)))
+    rows = (
+        sales.order_by()
+        .annotate(day=TruncDate("timestamp"))
+        .values_list(*columns, "day")
+        .annotate(value=METRICS[metric]())
+    )
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+    if not rows:
+        return [], days, np.zeros((0, len(days)))
+    *key_columns, day_column, values = zip(*rows)
+    key_column = key_columns[0] if len(key_columns) == 1 else zip(*key_columns)
+    index = {}
+    rows_at = np.fromiter((index.setdefault(key, len(index)) for key in key_column), np.intp, len(values))
+    days_at = np.array(day_column, dtype="datetime64[D]") - days[0]
+    matrix = np.zeros((len(index), len(days)))
+    matrix[rows_at, days_at.astype(np.intp)] = np.array(values, dtype=float)
+    return list(index), days, matrix
+
+
+# -------------------
+# Vectorized measures
+# -------------------
+def rolling_sum(matrix, window):
+    """Trailing ``window``-day sums per row; NaN until a full window is available."""
+    totals = np.cumsum(matrix, axis=1)
+    out = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] >= window:
+        out[:, window - 1:] = totals[:, window - 1:]
+        out[:, window:] -= totals[:, :-window]
+    return out
+
+
+def rolling_mean(matrix, window):
+    return rolling_sum(matrix, window) / window
+
+
+def growth(series, lag):
+    """``series[t] / series[t - lag] - 1`` per row; NaN without a (non-zero) base."""
+    out = np.full(series.shape, np.nan)
+    base = series[:, :-lag]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:, lag:] = np.where(base > 0, series[:, lag:] / base - 1, np.nan)
+    return out
+
+
+def seasonality(matrix, groups, size):
+    """
+    Mean per group (``groups[d]`` in ``range(size)`` for day ``d``) over the
+    overall mean, per row; NaN for groups with no days or rows with no sales.
+    """
+    onehot = np.zeros((len(groups), size))
+    onehot[np.arange(len(groups)), groups] = 1
+    counts = onehot.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = (matrix @ onehot) / counts
+        return means / matrix.mean(axis=1, keepdims=True)
+
+
+def weekday_of(days):
+    return (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday is 0
+
+
+def month_of(days):
+    return days.astype("datetime64[M]").astype(np.int64) % 12  # January is 0
+
+
+# -------------------
+# Report
+# -------------------
+def month_scope(day):
+    """Cache namespace of the reports covering ``day`` (core.signals bumps it for past days)."""
+    return f"reports:{day:%Y-%m}"
+
+
+def _month_scopes(start, end):
+    months = np.arange(np.datetime64(start, "M"), np.datetime64(end, "M") + 1)
+    return [f"reports:{month}" for month in months.astype(str)]
+
+
+def _labels(dimension, keys):
+    if dimension == "pack":
+        return {
+            pack.pk: f"{pack.product.name} {pack.label}"
+            for pack in PackSize.objects.filter(pk__in=keys).select_related("product")
+        }
+    if dimension == "market":
+        return dict(Market.objects.filter(pk__in=keys).values_list("pk", "name"))
+    return {user.pk: user.get_full_name() or user.username for user in User.all_objects.filter(pk__in=keys)}
+
+
+def _json(array):
+    """Rounded floats with NaN as null."""
+    rounded = np.round(array, 4)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+def _history_start(start):
+    # A year (and a week) of history before ``start`` for year-over-year growth and seasonality
+    return start - timedelta(days=YEAR + WEEK - 1)
+
+
+def build_trends(dimension, metric, start, end, window=7, top=10, agent_ids=None):
+    history = _history_start(start)
+    sales = Sale.objects.filter(agent__in=agent_ids) if agent_ids is not None else None
+    keys, days, matrix = load_daily(DIMENSIONS[dimension], metric, history, end, sales)
+    shown = slice((start - history).days, None)
+
+    # The "all" row covers every key, not just the top ones
+    everything = np.vstack([matrix.sum(axis=0, keepdims=True), matrix])
+    weekly = rolling_sum(everything, WEEK)
+    averaged = rolling_mean(everything, window)[:, shown]
+    wow, yoy = growth(weekly, WEEK)[:, shown], growth(weekly, YEAR)[:, shown]
+    by_weekday = seasonality(everything, weekday_of(days), 7)
+    by_month = seasonality(everything, month_of(days), 12)
+
+    totals = everything[:, shown].sum(axis=1)
+    order = [0] + [1 + i for i in np.argsort(-totals[1:], kind="stable")[:top] if totals[1 + i] > 0]
+    labels = _labels(dimension, [keys[i - 1] for i in order[1:]])
+
+    series = []
+    for row in order:
+        key = keys[row - 1] if row else None
+        series.append({
+            "key": str(key) if key else "all",
+            "label": labels.get(key, str(key)) if key else "All",
+            "total": round(float(totals[row]), 2),
+            "values": _json(everything[row, shown]),
+            "rolling_mean": _json(averaged[row]),
+            "wow_growth": _json(wow[row]),
+            "yoy_growth": _json(yoy[row]),
+            "weekday_index": _json(by_weekday[row]),
+            "month_index": _json(by_month[row]),
+        })
+    return {
+        "dimension": dimension,
+        "metric": metric,
+        "window": window,
+        "dates": [str(day) for day in days[shown]],
+        "series": series,
+    }
+
+
+def sales_trends(dimension="pack", metric="revenue", start=None, end=None, window=7, top=10, agent_ids=None):
+    """
+    Trend report for charts, cached per signature (``agent_ids`` scopes it,
+    e.g. to a manager's team). Raises ReportError for bad parameters.
+    """
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=89)
+    if dimension not in DIMENSIONS:
+        raise ReportError(f"dimension must be one of {', '.join(DIMENSIONS)}.")
+    if metric not in METRICS:
+        raise ReportError(f"metric must be one of {', '.join(METRICS)}.")
+    if not 0 <= (end - start).days < MAX_DAYS:
+        raise ReportError(f"The range must run forwards and span at most {MAX_DAYS} days.")
+    if not 1 <= window <= 90 or not 1 <= top <= 50:
+        raise ReportError("window must be 1-90 days and top 1-50 series.")
+
+    scope = None if agent_ids is None else sorted(str(pk) for pk in agent_ids)
+    signature = json.dumps([dimension, metric, str(start), str(end), window, top, scope])
+    key = f"trends:{hashlib.sha1(signature.encode()).hexdigest()}"
+    return get_or_build(
+        "reports", key,
+        lambda: build_trends(dimension, metric, start, end, window, top, agent_ids),
+        REPORT_CACHE_TIMEOUT, depends=_month_scopes(_history_start(start), end),
+    )
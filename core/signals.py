@@ -0,0 +1,189 @@
+# core/signals.py
+from functools import partial
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.autoreload import file_changed
+
+from core import metrics
+from core.backends import invalidate_cached_user
+from core.cache import bump
+from core.models import (
+    Market, Outlet, PackSize, Payment, PaymentMethod, PriceList, Product, Return, Sale, StockLedger, User, Visit,
+)
+from core.payments import payments_transitioned
+from core.receivables import refresh_sales
+from core.reports import month_scope
+from core.sync import TOMBSTONE_AGENTS, record_deletion
+from core.team import agent_kpis, invalidate_team
+
+# Fields whose change moves an agent in or out of a manager's team
+TEAM_FIELDS = {"manager", "manager_id", "role", "is_soft_deleted"}
+
+
+# -------------------
+# Team membership
+# -------------------
+@receiver(pre_save, sender=User)
+def remember_previous_manager(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_manager_id = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not TEAM_FIELDS.intersection(update_fields):
+        return  # e.g. the last_login update on every login
+    instance._previous_manager_id = (
+        User.objects.filter(pk=instance.pk).values_list("manager_id", flat=True).first()
+    )
+
+
+# On commit, like the user cache below: the membership is rebuilt from the
+# primary, which must already show the reassignment
+@receiver(post_save, sender=User)
+def invalidate_team_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not TEAM_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(partial(
+        invalidate_team, instance.manager_id, getattr(instance, "_previous_manager_id", None),
+    ))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_team_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_team, instance.manager_id))
+
+
+# -------------------
+# Cached request.user
+# -------------------
+# After commit: dropped any earlier, a concurrent request could cache the old
+# row again before the change is visible, for USER_CACHE_TIMEOUT
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_cached_user, instance.pk))
+
+
+# -------------------
+# Cache namespaces
+# -------------------
+# Bumped after commit, so a reader can't rebuild from the old rows under the new version
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=PackSize)
+@receiver(post_delete, sender=PackSize)
+@receiver(post_save, sender=Market)
+@receiver(post_delete, sender=Market)
+@receiver(post_save, sender=Outlet)
+@receiver(post_delete, sender=Outlet)
+def bump_catalog(sender, **kwargs):
+    transaction.on_commit(partial(bump, "catalog"))
+
+
+@receiver(post_save, sender=PriceList)
+@receiver(post_delete, sender=PriceList)
+def bump_prices(sender, **kwargs):
+    transaction.on_commit(partial(bump, "price"))
+
+
+# Dashboard KPIs (and the {% cache %} fragments rendering them) of the
+# recording agent and, through core.team.team_kpis, their manager's team.
+# The admin's global totals aren't bumped: with every agent writing they
+# would never stay cached, so they refresh on their timeout instead.
+@receiver(post_save, sender=Visit)
+@receiver(post_delete, sender=Visit)
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=Return)
+@receiver(post_delete, sender=Return)
+def bump_kpis(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(bump, agent_kpis(instance.agent_id)))
+
+
+# Trend reports covering a past day (a late or corrected sale); today's
+# figures refresh on the reports' timeout instead (core/reports.py). A sale
+# moved to another day leaves the month it was in as well.
+@receiver(pre_save, sender=Sale)
+def remember_previous_timestamp(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_timestamp = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and "timestamp" not in update_fields:
+        return
+    instance._previous_timestamp = (
+        Sale.objects.filter(pk=instance.pk).values_list("timestamp", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def bump_reports(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    today = timezone.localdate()
+    stamps = (instance.timestamp, getattr(instance, "_previous_timestamp", None))
+    scopes = {month_scope(day) for day in (timezone.localdate(t) for t in stamps if t) if day < today}
+    if scopes:
+        transaction.on_commit(partial(bump, *sorted(scopes)))
+
+
+# -------------------
+# Receivables
+# -------------------
+# Bulk status changes (core/payments.py, reconciliation) arrive already committed
+@receiver(payments_transitioned)
+def refresh_receivables(sender, sale_ids, **kwargs):
+    refresh_sales(sale_ids)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_receivables_on_payment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(refresh_sales, [instance.sale_id]))
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def refresh_receivables_on_sale(sender, instance, raw=False, **kwargs):
+    if not raw and instance.payment_method == PaymentMethod.CREDIT:
+        transaction.on_commit(partial(refresh_sales, [], pairs=[(instance.agent_id, instance.market_id)]))
+
+
+# -------------------
+# Delta sync tombstones
+# -------------------
+@receiver(post_delete)
+def leave_tombstone(sender, instance, **kwargs):
+    if sender in TOMBSTONE_AGENTS:
+        record_deletion(instance)
+
+
+# -------------------
+# Template fragments
+# -------------------
+@receiver(file_changed)
+def clear_template_fragments(sender, file_path, **kwargs):
+    # runserver reloads templates without restarting; drop fragments rendered from the old ones
+    if file_path.suffix == ".html":
+        caches["template_fragments"].clear()
+
+
+# -------------------
+# Domain metrics
+# -------------------
+@receiver(post_save, sender=Sale)
+def count_sale(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        metrics.SALES_INGESTED.inc()
+
+
+@receiver(post_save, sender=StockLedger)
+def count_ledger_posting(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        metrics.LEDGER_POSTINGS.inc(movement_type=instance.movement_type)
@@ -0,0 +1,45 @@
+# core/storage.py
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; only .gz siblings are written without it
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".xml", ".html", ".ico"}
+MIN_SAVING = 0.05  # keep a sibling only if it is at least 5% smaller
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest (content-hashed) static files plus pre-built ``.br`` and ``.gz``
+    siblings, written once by collectstatic at maximum compression so
+    requests never pay for it. Served by core.middleware.StaticFilesMiddleware.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Both the original and the hashed copy are in STATIC_ROOT
+        for name in {*self.hashed_files, *self.hashed_files.values()}:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, "rb") as f:
+            data = f.read()
+        siblings = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            siblings[".br"] = brotli.compress(data, quality=11)
+        for suffix, compressed in siblings.items():
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)  # left over from a previous build
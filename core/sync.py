@@ -0,0 +1,188 @@
+# core/sync.py
+"""
+Delta sync for offline agents.
+
+The client keeps an opaque token holding, per stream, the ``(updated_at, id)``
+of the last row it received. ``changes()`` returns the agent's rows changed
+since then plus the ids deleted since then (from DeletedRecord tombstones),
+each stream paginated by keyset on its ``(agent, updated_at)`` index, and a
+new token. Without a token, or with one older than the tombstone retention,
+a stream is sent in full and flagged ``reset`` so the client replaces its copy.
+
+The ``stock`` stream is derived: one row per pack (``id`` is the pack id)
+with the agent's stock on hand, the sum of their StockLedger entries. The
+ledger is append-only, so a pack's balance changes exactly when it gets a
+new entry: the stream pages through the entries after its watermark and
+sends the current balance of each pack they touch. It has no deletes.
+
+``updated_at`` comes from ``auto_now``, which bulk ``update()`` calls don't
+touch: code updating synced rows in bulk must set it explicitly.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import DeletedRecord, Payment, Return, Sale, StockLedger, Transfer, Visit
+
+TOKEN_SALT = "core.sync"
+
+# stream -> (model, rows of the agent)
+STREAMS = {
+    "visits": (Visit, lambda agent: Q(agent=agent)),
+    "sales": (Sale, lambda agent: Q(agent=agent)),
+    "payments": (Payment, lambda agent: Q(sale__agent=agent)),
+    "transfers": (Transfer, lambda agent: Q(from_agent=agent) | Q(to_agent=agent)),
+    "returns": (Return, lambda agent: Q(agent=agent)),
+}
+# Watermark of the derived stock stream; tokens from when the stream sent
+# InventorySnapshot rows don't have it, so they start the stream over
+STOCK_MARK = "stock.ledger"
+
+# model -> ids of the agents a deleted row was synced to
+TOMBSTONE_AGENTS = {
+    Visit: lambda obj: {obj.agent_id},
+    Sale: lambda obj: {obj.agent_id},
+    Payment: lambda obj: set(Sale.objects.filter(pk=obj.sale_id).values_list("agent_id", flat=True)),
+    Transfer: lambda obj: {obj.from_agent_id, obj.to_agent_id} - {None},
+    Return: lambda obj: {obj.agent_id},
+}
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+def page_size():
+    return getattr(settings, "SYNC_PAGE_SIZE", 500)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, "SYNC_TOMBSTONE_DAYS", 30))
+
+
+# -------------------
+# Tokens
+# -------------------
+def dump_token(agent, marks):
+    return signing.dumps({"agent": str(agent.pk), "marks": marks}, salt=TOKEN_SALT, compress=True)
+
+
+def load_token(agent, token):
+    """Watermarks ``{stream: [iso updated_at, id]}`` from ``token``; {} for a first sync."""
+    if not token:
+        return {}
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise InvalidSyncToken("Malformed or tampered sync token.")
+    if data.get("agent") != str(agent.pk):
+        raise InvalidSyncToken("Sync token belongs to another user.")
+    return data["marks"]
+
+
+# -------------------
+# Changes
+# -------------------
+def _after(mark):
+    updated_at, pk = parse_datetime(mark[0]), mark[1]
+    if pk is None:
+        return Q(updated_at__gt=updated_at)
+    return Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk)
+
+
+def _page(queryset, mark, until, fields):
+    """One keyset page of ``queryset`` after ``mark``; returns (rows, new mark, has_more)."""
+    if mark:
+        queryset = queryset.filter(_after(mark))
+    size = page_size()
+    rows = list(queryset.filter(updated_at__lte=until).order_by("updated_at", "pk").values(*fields)[:size + 1])
+    if len(rows) > size:
+        rows = rows[:size]
+        return rows, [rows[-1]["updated_at"].isoformat(), str(rows[-1]["id"])], True
+    # Everything up to ``until`` has been sent; moving the mark there also
+    # keeps quiet streams from ageing past the tombstone retention
+    return rows, [until.isoformat(), None], False
+
+
+def _stock_page(agent, mark, until):
+    """Balances of the packs touched by one page of the agent's ledger entries after ``mark``; like ``_page()``."""
+    entries = StockLedger.objects.filter(agent=agent)
+    entries, mark, has_more = _page(entries, mark, until, ["id", "updated_at", "pack_id"])
+    balances = (
+        StockLedger.objects
+        .filter(agent=agent, pack__in={entry["pack_id"] for entry in entries}, updated_at__lte=until)
+        .order_by("pack")
+        .values("pack_id", "product_id")
+        .annotate(quantity=Sum("quantity"), updated_at=Max("updated_at"))
+    )
+    return [{"id": row["pack_id"], **row} for row in balances], mark, has_more
+
+
+def _expired(mark, expired):
+    return not mark or parse_datetime(mark[0]) < expired
+
+
+def changes(agent, token=None):
+    """
+    The agent's changes since ``token``:
+    ``{"token", "has_more", "streams": {name: {"reset", "upserts", "deletes", "has_more"}}}``.
+    Call again with the new token while ``has_more``.
+    """
+    marks = load_token(agent, token)
+    now = timezone.now()
+    # Rows committed by a transaction still open at ``now`` can carry an
+    # earlier updated_at; leave a margin so the watermark doesn't skip them
+    until = now - timedelta(seconds=getattr(settings, "SYNC_SETTLE_SECONDS", 5))
+    expired = now - tombstone_retention()
+
+    new_marks, streams = {}, {}
+    for name, (model, scope) in STREAMS.items():
+        mark, deleted_mark = marks.get(name), marks.get(f"{name}.deleted")
+        reset = _expired(mark, expired)
+        if reset:
+            # Tombstones from before the full download don't concern the client
+            mark, deleted_mark = None, [until.isoformat(), None]
+
+        fields = [field.attname for field in model._meta.concrete_fields]
+        upserts, mark, more_rows = _page(model.objects.filter(scope(agent)), mark, until, fields)
+
+        deletes, more_deletes = [], False
+        if not reset:
+            tombstones = DeletedRecord.objects.filter(agent=agent, model=model._meta.label_lower)
+            rows, deleted_mark, more_deletes = _page(tombstones, deleted_mark, until, ["id", "updated_at", "object_id"])
+            deletes = [row["object_id"] for row in rows]
+
+        new_marks[name] = mark
+        new_marks[f"{name}.deleted"] = deleted_mark
+        streams[name] = {
+            "reset": reset, "upserts": upserts, "deletes": deletes, "has_more": more_rows or more_deletes,
+        }
+
+    reset = _expired(marks.get(STOCK_MARK), expired)
+    upserts, new_marks[STOCK_MARK], more_rows = _stock_page(agent, None if reset else marks[STOCK_MARK], until)
+    streams["stock"] = {"reset": reset, "upserts": upserts, "deletes": [], "has_more": more_rows}
+
+    return {
+        "token": dump_token(agent, new_marks),
+        "has_more": any(stream["has_more"] for stream in streams.values()),
+        "streams": streams,
+    }
+
+
+def record_deletion(instance):
+    """Leave tombstones for a deleted synced row (post_delete, core.signals)."""
+    agents = TOMBSTONE_AGENTS[type(instance)](instance)
+    DeletedRecord.objects.bulk_create(
+        DeletedRecord(model=instance._meta.label_lower, object_id=str(instance.pk), agent_id=agent_id)
+        for agent_id in agents
+    )
+
+
+def prune_tombstones():
+    """Drop tombstones past retention; tokens that old get a full reset instead."""
+    deleted, _ = DeletedRecord.objects.filter(updated_at__lt=timezone.now() - tombstone_retention()).delete()
+    return deleted
@@ -0,0 +1,161 @@
+# core/team.py
+from decimal import Decimal
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.cache import aget_or_build, bump, get_or_build, make_key
+from core.db_routers import use_replica
+from core.models import User, Role, Visit, Sale, Return
+from core.utils import run_concurrently
+
+TEAM_CACHE_TIMEOUT = 60 * 60  # membership only changes when an admin reassigns agents
+TEAM_STATS_TIMEOUT = 60       # upper bound; sales, visits and returns bump their agent's KPIs (core.signals)
+
+
+# -------------------
+# Team membership
+# -------------------
+def get_team_agent_ids(manager):
+    """Ids of the active agents reporting to ``manager``, cached until reassignment."""
+    return get_or_build("team", f"agents:{manager.pk}", partial(_team_agent_ids, manager), TEAM_CACHE_TIMEOUT)
+
+
+def _team_agent_ids(manager):
+    # From the primary: membership is cached for an hour, and a lagging replica
+    # would cache the team as it was before the reassignment that invalidated it
+    with use_replica(False):
+        return list(
+            User.objects
+            .filter(manager=manager, role=Role.AGENT, is_soft_deleted=False)
+            .order_by("username")
+            .values_list("id", flat=True)
+        )
+
+
+def invalidate_team(*manager_ids):
+    manager_ids = [manager_id for manager_id in manager_ids if manager_id]
+    if manager_ids:
+        cache.delete_many([make_key("team", f"agents:{manager_id}") for manager_id in manager_ids])
+    bump("kpi", *(f"kpi:team:{manager_id}" for manager_id in manager_ids))  # team totals and user counts
+
+
+# -------------------
+# Team KPIs
+# -------------------
+def _per_agent(model, aggregate, output_field):
+    """Correlated subquery returning ``aggregate`` over ``model`` rows of the outer agent."""
+    rows = (
+        model.objects
+        .filter(agent=OuterRef("pk"))
+        .order_by()
+        .values("agent")
+        .annotate(total=aggregate)
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=output_field), Value(0), output_field=output_field)
+
+
+def agent_kpis(agent_id):
+    """Cache namespace of one agent's KPIs, bumped by the agent's visits, sales and returns."""
+    return f"kpi:agent:{agent_id}"
+
+
+def team_kpis(manager):
+    """``(namespace, depends)`` of ``manager``'s team KPIs: the team's scope plus each member's."""
+    return f"kpi:team:{manager.pk}", [agent_kpis(agent_id) for agent_id in get_team_agent_ids(manager)]
+
+
+def get_team_stats(manager):
+    """
+    Team totals plus a per-agent breakdown for ``manager``, cached for
+    TEAM_STATS_TIMEOUT seconds or until one of the team's agents records
+    something (or the team changes).
+    """
+    namespace, depends = team_kpis(manager)
+    return get_or_build(namespace, "stats", lambda: _team_stats(manager), TEAM_STATS_TIMEOUT, depends)
+
+
+def _team_stats(manager):
+    # Each KPI is a correlated subquery on the agent row, so the whole team is
+    # aggregated in one grouped query regardless of team size (and without the
+    # row multiplication a multi-table JOIN + COUNT would cause).
+    agent_ids = get_team_agent_ids(manager)
+    agents = []
+    if agent_ids:
+        money = DecimalField(max_digits=14, decimal_places=2)
+        agents = list(
+            User.objects
+            .filter(id__in=agent_ids)
+            .annotate(
+                visit_count=_per_agent(Visit, Count("id"), IntegerField()),
+                sale_count=_per_agent(Sale, Count("id"), IntegerField()),
+                units_sold=_per_agent(Sale, Sum("quantity"), IntegerField()),
+                revenue_total=_per_agent(Sale, Sum("revenue"), money),
+                return_count=_per_agent(Return, Count("id"), IntegerField()),
+            )
+            .order_by("username")
+            .values(
+                "id", "username", "region",
+                "visit_count", "sale_count", "units_sold", "revenue_total", "return_count",
+            )
+        )
+
+    return _with_totals(agent_ids, agents)
+
+
+async def aget_team_stats(manager):
+    """
+    get_team_stats() for async views (same cache entry). Instead of one query
+    of correlated subqueries, the per-agent aggregates run as separate
+    GROUP BY queries at the same time and are joined up here.
+    """
+    namespace, depends = await sync_to_async(team_kpis)(manager)
+    return await aget_or_build(namespace, "stats", partial(_ateam_stats, manager), TEAM_STATS_TIMEOUT, depends)
+
+
+async def _ateam_stats(manager):
+    agent_ids = await sync_to_async(get_team_agent_ids)(manager)
+    if not agent_ids:
+        return _with_totals(agent_ids, [])
+
+    def grouped(model, **aggregates):
+        rows = model.objects.filter(agent_id__in=agent_ids).values("agent").annotate(**aggregates).order_by()
+        return {row.pop("agent"): row for row in rows}
+
+    results = await run_concurrently(
+        users=lambda: list(
+            User.objects.filter(id__in=agent_ids).order_by("username").values("id", "username", "region")
+        ),
+        visits=lambda: grouped(Visit, n=Count("id")),
+        sales=lambda: grouped(Sale, n=Count("id"), units=Sum("quantity"), revenue=Sum("revenue")),
+        returns=lambda: grouped(Return, n=Count("id")),
+    )
+    empty = {"n": 0, "units": 0, "revenue": Decimal("0")}
+    agents = []
+    for user in results["users"]:
+        sales = results["sales"].get(user["id"], empty)
+        agents.append({
+            **user,
+            "visit_count": results["visits"].get(user["id"], empty)["n"],
+            "sale_count": sales["n"],
+            "units_sold": sales["units"] or 0,
+            "revenue_total": sales["revenue"] or Decimal("0"),
+            "return_count": results["returns"].get(user["id"], empty)["n"],
+        })
+    return _with_totals(agent_ids, agents)
+
+
+def _with_totals(agent_ids, agents):
+    stats = {
+        "my_agents": len(agent_ids),
+        "team_visits": sum(a["visit_count"] for a in agents),
+        "team_sales": sum(a["sale_count"] for a in agents),
+        "team_units": sum(a["units_sold"] for a in agents),
+        "team_revenue": sum((a["revenue_total"] for a in agents), Decimal("0")),
+        "team_returns": sum(a["return_count"] for a in agents),
+    }
+    return {"stats": stats, "agents": agents}
@@ -1,3 +1,1197 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Q, Sum
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from core import benchmarks, metrics, reconciliation, storage, urls as core_urls, views, views_async
+from core.allocation import approve, suggest
+from core.backends import CachedModelBackend
+from core.db_routers import REPLICA, ReplicaRouter, use_replica
+from core.cache import bump, get_or_build, make_key, version_tag
+from core.forecasting import forecast_demand
+from core.forms import PriceListForm
+from core.middleware import QueryProfilerMiddleware, StaticFilesMiddleware
+from core.payments import IllegalTransition, payments_transitioned, transition
+from core.pricing import PricingError, price_lines
+from core.profiling import ProfileStore, profile_store
+from core.receivables import aging_report, refresh_aging
+from core.reports import growth, month_scope, rolling_mean, sales_trends, seasonality
+from core.reconciliation import reconcile
+from core.storage import CompressedManifestStaticFilesStorage
+from core.team import agent_kpis, get_team_stats, team_kpis
+from core.utils import run_sequentially, uuid7
+from core.models import (
+    User, Role, Product, PackSize, PriceList, Market, Outlet, Visit, Sale, Return, Payment, PaymentStatus,
+    PaymentMethod, ReceivableAging, DemandForecast, ForecastState, Allocation, AllocationStatus, StockLedger,
+)
+
+
+# ============================================================
+# Query-count regression tests
+# ============================================================
+class Dataset:
+    """Fixture data that can be grown in place, so every route is measured at two sizes."""
+
+    def __init__(self):
+        self.admin = User.objects.create_user("qc_admin", role=Role.ADMIN, password=None)
+        self.manager = User.objects.create_user("qc_manager", role=Role.MANAGER, password=None)
+        self.agents, self.markets, self.products = [], [], []
+        self.size = 0
+
+    @property
+    def agent(self):
+        return self.agents[0]
+
+    @property
+    def market(self):
+        return self.markets[0]
+
+    @property
+    def product(self):
+        return self.products[0]
+
+    @property
+    def pack(self):
+        return self.products[0].packs.first()
+
+    @property
+    def outlet(self):
+        return self.markets[0].outlets.first()
+
+    def grow(self, size):
+        """Bring every collection up to ``size`` rows (per parent for child rows)."""
+        today = timezone.localdate()
+        for i in range(len(self.products), size):
+            product = Product.objects.create(name=f"Product {i}", category="GREEN", sku=f"QC-P{i}")
+            for label in ("40g", "80g"):
+                pack = PackSize.objects.create(product=product, label=label, sku=f"QC-P{i}-{label}")
+                PriceList.objects.create(pack=pack, unit_price=Decimal("50"), effective_from=today)
+            self.products.append(product)
+        for i in range(len(self.markets), size):
+            market = Market.objects.create(name=f"Market {i}", region="Nairobi")
+            for j in range(2):
+                Outlet.objects.create(market=market, name=f"Outlet {i}-{j}")
+            self.markets.append(market)
+        for i in range(len(self.agents), size):
+            self.agents.append(User.objects.create_user(
+                f"qc_agent_{i}", role=Role.AGENT, manager=self.manager, password=None,
+            ))
+
+        pack = self.pack
+        for agent in self.agents:
+            for i in range(agent.visits.count(), size):
+                visit = Visit.objects.create(agent=agent, market=self.markets[i % len(self.markets)])
+                sale = Sale.objects.create(
+                    agent=agent, market=visit.market, visit=visit, pack=pack,
+                    quantity=2, unit_price=Decimal("50"),
+                )
+                Payment.objects.create(sale=sale, method="cash", amount=sale.revenue)
+                Return.objects.create(agent=agent, pack=pack, quantity=1, reason_code="damaged")
+        self.size = size
+
+    # Delete routes remove their target, so each measurement gets a fresh one
+    def disposable_product(self):
+        return Product.objects.create(name="Disposable", category="BLACK")
+
+    def disposable_market(self):
+        return Market.objects.create(name=f"Disposable {Market.objects.count()}", region="Nairobi")
+
+    def disposable_outlet(self):
+        return Outlet.objects.create(market=self.market, name=f"Disposable {Outlet.objects.count()}")
+
+
+class Route:
+    """How to request a named route: as which role, with which URL kwargs, within what budget."""
+
+    def __init__(self, role=None, kwargs=None, budget=12):
+        self.role = role
+        self.kwargs = kwargs or (lambda data: {})
+        self.budget = budget
+
+
+# Every named route in core/urls.py must be listed here (enforced below)
+ROUTES = {
+    "home": Route(),
+    "login": Route(),
+    "logout": Route(Role.AGENT),
+    "dashboard": Route(Role.ADMIN),
+    "admin_dashboard": Route(Role.ADMIN),
+    "manager_dashboard": Route(Role.MANAGER),
+    "agent_dashboard": Route(Role.AGENT),
+    "user_list": Route(Role.ADMIN),
+    "add_user": Route(Role.ADMIN),
+    "product_list": Route(Role.ADMIN),
+    "product_add": Route(Role.ADMIN),
+    "product_edit": Route(Role.ADMIN, lambda data: {"pk": data.product.pk}),
+    "product_delete": Route(Role.ADMIN, lambda data: {"pk": data.disposable_product().pk}, budget=20),
+    "packsize_add": Route(Role.ADMIN, lambda data: {"product_id": data.product.pk}),
+    "pricelist_add": Route(Role.ADMIN, lambda data: {"pack_id": data.pack.pk}),
+    "market_list": Route(Role.ADMIN),
+    "market_add": Route(Role.ADMIN),
+    "market_edit": Route(Role.ADMIN, lambda data: {"pk": data.market.pk}),
+    "market_delete": Route(Role.ADMIN, lambda data: {"pk": data.disposable_market().pk}, budget=25),
+    "outlet_list": Route(Role.ADMIN),
+    "outlet_add": Route(Role.ADMIN),
+    "outlet_edit": Route(Role.ADMIN, lambda data: {"pk": data.outlet.pk}),
+    "outlet_delete": Route(Role.ADMIN, lambda data: {"pk": data.disposable_outlet().pk}, budget=20),
+    "catalog_bundle": Route(Role.AGENT),
+    "catalog_version": Route(Role.AGENT),
+    "sync_changes": Route(Role.AGENT, budget=16),
+    "reconcile_mpesa": Route(Role.ADMIN),
+    "receivables_aging": Route(Role.MANAGER),
+    "sales_trends": Route(Role.MANAGER),
+    "allocation_suggestions": Route(Role.MANAGER),
+    "metrics": Route(),
+    "query_profile": Route(Role.ADMIN),
+}
+
+
+def named_routes():
+    return {p.name for p in core_urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+
+
+class QueryCountRegressionTests(TestCase):
+    """
+    Each route is requested against a small and a larger dataset. The query
+    count must not grow with the data (the N+1 signature) and must stay
+    within the route's budget.
+    """
+
+    SMALL, LARGE = 3, 8
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+
+    def count_queries(self, name, route):
+        user = {
+            Role.ADMIN: self.data.admin,
+            Role.MANAGER: self.data.manager,
+            Role.AGENT: self.data.agent,
+        }.get(route.role)
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        url = reverse(name, kwargs=route.kwargs(self.data))
+        for alias in ("default", "template_fragments"):
+            caches[alias].clear()  # measure every route cold, at both sizes
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # run_sequentially: async views' queries stay on this thread and connection
+        with connection.execute_wrapper(record), run_sequentially():
+            response = client.get(url)
+        self.assertLess(response.status_code, 500, f"{name} failed with HTTP {response.status_code}")
+        return len(queries)
+
+    def test_every_named_route_is_covered(self):
+        self.assertEqual(named_routes() - ROUTES.keys(), set(), "add the new route(s) to ROUTES")
+        self.assertEqual(ROUTES.keys() - named_routes(), set(), "remove stale route(s) from ROUTES")
+
+    def test_query_counts_are_flat_and_within_budget(self):
+        self.data.grow(self.SMALL)
+        small = {name: self.count_queries(name, route) for name, route in ROUTES.items()}
+        self.data.grow(self.LARGE)
+        large = {name: self.count_queries(name, route) for name, route in ROUTES.items()}
+
+        for name, route in ROUTES.items():
+            with self.subTest(route=name):
+                self.assertEqual(
+                    large[name], small[name],
+                    f"{name}: {small[name]} queries with {self.SMALL} rows, {large[name]} with {self.LARGE}",
+                )
+                self.assertLessEqual(large[name], route.budget, f"{name} is over its query budget")
+
+
+# ============================================================
+# Read-replica routing
+# ============================================================
+class ReplicaRoutingTests(TestCase):
+    """
+    The test database has no replica, so the router's decisions are recorded
+    (as if one were configured) while every read still runs on default.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+
+    def setUp(self):
+        self.decisions = []
+        self.route = ReplicaRouter().db_for_read  # bound before it is patched below
+
+        def record(router, model, **hints):
+            self.decisions.append(self.route(model, **hints))
+            return None
+
+        for patcher in (
+            mock.patch("core.db_routers.replica_configured", return_value=True),
+            mock.patch("core.middleware.replica_configured", return_value=True),
+            mock.patch.object(ReplicaRouter, "db_for_read", record),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = Client()  # builds the middleware chain with the replica "configured"
+        self.client.force_login(self.data.admin)
+
+    def reads(self, method, name):
+        self.decisions.clear()
+        response = getattr(self.client, method)(reverse(name))
+        self.assertLess(response.status_code, 400)
+        return set(self.decisions)
+
+    def test_reporting_views_read_from_the_replica_until_the_client_writes(self):
+        self.assertIn(REPLICA, self.reads("get", "product_list"))
+        self.assertNotIn(REPLICA, self.reads("get", "add_user"))  # not listed in REPLICA_VIEWS
+        self.assertNotIn(REPLICA, self.reads("post", "query_profile"))
+        self.assertIn("ttdms_primary", self.client.cookies)  # read-your-writes: pinned to the primary
+        self.assertNotIn(REPLICA, self.reads("get", "product_list"))
+
+        del self.client.cookies["ttdms_primary"]
+        self.assertIn(REPLICA, self.reads("get", "product_list"))
+        self.assertIsNone(self.route(Sale))  # reset when the request ended
+
+    def test_explicit_blocks_and_the_cache_table(self):
+        cache_entry = mock.Mock(**{"_meta.app_label": "django_cache"})
+        with use_replica():
+            self.assertEqual(self.route(Sale), REPLICA)
+            self.assertEqual(self.route(cache_entry), "default")
+            with use_replica(False):
+                self.assertIsNone(self.route(Sale))
+        self.assertIsNone(self.route(Sale))
+        self.assertEqual(ReplicaRouter().db_for_write(Sale), "default")
+
+
+# ============================================================
+# Catalog bundle
+# ============================================================
+class CatalogBundleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def setUp(self):
+        caches["default"].clear()
+        self.client.force_login(self.data.agent)
+
+    def test_revalidation_and_invalidation(self):
+        response = self.client.get(reverse("catalog_bundle"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        etag, version = response["ETag"], response["X-Catalog-Version"]
+        self.assertFalse(etag.startswith("W/"))
+
+        # Same version in another encoding is still a match
+        response = self.client.get(reverse("catalog_bundle"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Outlet.objects.create(market=self.data.market, name="New outlet")
+        response = self.client.get(reverse("catalog_bundle"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["X-Catalog-Version"], version)
+        self.assertIn(b"New outlet", response.content)
+
+    def test_versioned_url_is_immutable(self):
+        url = self.client.get(reverse("catalog_version")).json()["url"]
+        response = self.client.get(url)
+        self.assertIn("immutable", response["Cache-Control"])
+
+
+# ============================================================
+# Delta sync
+# ============================================================
+@override_settings(SYNC_SETTLE_SECONDS=0, SYNC_PAGE_SIZE=3)
+class DeltaSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def sync_all(self, token=None):
+        """Follow has_more to the end; returns (token, {stream: ids upserted}, {stream: ids deleted}, reset streams)."""
+        upserts, deletes, reset = {}, {}, set()
+        while True:
+            response = self.client.get(reverse("sync_changes"), {"token": token} if token else {})
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            token = payload["token"]
+            for name, stream in payload["streams"].items():
+                upserts.setdefault(name, set()).update(row["id"] for row in stream["upserts"])
+                deletes.setdefault(name, set()).update(stream["deletes"])
+                if stream["reset"]:
+                    reset.add(name)
+            if not payload["has_more"]:
+                return token, upserts, deletes, reset
+
+    def test_full_then_delta(self):
+        agent = self.data.agent
+        self.client.force_login(agent)
+        token, upserts, _, reset = self.sync_all()
+        self.assertEqual(reset, {"visits", "sales", "payments", "transfers", "returns", "stock"})
+        self.assertEqual(upserts["sales"], {str(pk) for pk in agent.sales.values_list("pk", flat=True)})
+
+        token, upserts, deletes, reset = self.sync_all(token)
+        self.assertEqual(reset, set())
+        self.assertFalse(any(upserts.values()) or any(deletes.values()))
+
+        sale = agent.sales.first()
+        sale.quantity = 5
+        sale.save()
+        visit = agent.visits.first()
+        visit_pk = str(visit.pk)
+        visit.delete()  # its sales' visit is nulled in SQL, without touching updated_at
+
+        _, upserts, deletes, _ = self.sync_all(token)
+        self.assertEqual(upserts["sales"], {str(sale.pk)})
+        self.assertEqual(deletes["visits"], {visit_pk})
+
+    def test_stock_is_the_ledger_balance_per_pack(self):
+        agent, pack = self.data.agent, self.data.pack
+        self.client.force_login(agent)
+        for quantity in (10, -3):
+            StockLedger.objects.create(
+                movement_type="allocation", agent=agent, product=pack.product, pack=pack, quantity=quantity,
+            )
+        response = self.client.get(reverse("sync_changes")).json()
+        token, stock = response["token"], response["streams"]["stock"]
+        self.assertEqual([(row["id"], row["quantity"]) for row in stock["upserts"]], [(str(pack.pk), 7)])
+
+        StockLedger.objects.create(movement_type="sale", agent=agent, product=pack.product, pack=pack, quantity=-2)
+        stock = self.client.get(reverse("sync_changes"), {"token": token}).json()["streams"]["stock"]
+        self.assertEqual([(row["id"], row["quantity"]) for row in stock["upserts"]], [(str(pack.pk), 5)])
+
+    def test_token_is_bound_to_the_agent(self):
+        self.client.force_login(self.data.agent)
+        token = self.client.get(reverse("sync_changes")).json()["token"]
+        self.client.force_login(self.data.agents[1])
+        self.assertEqual(self.client.get(reverse("sync_changes"), {"token": token}).status_code, 400)
+
+
+# ============================================================
+# Soft-deleted users
+# ============================================================
+class SoftDeletedUserTests(TestCase):
+    def test_hidden_from_queries_and_login_but_username_stays_taken(self):
+        user = User.objects.create_user("churned", role=Role.AGENT, password="pw-12345")
+        user.is_soft_deleted = True
+        user.save()
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertTrue(User.all_objects.filter(pk=user.pk).exists())
+        self.assertFalse(self.client.login(username="churned", password="pw-12345"))
+        with self.assertRaises(ValidationError):
+            User(username="churned").validate_unique()
+
+
+# ============================================================
+# Time-ordered primary keys
+# ============================================================
+class Uuid7Tests(TestCase):
+    def test_keys_are_version_7_and_increase(self):
+        ids = [uuid7() for _ in range(10_000)]  # several ms, and past the per-ms counter
+        self.assertEqual({value.version for value in ids}, {7})
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_new_rows_sort_in_insertion_order(self):
+        data = Dataset()
+        data.grow(1)
+        sales = [
+            Sale.objects.create(
+                agent=data.agent, market=data.market, pack=data.pack, quantity=1, unit_price=Decimal("50"),
+            )
+            for _ in range(3)
+        ]
+        self.assertEqual(sales[0].pk.version, 7)
+        self.assertEqual(list(Sale.objects.order_by("pk"))[-3:], sales)
+
+
+# ============================================================
+# Generated sale columns
+# ============================================================
+class GeneratedColumnTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+
+    def sale(self, **fields):
+        fields = {"quantity": 2, "unit_price": Decimal("50"), "discount_amount": Decimal("5"), **fields}
+        return Sale(agent=self.data.agent, market=self.data.market, pack=self.data.pack, **fields)
+
+    def persisted(self, sale):
+        return Sale.objects.filter(pk=sale.pk).values_list("revenue", "outstanding").get()
+
+    def test_bulk_create_and_update_write_both_columns(self):
+        first, second = Sale.objects.bulk_create([self.sale(), self.sale(quantity=4, paid_amount=Decimal("20"))])
+        self.assertEqual(self.persisted(first), (Decimal("95"), Decimal("95")))
+        self.assertEqual(self.persisted(second), (Decimal("195"), Decimal("175")))
+
+        Sale.objects.filter(pk=first.pk).update(quantity=F("quantity") + 1, paid_amount=Decimal("45"))
+        self.assertEqual(self.persisted(first), (Decimal("145"), Decimal("100")))
+
+    def test_values_are_current_after_save_without_a_query(self):
+        sale = self.sale()
+        sale.save()
+        sale = Sale.objects.get(pk=sale.pk)
+        sale.quantity, sale.paid_amount = 3, Decimal("100")
+        sale.save()
+        with self.assertNumQueries(0):
+            current = (sale.revenue, sale.outstanding)
+        self.assertEqual(current, self.persisted(sale))
+        self.assertEqual(current, (Decimal("145"), Decimal("45")))
+
+        sale.quantity = F("quantity") + 1
+        sale.save()
+        self.assertEqual((sale.revenue, sale.outstanding), (Decimal("195"), Decimal("95")))  # read back
+
+
+# ============================================================
+# Cached authentication backend
+# ============================================================
+class CachedUserTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user("cached", role=Role.AGENT, password="pw-12345")
+        self.backend = CachedModelBackend()
+
+    def test_second_lookup_is_served_from_the_cache(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_saved_changes_are_visible_once_committed(self):
+        self.backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = Role.MANAGER
+            self.user.save()
+            # Still the committed row until the transaction ends
+            self.assertEqual(self.backend.get_user(self.user.pk).role, Role.AGENT)
+        self.assertEqual(self.backend.get_user(self.user.pk).role, Role.MANAGER)
+
+    def test_login_then_request_user_comes_from_the_cache(self):
+        response = self.client.post(reverse("login"), {"username": "cached", "password": "pw-12345"})
+        self.assertRedirects(response, reverse("agent_dashboard"), fetch_redirect_response=False)
+        self.client.get(reverse("dashboard"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("dashboard"))
+        self.assertRedirects(response, reverse("agent_dashboard"), fetch_redirect_response=False)
+
+    @override_settings(AUTH_USER_CACHE=False)
+    def test_disabled_cache_reads_the_table(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
+
+
+# ============================================================
+# Pricing engine
+# ============================================================
+class PricingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+        cls.market = Market.objects.create(name="Wholesale", region="Mombasa", type="WHOLESALE")
+        PriceList.objects.filter(pack=cls.data.pack).update(
+            tax_rate=Decimal("16"),
+            discount_policy={
+                "tiers": [{"min_qty": 10, "percent": 5}, {"min_qty": 50, "percent": 10}],
+                "market_types": {"WHOLESALE": 2}, "max_percent": 15,
+            },
+        )
+
+    def quote(self, quantity, market=None):
+        line = {"pack": self.data.pack.pk, "market": market and market.pk, "quantity": quantity}
+        return price_lines([line])[0]
+
+    def test_tiers_market_type_cap_and_tax(self):
+        self.assertEqual(self.quote(5)["discount"], Decimal("0.00"))
+        self.assertEqual(self.quote(10)["discount"], Decimal("25.00"))       # 5% of 500
+        self.assertEqual(self.quote(10, self.market)["discount"], Decimal("35.00"))  # 5% + 2%
+        quote = self.quote(100, self.market)                                     # 12% of 5000
+        self.assertEqual(quote["net"], Decimal("4400.00"))
+        self.assertEqual(quote["tax"], Decimal("704.00"))
+        self.assertEqual(quote["total"], Decimal("5104.00"))
+
+    def test_string_ids_price_like_uuids(self):
+        line = {"pack": str(self.data.pack.pk).upper(), "market": str(self.market.pk), "quantity": 100}
+        self.assertEqual(price_lines([line])[0], self.quote(100, self.market))
+        with self.assertRaises(PricingError):
+            price_lines([dict(line, pack="not-a-uuid")])
+
+    def test_invalid_policy_is_rejected_by_the_form(self):
+        form = PriceListForm(data={
+            "pack": self.data.pack.pk, "unit_price": "10", "tax_rate": "0", "status": "active",
+            "effective_from": "2030-01-01", "discount_policy": '{"tiers": [{"min_qty": 0, "percent": 5}]}',
+        })
+        self.assertIn("discount_policy", form.errors)
+
+
+# ============================================================
+# M-Pesa reconciliation
+# ============================================================
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+        sale = Sale.objects.first()
+        cls.payments = [
+            Payment.objects.create(sale=sale, method="mpesa", amount=Decimal("100"), transaction_ref=ref)
+            for ref in ("QAA1", "QAA2", "QAA3")
+        ]
+
+    def test_matches_mismatches_duplicates_and_unknown_receipts(self):
+        statement = [
+            "Account Name,Demo Ltd",
+            "Receipt No.,Completion Time,Details,Transaction Status,Paid In,Withdrawn",
+            "QAA1,2025-01-15 10:00:00,Pay,Completed,100.00,",
+            "QAA2,2025-01-15 10:05:00,Pay,Completed,90.00,",
+            "QAA3,2025-01-15 10:06:00,Pay,Completed,100.00,",
+            "QAA3,2025-01-15 10:06:00,Pay,Completed,100.00,",
+            "QZZ9,2025-01-15 10:07:00,Pay,Completed,\"1,000.00\",",
+            "QAA4,2025-01-15 10:08:00,Charge,Completed,,5.00",
+        ]
+        report = reconcile(statement)
+        self.assertEqual(report["matched"], 1)
+        self.assertEqual(report["amount_mismatches"], [("QAA2", Decimal("100.00"), Decimal("90.00"))])
+        self.assertEqual(report["duplicates"], [("QAA3", 2)])
+        self.assertEqual([row[0] for row in report["unmatched"]], ["QZZ9"])
+
+        first = Payment.objects.get(pk=self.payments[0].pk)
+        self.assertEqual(first.status, "completed")
+        self.assertEqual(timezone.localtime(first.processed_at).hour, 10)
+        self.assertEqual(Payment.objects.filter(transaction_ref__in=["QAA2", "QAA3"], status="pending").count(), 2)
+
+        self.assertEqual(reconcile(statement)["already_settled"], 1)
+
+    def test_only_payments_still_pending_are_completed_and_announced(self):
+        pending_chunks = reconciliation._pending_chunks
+
+        def settled_meanwhile():
+            for chunk in pending_chunks():
+                Payment.objects.filter(pk=self.payments[0].pk).update(status=PaymentStatus.FAILED)
+                yield chunk
+
+        statement = ["Receipt No.,Paid In", "QAA1,100.00", "QAA3,100.00"]
+        with mock.patch.object(reconciliation, "_pending_chunks", settled_meanwhile), \
+                mock.patch.object(reconciliation, "announce") as announce, \
+                self.captureOnCommitCallbacks(execute=True):
+            report = reconcile(statement)
+        self.assertEqual(report["matched"], 1)
+        announce.assert_called_once_with(PaymentStatus.COMPLETED, [self.payments[2].pk], {self.payments[2].sale_id})
+        self.assertEqual(Payment.objects.get(pk=self.payments[0].pk).status, PaymentStatus.FAILED)
+
+    def test_settled_receipts_are_matched_trimmed_and_upper_case(self):
+        Payment.objects.filter(pk=self.payments[0].pk).update(transaction_ref=" qaa1 ", status=PaymentStatus.COMPLETED)
+        report = reconcile(["Receipt No.,Paid In", "QAA1,100.00"])
+        self.assertEqual((report["already_settled"], report["unmatched_count"]), (1, 0))
+
+
+# ============================================================
+# Payment transitions
+# ============================================================
+class PaymentTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def test_bulk_transition_validates_and_announces_sales(self):
+        pending = list(Payment.objects.values_list("pk", flat=True))
+        received = []
+        receiver = lambda sender, **kwargs: received.append(kwargs)
+        payments_transitioned.connect(receiver)
+        self.addCleanup(payments_transitioned.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = transition(pending, PaymentStatus.COMPLETED)
+        self.assertEqual(result["updated"], len(pending))
+        self.assertFalse(Payment.objects.exclude(status=PaymentStatus.COMPLETED).exists())
+        self.assertFalse(Payment.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(received[0]["sale_ids"], set(Sale.objects.values_list("pk", flat=True)))
+
+        # Completed payments can't fail: nothing changes unless asked to skip
+        with self.assertRaises(IllegalTransition):
+            transition(pending, PaymentStatus.FAILED)
+        self.assertFalse(Payment.objects.filter(status=PaymentStatus.FAILED).exists())
+        result = transition(pending[:1], PaymentStatus.REFUNDED)
+        self.assertEqual(result["updated"], 1)
+        result = transition(pending, PaymentStatus.FAILED, skip_illegal=True)
+        self.assertEqual((result["updated"], len(result["skipped"])), (0, len(pending)))
+
+
+# ============================================================
+# Receivables
+# ============================================================
+class ReceivablesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+        now = timezone.now()
+        cls.sales = [
+            Sale.objects.create(
+                agent=cls.data.agent, market=cls.data.market, pack=cls.data.pack, quantity=2,
+                unit_price=Decimal("50"), payment_method=PaymentMethod.CREDIT, timestamp=now - timedelta(days=days),
+            )
+            for days in (1, 10, 45, 90)
+        ]
+        cls.payments = [
+            Payment.objects.create(sale=sale, method=PaymentMethod.MPESA, amount=Decimal("40"))
+            for sale in cls.sales
+        ]
+
+    def test_payments_maintain_balances_and_aging(self):
+        refresh_aging()
+        aging = ReceivableAging.objects.get()
+        self.assertEqual(
+            (aging.sale_count, aging.days_0_7, aging.days_8_30, aging.days_31_60, aging.days_over_60, aging.total),
+            (4, 100, 100, 100, 100, 400),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition([payment.pk for payment in self.payments[2:]], PaymentStatus.COMPLETED)
+        paid = dict(Sale.objects.filter(pk__in=[s.pk for s in self.sales]).values_list("pk", "outstanding"))
+        self.assertEqual([paid[sale.pk] for sale in self.sales], [100, 100, 60, 60])
+        aging.refresh_from_db()
+        self.assertEqual((aging.days_31_60, aging.days_over_60, aging.total), (60, 60, 320))
+
+        # A refund puts the debt back; settling everything clears the row
+        with self.captureOnCommitCallbacks(execute=True):
+            transition([self.payments[3].pk], PaymentStatus.REFUNDED)
+        self.assertEqual(ReceivableAging.objects.get().days_over_60, 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            for sale in self.sales:
+                Payment.objects.create(
+                    sale=sale, method=PaymentMethod.CASH, amount=sale.revenue, status=PaymentStatus.COMPLETED,
+                )
+        self.assertFalse(ReceivableAging.objects.exists())
+        self.assertEqual(aging_report()["total"], 0)
+
+
+# ============================================================
+# Sales trends
+# ============================================================
+class SalesTrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def test_vectorized_measures(self):
+        matrix = np.array([[1.0, 2, 3, 4, 5, 6, 7, 8], [0, 0, 0, 0, 2, 2, 2, 2]])
+        np.testing.assert_allclose(rolling_mean(matrix, 2)[0], [np.nan, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5])
+        np.testing.assert_allclose(growth(matrix, 4)[1], [np.nan] * 8)  # no base to grow from
+        np.testing.assert_allclose(growth(matrix, 4)[0, 4:], [4, 2, 4 / 3, 1])
+        # Alternating groups (e.g. weekdays); a group with no days has no index
+        groups = np.array([0, 1] * 4)
+        np.testing.assert_allclose(seasonality(matrix, groups, 2)[1], [1, 1])
+        np.testing.assert_allclose(seasonality(matrix, groups, 3)[0, 2], np.nan)
+
+    def test_trends_are_scoped_and_cached(self):
+        report = sales_trends(dimension="market", metric="quantity", agent_ids=[self.data.agent.pk])
+        everything, *markets = report["series"]
+        self.assertEqual(everything["total"], 4)  # two sales of two packs
+        self.assertEqual(len(report["dates"]), 90)
+        self.assertEqual(sorted(series["label"] for series in markets), ["Market 0", "Market 1"])
+        with self.assertNumQueries(0):
+            sales_trends(dimension="market", metric="quantity", agent_ids=[self.data.agent.pk])
+
+        client = Client()
+        client.force_login(self.data.agent)
+        self.assertEqual(client.get(reverse("sales_trends"), {"dimension": "outlet"}).status_code, 400)
+
+    def test_only_past_sales_inside_the_window_invalidate(self):
+        caches["default"].clear()
+        trends = lambda: sales_trends(dimension="pack", metric="quantity")["series"][0]["total"]
+        total = trends()
+
+        def sell(days_ago):
+            with self.captureOnCommitCallbacks(execute=True):
+                Sale.objects.create(
+                    agent=self.data.agent, market=self.data.market, pack=self.data.pack, quantity=1,
+                    unit_price=Decimal("50"), timestamp=timezone.now() - timedelta(days=days_ago),
+                )
+
+        sell(0)    # today: refreshed by the timeout, not per sale
+        sell(900)  # older than the report's history
+        with self.assertNumQueries(0):
+            self.assertEqual(trends(), total)
+        sell(3)
+        self.assertEqual(trends(), total + 2)
+
+    def test_moving_a_sale_invalidates_both_months(self):
+        now = timezone.now()
+        sale = Sale.objects.create(
+            agent=self.data.agent, market=self.data.market, pack=self.data.pack, quantity=1,
+            unit_price=Decimal("50"), timestamp=now - timedelta(days=70),
+        )
+        months = [month_scope(timezone.localdate(now - timedelta(days=days))) for days in (70, 3)]
+        before = [version_tag(month) for month in months]
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.timestamp = now - timedelta(days=3)
+            sale.save()
+        after = [version_tag(month) for month in months]
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+
+
+# ============================================================
+# Demand forecasting
+# ============================================================
+class DemandForecastTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(1)
+        Sale.objects.all().delete()
+        cls.today = timezone.localdate()
+        noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        for days_ago in range(1, 12 * 7 + 1):
+            day = cls.today - timedelta(days=days_ago)
+            Sale.objects.create(
+                agent=cls.data.agent, market=cls.data.market, pack=cls.data.pack, unit_price=Decimal("50"),
+                quantity=10 if day.weekday() < 5 else 2, timestamp=noon - timedelta(days=days_ago),
+            )
+
+    def forecasts(self):
+        return list(DemandForecast.objects.order_by("week_start").values_list("week_start", "quantity"))
+
+    def test_weekly_forecast_and_incremental_run(self):
+        yesterday = self.today - timedelta(days=1)
+        forecast_demand(weeks=4, through=yesterday)
+        full = self.forecasts()
+        self.assertEqual(len(full), 4)
+        self.assertTrue(all(week.weekday() == 0 for week, _ in full))
+        for _, quantity in full:
+            self.assertAlmostEqual(float(quantity), 54, delta=6)  # 5 x 10 + 2 x 2 a week
+
+        # Folding the last week into last week's state gives the same result as refitting
+        forecast_demand(weeks=4, through=yesterday - timedelta(days=7))
+        self.assertEqual(ForecastState.objects.get().as_of, yesterday - timedelta(days=7))
+        forecast_demand(weeks=4, through=yesterday, incremental=True)
+        self.assertEqual(self.forecasts(), full)
+
+    def test_every_series_is_fitted_from_one_read_of_sales(self):
+        markets = [self.data.market, Market.objects.create(name="Forecast", region="Nakuru")]
+        Sale.objects.bulk_create(
+            Sale(
+                agent=self.data.agent, market=market, pack=pack, quantity=3, unit_price=Decimal("50"),
+                timestamp=timezone.now() - timedelta(days=days_ago),
+            )
+            for pack in PackSize.objects.all()
+            for market in markets
+            for days_ago in range(1, 15)
+        )
+        for incremental in (False, True):
+            with CaptureQueriesContext(connection) as queries:
+                totals = forecast_demand(weeks=4, incremental=incremental)
+            self.assertEqual(totals["series"], 2 * PackSize.objects.count())
+            self.assertEqual(sum('"core_sale"' in query["sql"] for query in queries), 1)
+
+
+# ============================================================
+# Single-flight cache
+# ============================================================
+class GetOrBuildTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_concurrent_callers_build_once(self):
+        started, release = threading.Event(), threading.Event()
+
+        def build():
+            started.set()
+            release.wait(5)
+            return "fresh"
+
+        build = mock.Mock(side_effect=build)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(get_or_build, "catalog", "bundle", build)]
+            started.wait(5)
+            futures += [pool.submit(get_or_build, "catalog", "bundle", build) for _ in range(3)]
+            release.set()
+            self.assertEqual([future.result() for future in futures], ["fresh"] * 4)
+        build.assert_called_once()
+
+    def test_stale_value_is_served_while_another_caller_rebuilds(self):
+        get_or_build("catalog", "bundle", lambda: "old", timeout=0)
+        caches["default"].add(make_key("catalog", "bundle") + ":lock", 1)  # another worker is rebuilding
+        build = mock.Mock(return_value="new")
+        self.assertEqual(get_or_build("catalog", "bundle", build), "old")
+        build.assert_not_called()
+
+        caches["default"].delete(make_key("catalog", "bundle") + ":lock")
+        self.assertEqual(get_or_build("catalog", "bundle", build), "new")
+        self.assertEqual(get_or_build("catalog", "bundle", build), "new")
+        build.assert_called_once()
+
+    def test_bump_turns_a_hit_into_a_miss(self):
+        build = mock.Mock(side_effect=["first", "second"])
+        self.assertEqual(get_or_build("catalog", "bundle", build, timeout=300), "first")
+        self.assertEqual(get_or_build("catalog", "bundle", build, timeout=300), "first")
+        bump("catalog")
+        self.assertEqual(get_or_build("catalog", "bundle", build, timeout=300), "second")
+        self.assertEqual(build.call_count, 2)
+
+
+# ============================================================
+# Allocation suggestions
+# ============================================================
+class AllocationSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+        pack = cls.data.pack
+        for agent, stock in zip(cls.data.agents, (3, 100)):
+            StockLedger.objects.create(
+                movement_type="allocation", agent=agent, product=pack.product, pack=pack, quantity=stock,
+            )
+            for _ in range(12):  # with the dataset's two sales, 28 units in the 28-day window: one a day
+                Sale.objects.create(agent=agent, market=cls.data.market, pack=pack, quantity=2, unit_price=Decimal("50"))
+
+    def test_suggest_drafts_and_approve_in_bulk(self):
+        drafts = suggest(created_by=self.data.manager)
+        # One a day for 7 days plus 20% is 8.4: the first agent holds 3, the second plenty
+        self.assertEqual([(d.agent, d.quantity) for d in drafts], [(self.data.agents[0], 6)])
+        # Suggesting again replaces the drafts instead of piling up
+        suggest(created_by=self.data.manager)
+        self.assertEqual(Allocation.objects.filter(status=AllocationStatus.DRAFT).count(), 1)
+
+        client = Client()
+        client.force_login(self.data.manager)
+        response = client.post(reverse("allocation_suggestions"), {"action": "approve", "allocation": ["1 OR 1=1"]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Allocation.objects.filter(status=AllocationStatus.DRAFT).count(), 1)
+        response = client.post(reverse("allocation_suggestions"), {"action": "approve_all"})
+        self.assertEqual(response.status_code, 302)
+        allocation = Allocation.objects.get()
+        self.assertEqual((allocation.status, allocation.processed), (AllocationStatus.APPROVED, True))
+        entry = StockLedger.objects.get(source_ref=allocation.pk)
+        self.assertEqual((entry.quantity, entry.balance_after), (6, 9))
+        self.assertEqual(approve([allocation.pk], self.data.manager), 0)
+        self.assertEqual(suggest(), [])
+
+
+# ============================================================
+# Dashboard KPI invalidation
+# ============================================================
+class KpiInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_a_sale_invalidates_only_its_agent_and_team(self):
+        first, second = self.data.agents
+        versions = lambda: (
+            version_tag(agent_kpis(first.pk)), version_tag(agent_kpis(second.pk)),
+            version_tag(*team_kpis(self.data.manager)),
+        )
+        before = versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(
+                agent=first, market=self.data.market, pack=self.data.pack, quantity=1, unit_price=Decimal("50"),
+            )
+        after = versions()
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertNotEqual(after[2], before[2])
+
+    def test_team_stats_are_rebuilt_after_a_reassignment(self):
+        first, second = self.data.agents
+        other = User.objects.create_user("qc_manager_2", role=Role.MANAGER, password=None)
+        members = lambda manager: [row["id"] for row in get_team_stats(manager)["agents"]]
+        self.assertEqual(members(self.data.manager), [first.pk, second.pk])
+        self.assertEqual(members(other), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.manager = other
+            second.save()
+            self.assertEqual(members(self.data.manager), [first.pk, second.pk])  # not committed yet
+        self.assertEqual(members(self.data.manager), [first.pk])
+        self.assertEqual(members(other), [second.pk])
+
+
+# ============================================================
+# Fake data generator
+# ============================================================
+class GenerateFakeDataTests(TestCase):
+    def test_rows_are_consistent_with_each_other(self):
+        call_command(
+            "generate_fake_data", markets=4, managers=1, agents=3, days=14, visits_per_day=3, stdout=StringIO(),
+        )
+        self.assertTrue(Sale.objects.exists())
+        # Generated revenue matches what the raw inserts paid, and paid_amount sums the completed payments
+        for sale in Sale.objects.annotate(
+            amount=Sum("payments__amount"),
+            completed=Sum("payments__amount", filter=Q(payments__status=PaymentStatus.COMPLETED)),
+        ):
+            self.assertEqual(sale.revenue, sale.amount)
+            self.assertEqual(sale.paid_amount, sale.completed or 0)
+        # The ledger's running balances add up and never go negative
+        balances = {}
+        for agent, pack, quantity, balance in StockLedger.objects.order_by("pk").values_list(  # uuid7: write order
+            "agent", "pack", "quantity", "balance_after",
+        ):
+            balances[agent, pack] = balances.get((agent, pack), 0) + quantity
+            self.assertEqual(balance, balances[agent, pack])
+            self.assertGreaterEqual(balance, 0)
+
+        with self.assertRaises(CommandError):
+            call_command("generate_fake_data", markets=1, agents=1, days=1, stdout=StringIO())
+
+
+# ============================================================
+# Benchmarks
+# ============================================================
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def test_run_and_compare(self):
+        scenarios = [s for s in benchmarks.SCENARIOS if s.name in ("agent_dashboard", "product_list", "sale_list")]
+        scenarios.append(benchmarks.Scenario("nobody", "auditor", call=lambda user: None))
+        report = benchmarks.run_benchmarks(scenarios, iterations=3, warmup=1)
+
+        results = report["results"]
+        self.assertEqual(results["nobody"], {"skipped": "no auditor user in the dataset"})
+        for name in ("agent_dashboard", "product_list", "sale_list"):
+            result = results[name]
+            self.assertEqual(result["iterations"], 3)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertLessEqual(result["p95_ms"], result["max_ms"])
+        self.assertEqual(results["agent_dashboard"]["queries"], 0)  # warm: KPIs, session and user are cached
+        self.assertGreater(results["sale_list"]["queries"], 0)
+        self.assertEqual(report["meta"]["dataset"]["Sale"], Sale.objects.count())
+
+        slower = json.loads(json.dumps(report))  # as written and read back by run_benchmarks --compare
+        slower["results"]["product_list"]["p95_ms"] = results["product_list"]["p95_ms"] * 1.5 + 1
+        slower["results"]["sale_list"]["queries"] += 1
+        self.assertEqual(benchmarks.compare(report, report), [])
+        regressions = dict(line.split(": ", 1) for line in benchmarks.compare(report, slower))
+        self.assertEqual(sorted(regressions), ["product_list", "sale_list"])
+        self.assertTrue(regressions["product_list"].startswith("p95_ms"))
+        self.assertTrue(regressions["sale_list"].startswith("queries"))
+
+
+# ============================================================
+# Precompressed static files
+# ============================================================
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    def test_siblings_are_kept_only_when_they_save_enough(self):
+        files = CompressedManifestStaticFilesStorage(location=self.root)
+        css = b"body { color: green; }\n" * 200
+        (self.root / "app.css").write_bytes(css)
+        (self.root / "noise.js").write_bytes(np.random.default_rng(0).bytes(4096))  # incompressible
+        (self.root / "noise.js.gz").write_bytes(b"from an earlier build")
+        for name in ("app.css", "noise.js"):
+            files.compress(name)
+
+        self.assertEqual(gzip.decompress((self.root / "app.css.gz").read_bytes()), css)
+        self.assertEqual((self.root / "app.css.br").exists(), storage.brotli is not None)
+        self.assertFalse((self.root / "noise.js.gz").exists())
+        self.assertFalse((self.root / "noise.js.br").exists())
+
+    def test_middleware_serves_the_sibling_the_client_accepts(self):
+        for suffix, body in (("", b"plain"), (".gz", b"gzipped"), (".br", b"brotli")):
+            (self.root / f"app.css{suffix}").write_bytes(body)
+        with self.settings(DEBUG=False, STATIC_ROOT=str(self.root)):
+            middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+            for accept, encoding, body in (
+                ("gzip, deflate, br", "br", b"brotli"),
+                ("gzip, br;q=0", "gzip", b"gzipped"),
+                ("", None, b"plain"),
+            ):
+                with self.subTest(accept=accept):
+                    response = middleware(RequestFactory().get("/static/app.css", HTTP_ACCEPT_ENCODING=accept))
+                    self.assertEqual(response.get("Content-Encoding"), encoding)
+                    self.assertEqual(response.content, body)
+                    self.assertEqual(response["Vary"], "Accept-Encoding")
+            self.assertEqual(middleware(RequestFactory().get("/static/missing.css")).status_code, 404)
+
+
+# ============================================================
+# Async dashboards
+# ============================================================
+class AsyncDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(2)
+
+    def contexts(self, name, user):
+        """The context ``name`` renders with in core/views.py and in core/views_async.py, each built cold."""
+        contexts = []
+
+        def capture(request, template, context):
+            contexts.append({key: dict(value) if key != "kpi_version" else value for key, value in context.items()})
+            return HttpResponse()
+
+        async def acapture(*args):
+            return capture(*args)
+
+        # Namespace versions are timestamps: pin them, so both runs start from the same empty cache
+        with mock.patch.object(views, "render", capture), mock.patch.object(views_async, "arender", acapture), \
+                mock.patch("core.cache._new_version", return_value=1):
+            caches["default"].clear()
+            request = RequestFactory().get("/")
+            request.user = user
+            getattr(views, name)(request)
+
+            caches["default"].clear()
+            request = RequestFactory().get("/")
+            request.user = user
+            request.auser = sync_to_async(lambda: user)
+            async_to_sync(getattr(views_async, name))(request)
+        return contexts
+
+    def test_same_context_as_the_sync_views(self):
+        for name, user in (
+            ("admin_dashboard", self.data.admin),
+            ("manager_dashboard", self.data.manager),
+            ("agent_dashboard", self.data.agent),
+        ):
+            with self.subTest(name):
+                sync, async_ = self.contexts(name, user)
+                self.assertEqual(sync, async_)
+                self.assertTrue(all(sync[key] for key in sync))
+
+
+# ============================================================
+# Query profiler
+# ============================================================
+@override_settings(QUERY_PROFILER_ENABLED=True, QUERY_PROFILER_NPLUSONE_THRESHOLD=2)
+class QueryProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = Dataset()
+        cls.data.grow(3)
+
+    def setUp(self):
+        caches["default"].clear()
+        profile_store.clear()
+        self.client.force_login(self.data.admin)
+
+    def test_headers_flag_repeated_statements(self):
+        def per_market(request):
+            for market in Market.objects.order_by("pk"):
+                list(market.outlets.all())  # one query per market
+            return HttpResponse()
+
+        with self.assertLogs("core.profiling", "WARNING") as logs:
+            response = QueryProfilerMiddleware(per_market)(RequestFactory().get("/markets/loop/"))
+        self.assertIn("Suspected N+1 in /markets/loop/: 3x", logs.output[0])
+        self.assertEqual(response["X-Query-Count"], "4")
+        self.assertEqual(response["X-Query-Duplicates"], "2")
+        self.assertTrue(response["X-Query-NPlusOne"].startswith("1; 3x at core/tests.py:"))
+
+    def test_summary_merges_every_worker_and_clears_them_all(self):
+        other = ProfileStore()  # another worker process, as far as the cache is concerned
+        other.add("sales_trends", 4, 0.01, [])
+        other.flush()
+        self.client.get(reverse("market_list"))
+
+        rows = {row["view"]: row for row in self.client.get(reverse("query_profile")).context["rows"]}
+        self.assertEqual(rows["sales_trends"]["requests"], 1)
+        self.assertEqual(rows["market_list"]["requests"], 1)
+
+        self.client.post(reverse("query_profile"))  # the reset itself is the first new sample
+        self.assertEqual([row["view"] for row in profile_store.summary()], ["query_profile"])
+        self.assertEqual([row["view"] for row in other.summary()], ["query_profile"])
+
+
+# ============================================================
+# Metrics endpoint
+# ============================================================
+class MetricsEndpointTests(TestCase):
+    def test_scrape_needs_the_token_or_an_allowed_network(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)  # the test client is 127.0.0.1
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.9").status_code, 403)
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+            response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.9", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+    def test_exited_workers_are_folded_into_retired_totals(self):
+        counter = "ttdms_sales_ingested_total"
+        for flock in (True, False):  # without fcntl (Windows) nothing is retired, but totals still add up
+            with self.subTest(flock=flock), tempfile.TemporaryDirectory() as directory:
+                dead = Path(directory) / "4194305.json"  # above Linux's pid_max: never a live process
+                dead.write_text(json.dumps({"counters": [[counter, [], 5]], "histograms": []}))
+                own = metrics.registry._counters[(counter, ())]
+                with self.settings(METRICS_DIR=directory), \
+                        mock.patch.object(metrics, "fcntl", metrics.fcntl if flock else None):
+                    for _ in range(2):
+                        self.assertEqual(metrics.registry._merged()[0][(counter, ())], own + 5)
+                self.assertEqual(dead.exists(), not flock)
+
+
+# ============================================================
+# Conditional GET
+# ============================================================
+class ConditionalGetTests(TestCase):
+    def test_etag_changes_with_the_csrf_secret(self):
+        self.client.force_login(User.objects.create_user("cg_admin", role=Role.ADMIN, password=None))
+        self.client.cookies["csrftoken"] = "a" * 32
+        etag = self.client.get(reverse("product_list"))["ETag"]
+        self.assertEqual(self.client.get(reverse("product_list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.cookies["csrftoken"] = "b" * 32  # e.g. rotated by a new login: the kept page's forms are stale
+        response = self.client.get(reverse("product_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+# ============================================================
+# Response compression
+# ============================================================
+class CompressionTests(TestCase):
+    def test_html_gets_padded_gzip_only(self):
+        sizes = set()
+        for _ in range(10):
+            response = self.client.get(reverse("login"), HTTP_ACCEPT_ENCODING="br, gzip")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)  # random-length header padding (BREACH)
+        response = self.client.get(reverse("login"), HTTP_ACCEPT_ENCODING="br")
+        self.assertFalse(response.has_header("Content-Encoding"))
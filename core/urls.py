@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from . import views_agent
-from core import views_products, views_markets
+from core import (
+    views_products, views_markets, views_monitoring, views_async, views_catalog, views_sync, views_payments,
+    views_reports, views_allocations,
+)
+
+# Async dashboards under ASGI (ASYNC_VIEWS), the sync ones otherwise
+dashboards = views_async if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # Public pages
@@ -11,9 +18,9 @@ urlpatterns = [
 
     # Role-based dashboards
     path("dashboard/", views.dashboard, name="dashboard"),   # redirects by role
-    path("dashboard/admin/", views.admin_dashboard, name="admin_dashboard"),
-    path("dashboard/manager/", views.manager_dashboard, name="manager_dashboard"),
-    path("dashboard/agent/", views.agent_dashboard, name="agent_dashboard"),
+    path("dashboard/admin/", dashboards.admin_dashboard, name="admin_dashboard"),
+    path("dashboard/manager/", dashboards.manager_dashboard, name="manager_dashboard"),
+    path("dashboard/agent/", dashboards.agent_dashboard, name="agent_dashboard"),
 
     # Admin user management
     path("users/", views.user_list, name="user_list"),
@@ -43,4 +50,23 @@ urlpatterns = [
     path("outlets/add/", views_markets.outlet_add, name="outlet_add"),
     path("outlets/<uuid:pk>/edit/", views_markets.outlet_edit, name="outlet_edit"),
     path("outlets/<uuid:pk>/delete/", views_markets.outlet_delete, name="outlet_delete"),
+
+    # Catalog bundle (agent app)
+    path("catalog/", views_catalog.catalog_bundle, name="catalog_bundle"),
+    path("catalog/version/", views_catalog.catalog_version, name="catalog_version"),
+    path("sync/", views_sync.sync_changes, name="sync_changes"),
+
+    # Payments
+    path("payments/reconcile/", views_payments.reconcile_mpesa, name="reconcile_mpesa"),
+    path("payments/receivables/", views_payments.receivables_aging, name="receivables_aging"),
+
+    # Allocations
+    path("allocations/suggestions/", views_allocations.allocation_suggestions, name="allocation_suggestions"),
+
+    # Reports
+    path("reports/trends/", views_reports.sales_trends_json, name="sales_trends"),
+
+    # Operations
+    path("metrics", views_monitoring.metrics, name="metrics"),
+    path("ops/queries/", views_monitoring.query_profile, name="query_profile"),
 ]
@@ -4,9 +4,15 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password
-from django.db.models import Count
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.utils.functional import SimpleLazyObject
 
+from core.cache import get_or_build, version_tag
 from core.models import User, Role, Visit, Sale, Return, Transfer, Payment
+from core.team import agent_kpis, get_team_stats, team_kpis
+
+USERS_PER_PAGE = 50
 
 
 # -------------------
@@ -75,25 +81,71 @@ def admin_dashboard(request):
         messages.error(request, "Unauthorized access.")
         return redirect("home")
 
-    stats = {
-        "total_users": User.objects.count(),
-        "total_agents": User.objects.filter(role=Role.AGENT).count(),
-        "total_managers": User.objects.filter(role=Role.MANAGER).count(),
-        "total_visits": Visit.objects.count(),
-        "total_sales": Sale.objects.count(),
-        "total_returns": Return.objects.count(),
-    }
+    # Lazy: not computed at all while the KPI fragment is cached. Global
+    # totals aren't bumped by writes (core.signals); they go stale after 60s
+    stats = SimpleLazyObject(lambda: get_or_build("kpi", "admin", _admin_stats, timeout=60))
     return render(request, "dashboards/admin_dashboard.html", {"stats": stats})
 
 
+# Independent counts, run one by one here and concurrently by core/views_async.py
+def user_role_counts():
+    # One pass over the live-user role index instead of three counts
+    return User.objects.aggregate(
+        total_users=Count("pk"),
+        total_agents=Count("pk", filter=Q(role=Role.AGENT)),
+        total_managers=Count("pk", filter=Q(role=Role.MANAGER)),
+    )
+
+
+def admin_stat_queries():
+    return {
+        "users": user_role_counts,
+        "total_visits": Visit.objects.count,
+        "total_sales": Sale.objects.count,
+        "total_returns": Return.objects.count,
+    }
+
+
+def agent_stat_queries(agent):
+    return {
+        "my_visits": Visit.objects.filter(agent=agent).count,
+        "my_sales": Sale.objects.filter(agent=agent).count,
+        "my_returns": Return.objects.filter(agent=agent).count,
+    }
+
+
+def admin_stats(results):
+    """Flatten the results of admin_stat_queries() for the template."""
+    return {**results.pop("users"), **results}
+
+
+def _admin_stats():
+    return admin_stats({name: query() for name, query in admin_stat_queries().items()})
+
+
 @login_required
 def manager_dashboard(request):
-    return render(request, "dashboards/manager_dashboard.html")
+    if request.user.role != Role.MANAGER:
+        messages.error(request, "Unauthorized access.")
+        return redirect("home")
+
+    # Team resolved from cache + one grouped query, whatever the team size;
+    # lazy so it isn't touched while the team fragment is cached
+    team = SimpleLazyObject(lambda: get_team_stats(request.user))
+    context = {"team": team, "kpi_version": version_tag(*team_kpis(request.user))}
+    return render(request, "dashboards/manager_dashboard.html", context)
 
 
 @login_required
 def agent_dashboard(request):
-    return render(request, "dashboards/agent_dashboard.html")
+    agent = request.user
+    stats = SimpleLazyObject(lambda: get_or_build(
+        agent_kpis(agent.pk), "stats",
+        lambda: {name: query() for name, query in agent_stat_queries(agent).items()},
+        timeout=60,
+    ))
+    context = {"stats": stats, "kpi_version": version_tag(agent_kpis(agent.pk))}
+    return render(request, "dashboards/agent_dashboard.html", context)
 
 
 # -------------------
@@ -113,7 +165,7 @@ def add_user(request):
         role = request.POST.get("role")
         password = request.POST.get("password")
 
-        if User.objects.filter(username=username).exists():
+        if User.all_objects.filter(username=username).exists():  # soft-deleted users keep theirs
             messages.error(request, "Username already taken.")
             return redirect("add_user")
 
@@ -137,5 +189,6 @@ def user_list(request):
         messages.error(request, "Unauthorized access.")
         return redirect("dashboard")
 
-    users = User.objects.all().order_by("-date_joined")
-    return render(request, "users/user_list.html", {"users": users})
+    paginator = Paginator(User.objects.order_by("-date_joined"), USERS_PER_PAGE)
+    page = paginator.get_page(request.GET.get("page"))
+    return render(request, "users/user_list.html", {"users": page.object_list, "page": page})
@@ -50,16 +50,27 @@ from core.models import Visit, Sale, Return, Transfer, Payment
 # -------------------
 # LIST VIEWS WITH SEARCH
 # -------------------
-@login_required
-def sale_list(request):
-    query = request.GET.get("q", "")
-    sales = Sale.objects.filter(agent=request.user).order_by("-timestamp")
+def search_sales(agent, query=""):
+    """Sales of ``agent``, newest first, optionally filtered by product/market/promo code."""
+    sales = (
+        Sale.objects
+        .filter(agent=agent)
+        .select_related("market", "pack__product")  # rendered on every row
+        .order_by("-timestamp")
+    )
     if query:
         sales = sales.filter(
             Q(pack__product__name__icontains=query) |
             Q(market__name__icontains=query) |
             Q(promo_code__code__icontains=query)
         )
+    return sales
+
+
+@login_required
+def sale_list(request):
+    query = request.GET.get("q", "")
+    sales = search_sales(request.user, query)
     return render(request, "agent/sales_list.html", {"sales": sales, "query": query})
 
 
@@ -0,0 +1,58 @@
+# core/views_allocations.py
+import uuid
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import redirect, render
+
+from core.allocation import approve, suggest
+from core.models import Allocation, AllocationStatus, Role
+from core.team import get_team_agent_ids
+
+DRAFTS_PER_PAGE = 100
+
+
+def _uuids(values):
+    """The well-formed UUIDs among ``values``; anything else (a tampered form) is dropped."""
+    ids = []
+    for value in values:
+        try:
+            ids.append(uuid.UUID(value))
+        except ValueError:
+            continue
+    return ids
+
+
+# -------------------
+# Suggested allocations (Admins: every agent; Managers: their team)
+# -------------------
+@login_required
+def allocation_suggestions(request):
+    user = request.user
+    if user.role not in (Role.ADMIN, Role.MANAGER):
+        messages.error(request, "Unauthorized access.")
+        return redirect("dashboard")
+    agent_ids = None if user.role == Role.ADMIN else get_team_agent_ids(user)
+    drafts = Allocation.objects.filter(status=AllocationStatus.DRAFT)
+    if agent_ids is not None:
+        drafts = drafts.filter(agent__in=agent_ids)
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        if action == "suggest":
+            count = len(suggest(agent_ids, created_by=user))
+            messages.success(request, f"{count} allocation(s) suggested; previous drafts were replaced.")
+        elif action in ("approve", "approve_all"):
+            if action == "approve":
+                drafts = drafts.filter(pk__in=_uuids(request.POST.getlist("allocation")))
+            count = approve(list(drafts.values_list("pk", flat=True)), user)
+            messages.success(request, f"{count} allocation(s) approved and posted to stock.")
+        return redirect("allocation_suggestions")
+
+    paginator = Paginator(
+        drafts.select_related("agent", "pack__product").order_by("agent__username", "pack__product__name", "pack__label"),
+        DRAFTS_PER_PAGE,
+    )
+    page = paginator.get_page(request.GET.get("page"))
+    return render(request, "allocations/suggestions.html", {"drafts": page.object_list, "page": page})
@@ -0,0 +1,72 @@
+# core/views_async.py
+"""
+Async role dashboards, routed instead of the sync ones in core/views.py when
+ASYNC_VIEWS is on (the ASGI deployment profile, ttdms/gunicorn_asgi.py).
+
+Their independent aggregate queries run concurrently on worker threads
+(core.utils.run_concurrently) instead of one after another, and the event
+loop keeps serving other requests while they wait. Results share the sync
+views' cache entries and templates.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from core.cache import aget_or_build, version_tag
+from core.models import Role
+from core.team import aget_team_stats, agent_kpis, team_kpis
+from core.utils import run_concurrently
+from core.views import admin_stat_queries, admin_stats, agent_stat_queries
+
+# Templates may still touch the DB (lazy context, context processors), so render on the sync thread
+arender = sync_to_async(render)
+
+
+async def _auser(request):
+    # request.auser() and the lazy request.user cache separately; share the
+    # loaded user so templates don't fetch it a second time
+    request.user = await request.auser()
+    return request.user
+
+
+async def _admin_stats():
+    return admin_stats(await run_concurrently(**admin_stat_queries()))
+
+
+# -------------------
+# Dashboards
+# -------------------
+@login_required
+async def admin_dashboard(request):
+    user = await _auser(request)
+    if user.role != Role.ADMIN:
+        messages.error(request, "Unauthorized access.")
+        return redirect("home")
+
+    stats = await aget_or_build("kpi", "admin", _admin_stats, timeout=60)
+    return await arender(request, "dashboards/admin_dashboard.html", {"stats": stats})
+
+
+@login_required
+async def manager_dashboard(request):
+    user = await _auser(request)
+    if user.role != Role.MANAGER:
+        messages.error(request, "Unauthorized access.")
+        return redirect("home")
+
+    team = await aget_team_stats(user)
+    kpi_version = await sync_to_async(lambda: version_tag(*team_kpis(user)))()
+    return await arender(request, "dashboards/manager_dashboard.html", {"team": team, "kpi_version": kpi_version})
+
+
+@login_required
+async def agent_dashboard(request):
+    user = await _auser(request)
+    stats = await aget_or_build(
+        agent_kpis(user.pk), "stats", partial(run_concurrently, **agent_stat_queries(user)), timeout=60,
+    )
+    kpi_version = await sync_to_async(version_tag)(agent_kpis(user.pk))
+    return await arender(request, "dashboards/agent_dashboard.html", {"stats": stats, "kpi_version": kpi_version})
@@ -0,0 +1,60 @@
+# core/views_catalog.py
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from core.catalog import bundle
+from core.utils import accepted_encodings
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+# -------------------
+# Catalog bundle (agent app)
+# -------------------
+@login_required
+@require_safe
+def catalog_version(request):
+    """Cheap poll: the current bundle version and the URL to fetch it from."""
+    version = bundle()["version"]
+    response = JsonResponse({"version": version, "url": f"{reverse('catalog_bundle')}?v={version}"})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@require_safe
+def catalog_bundle(request):
+    """
+    The catalog bundle in the best encoding the client accepts, with a
+    strong ETag per version and encoding. Fetched as ``?v=<version>`` it is
+    cacheable for good (a new version has a new URL); otherwise clients
+    revalidate and get a 304 while the version is unchanged.
+    """
+    current = bundle()
+    version, bodies = current["version"], current["bodies"]
+    accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    encoding = next((enc for enc in ("br", "gzip") if enc in accepted and enc in bodies), "")
+    etag = f'"{version}-{encoding}"' if encoding else f'"{version}"'
+
+    # Any encoding of the current version is the same data to the client
+    known = parse_etags(request.headers.get("If-None-Match", ""))
+    if any(tag == "*" or tag.strip('"').partition("-")[0] == version for tag in known):
+        response = HttpResponseNotModified()
+    else:
+        body = bodies[encoding]
+        response = HttpResponse(body if request.method == "GET" else b"", content_type="application/json")
+        response["Content-Length"] = str(len(body))
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    response["X-Catalog-Version"] = version
+    if request.GET.get("v") == version:
+        patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,22 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from core.models import Market, Outlet, Role
+from core.models import Market, Outlet
 from core.forms import MarketForm, OutletForm
-
-
-def admin_required(view_func):
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated or request.user.role != Role.ADMIN:
-            messages.error(request, "Unauthorized: Admins only")
-            return redirect("dashboard")
-        return view_func(request, *args, **kwargs)
-    return wrapper
+from core.decorators import admin_required, conditional_on
 
 
 # --- Market Views ---
 @login_required
 @admin_required
+@conditional_on(Market)
 def market_list(request):
     markets = Market.objects.all().order_by("region", "name")
     return render(request, "markets/market_list.html", {"markets": markets})
@@ -63,6 +56,7 @@ def market_delete(request, pk):
 # --- Outlet Views ---
 @login_required
 @admin_required
+@conditional_on(Outlet, Market)
 def outlet_list(request):
     outlets = Outlet.objects.select_related("market").all().order_by("market__name", "name")
     return render(request, "markets/outlet_list.html", {"outlets": outlets})
@@ -0,0 +1,62 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from django.shortcuts import render, redirect
+from django.views.decorators.http import require_GET
+
+from core.decorators import admin_required
+from core.metrics import registry
+from core.profiling import profile_store
+
+
+# -------------------
+# Prometheus scrape endpoint
+# -------------------
+def _from_allowed_network(request):
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip())
+        for network in getattr(settings, "METRICS_ALLOWED_NETWORKS", ()) if network.strip()
+    )
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus text format. Requires ``METRICS_TOKEN`` (Bearer) when set;
+    otherwise only ``METRICS_ALLOWED_NETWORKS`` may scrape.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+    elif not _from_allowed_network(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -------------------
+# Query profiler summary (Admin only)
+# -------------------
+@login_required
+@admin_required
+def query_profile(request):
+    if request.method == "POST":
+        profile_store.clear()
+        messages.success(request, "Query profile cleared.")
+        return redirect("query_profile")
+
+    context = {
+        "enabled": getattr(settings, "QUERY_PROFILER_ENABLED", False),
+        "threshold": getattr(settings, "QUERY_PROFILER_NPLUSONE_THRESHOLD", 5),
+        "rows": profile_store.summary(),
+    }
+    return render(request, "monitoring/query_profile.html", context)
@@ -0,0 +1,50 @@
+# core/views_payments.py
+import io
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from core.decorators import admin_required
+from core.forms import StatementUploadForm
+from core.models import Role
+from core.receivables import aging_report
+from core.reconciliation import StatementError, reconcile
+from core.team import get_team_agent_ids
+
+
+# -------------------
+# M-Pesa reconciliation (Admin only)
+# -------------------
+@login_required
+@admin_required
+def reconcile_mpesa(request):
+    report = None
+    form = StatementUploadForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        dry_run = form.cleaned_data["dry_run"]
+        # Read line by line from the upload (spooled to disk when large)
+        lines = io.TextIOWrapper(form.cleaned_data["statement"].file, encoding="utf-8-sig", newline="")
+        try:
+            report = reconcile(lines, dry_run=dry_run)
+        except (StatementError, UnicodeDecodeError) as exc:
+            messages.error(request, f"Could not read the statement: {exc}")
+        else:
+            verb = "would be" if dry_run else "were"
+            messages.success(request, f"{report['matched']} payment(s) {verb} marked completed.")
+    return render(request, "payments/reconcile.html", {"form": form, "report": report})
+
+
+# -------------------
+# Credit aging (Admins: everyone; Managers: their team)
+# -------------------
+@login_required
+def receivables_aging(request):
+    if request.user.role == Role.ADMIN:
+        report = aging_report()
+    elif request.user.role == Role.MANAGER:
+        report = aging_report(get_team_agent_ids(request.user))
+    else:
+        messages.error(request, "Unauthorized access.")
+        return redirect("dashboard")
+    return render(request, "payments/receivables_aging.html", {"report": report})
@@ -1,30 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from core.models import Product, PackSize, PriceList, Role
-from core.forms import ProductForm, PackSizeForm, PriceListForm
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib import messages
-from django.contrib.auth.decorators import login_required
-from core.models import Market, Outlet, Role
-from core.forms import MarketForm, OutletForm
-
-# --- Helper decorator ---
-def admin_required(view_func):
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated or request.user.role != Role.ADMIN:
-            messages.error(request, "Unauthorized: Admins only")
-            return redirect("dashboard")
-        return view_func(request, *args, **kwargs)
-    return wrapper  
-
+from core.models import Market, Product, PackSize, PriceList
+from core.forms import MarketForm, ProductForm, PackSizeForm, PriceListForm
+from core.decorators import admin_required, conditional_on
 
 
 # --- Product Views ---
 @login_required
 @admin_required
+@conditional_on(Product, PackSize, PriceList)
 def product_list(request):
-    products = Product.objects.all().order_by("name")
+    # packs and their prices are listed per product: prefetch them in two queries
+    products = Product.objects.prefetch_related("packs__prices").order_by("name")
     return render(request, "products/product_list.html", {"products": products})
 
 
@@ -0,0 +1,46 @@
+# core/views_reports.py
+from datetime import date
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+from core.models import Role
+from core.reports import ReportError, sales_trends
+from core.team import get_team_agent_ids
+
+
+# -------------------
+# Sales trends (JSON for charts)
+# -------------------
+@login_required
+@require_safe
+def sales_trends_json(request):
+    """
+    ``?dimension=pack|market|agent&metric=revenue|quantity|sales&start=&end=&window=&top=``
+    (ISO dates); see core/reports.py. Admins see all sales, managers their
+    team's and agents their own.
+    """
+    user, params = request.user, request.GET
+    if user.role == Role.ADMIN:
+        agent_ids = None
+    elif user.role == Role.MANAGER:
+        agent_ids = get_team_agent_ids(user)
+    else:
+        agent_ids = [user.pk]
+    try:
+        report = sales_trends(
+            dimension=params.get("dimension", "pack"),
+            metric=params.get("metric", "revenue"),
+            start=date.fromisoformat(params["start"]) if params.get("start") else None,
+            end=date.fromisoformat(params["end"]) if params.get("end") else None,
+            window=int(params.get("window", 7)),
+            top=int(params.get("top", 10)),
+            agent_ids=agent_ids,
+        )
+    except (ReportError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    response = JsonResponse(report)
+    patch_cache_control(response, private=True, max_age=60)
+    return response
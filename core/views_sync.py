@@ -0,0 +1,23 @@
+# core/views_sync.py
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+from core.sync import InvalidSyncToken, changes
+
+
+# -------------------
+# Delta sync (agent app)
+# -------------------
+@login_required
+@require_safe
+def sync_changes(request):
+    """``?token=`` from the previous response (none for the first sync); see core/sync.py."""
+    try:
+        payload = changes(request.user, request.GET.get("token"))
+    except InvalidSyncToken as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    response = JsonResponse(payload)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ttdms.settings')
+    # The test suite has its own settings (no replica, in-memory cache)
+    default = 'ttdms.test_settings' if sys.argv[1:2] == ['test'] else 'ttdms.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,28 @@
+# ttdms/gunicorn_asgi.py
+"""
+ASGI deployment profile:
+
+    gunicorn -c ttdms/gunicorn_asgi.py ttdms.asgi:application
+
+Uvicorn workers serve the async dashboards (ASYNC_VIEWS). Each worker runs
+one event loop, so a handful per core is enough. Database connections are
+opened per worker thread, so they come from a pool (DB_POOL) rather than
+being held open per thread (CONN_MAX_AGE).
+"""
+import multiprocessing
+import os
+
+# Read by ttdms/settings.py when the workers import Django
+os.environ.setdefault("ASYNC_VIEWS", "1")
+os.environ.setdefault("DB_POOL", "1")
+os.environ.setdefault("DB_CONN_MAX_AGE", "0")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() + 1))
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = 5000
+max_requests_jitter = 500
@@ -1,4 +1,5 @@
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,44 +32,127 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.QueryProfilerMiddleware',
 ]
 
+# Per-request SQL profiler / N+1 detector (opt-in; see core/middleware.py)
+QUERY_PROFILER_ENABLED = os.environ.get("QUERY_PROFILER_ENABLED", "0") == "1"
+QUERY_PROFILER_NPLUSONE_THRESHOLD = 5
+
+# Prometheus metrics (core/metrics.py). With several workers, point METRICS_DIR
+# at a directory they share so /metrics aggregates across processes.
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = 5  # seconds
+# Scrapers send METRICS_TOKEN as a Bearer token. Without a token, only these
+# networks may scrape (the address is REMOTE_ADDR, so behind a proxy set a token)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = os.environ.get("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128").split(",")
+
 ROOT_URLCONF = 'ttdms.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         "DIRS": [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cache_versions',
+            ],
+            # Compiled templates are kept in memory (the runserver autoreloader
+            # still resets them when a template changes)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'ttdms.wsgi.application'
+ASGI_APPLICATION = 'ttdms.asgi.application'
+
+# Route the async dashboards (core/views_async.py); set by the ASGI profile
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# PostgreSQL when DB_NAME is set, otherwise the local SQLite file. The
+# optional 'replica' alias serves the reporting views (core/db_routers.py).
+if os.environ.get('DB_NAME'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['DB_NAME'],
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # Persistent connections; DB_POOL=1 switches to a psycopg pool
+            # instead (use it under ASGI, where connections are per thread)
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0  # required with pooling
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX', '10')),
+        }
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'OPTIONS': {**DATABASES['default']['OPTIONS']},
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # WAL lets readers run alongside the writer
+            'OPTIONS': {'init_command': 'PRAGMA journal_mode=WAL'},
+        }
+    }
+    if os.environ.get('DB_SQLITE_REPLICA') == '1':
+        # Local stand-in for a replica: a read-only connection to the same
+        # file, so routing mistakes (writes on the replica) fail loudly
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {'init_command': 'PRAGMA journal_mode=WAL; PRAGMA query_only=ON'},
+        }
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# Read-only views served from the replica, and how long a client that just
+# wrote is kept on the primary instead (read-your-writes)
+REPLICA_VIEWS = [
+    'admin_dashboard', 'manager_dashboard', 'agent_dashboard',
+    'user_list', 'product_list', 'market_list', 'outlet_list',
+    'sales_trends', 'receivables_aging',
+]
+REPLICA_READ_YOUR_WRITES_SECONDS = 10
 
 
 # Password validation
@@ -105,8 +189,67 @@ USE_TZ = True
 # Custom user model
 AUTH_USER_MODEL = "core.User"
 
+# Cache shared by all worker processes (core/cache.py): Redis when REDIS_URL
+# is set, otherwise a table in the main database (created by migration
+# core/0015, or `manage.py createcachetable`). Both make cache.add() atomic,
+# which the single-flight locks in core/cache.py rely on.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "KEY_PREFIX": "ttdms",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "ttdms_cache",
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        }
+    }
+
+# {% cache %} fragments stay in process memory: rendered HTML is cheap to
+# rebuild per worker, much cheaper to fetch than from the shared cache, and a
+# restart (deploy) drops fragments rendered from old templates. Fragments vary
+# on core.cache namespace versions, so model changes still reach every worker.
+CACHES["template_fragments"] = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "template-fragments",
+    "OPTIONS": {"MAX_ENTRIES": 5000},
+}
+
+# Serve request.user from the cache instead of a per-request query. Only
+# with Redis: on the DatabaseCache fallback a cache hit is a query as well,
+# so the user (and the session, below) are read from their own tables.
+AUTH_USER_CACHE = bool(os.environ.get("REDIS_URL"))
+AUTHENTICATION_BACKENDS = ["core.backends.CachedModelBackend"]
+
+# Dynamic HTML/JSON responses smaller than this go out uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# Delta sync for offline agents (core/sync.py)
+SYNC_PAGE_SIZE = 500            # rows per stream per response
+SYNC_SETTLE_SECONDS = 5         # rows newer than this wait for the next sync
+SYNC_TOMBSTONE_DAYS = 30        # deletions kept this long; older tokens get a full reset
+
+# Sessions read through the cache, written through to the DB (with Redis;
+# see AUTH_USER_CACHE)
+SESSION_ENGINE = (
+    "django.contrib.sessions.backends.cached_db" if AUTH_USER_CACHE
+    else "django.contrib.sessions.backends.db"
+)
+
 # Where to send unauthenticated users
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # collectstatic writes content-hashed names plus .br/.gz siblings, served
+    # by core.middleware.StaticFilesMiddleware
+    'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
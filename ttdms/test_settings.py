@@ -0,0 +1,20 @@
+# ttdms/test_settings.py
+"""
+Settings for the test suite: ``manage.py test`` loads this module (run
+other test runners with ``DJANGO_SETTINGS_MODULE=ttdms.test_settings``).
+"""
+from ttdms.settings import *  # noqa: F403
+
+# No replica: a second connection could not see data inside the test case's
+# transaction
+DATABASES.pop('replica', None)  # noqa: F405
+
+# A private in-memory cache per test process, which the user and session
+# caches are worth using with
+CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}  # noqa: F405
+AUTH_USER_CACHE = True
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Tests don't run collectstatic, so static files keep plain names (a
+# manifest lookup would fail)
+STORAGES['staticfiles'] = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}  # noqa: F405